@@ -0,0 +1,276 @@
+"""HTTP API для создания документов без диалога в Telegram.
+
+Необязательный компонент: требует aiohttp (pip install "appraiser-photo-bot[api]").
+Запускается вместе с ботом (API_ENABLED=true) - тогда использует его пул рендеринга,
+кеш документов и лимиты - или отдельно: appraiser-photo-bot-api.
+
+    POST /documents             multipart: photos (файлы), title, rows, cols, size_option
+                                ответ - .docx; с ?mode=job - 202 и job_id
+    GET  /jobs/{job_id}         статус задания
+    GET  /jobs/{job_id}/document готовый .docx
+    GET  /health
+"""
+
+import asyncio
+import hmac
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .config import BotConfig
+from .document_creators.messages import MessageGenerator
+from .expiry import ExpiryIndex
+from .metrics import metrics
+from .render_service import RenderService, create_page_executor
+from .spool import SessionSpool
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - зависимость необязательная
+    web = None
+
+logger = logging.getLogger(__name__)
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+STREAM_CHUNK_SIZE = 256 * 1024
+JOB_TTL = 3600
+
+
+class ApiError(Exception):
+    """Ошибка запроса с HTTP-статусом."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status: int = status
+
+
+class RenderApi:
+    """HTTP-обертка над RenderService."""
+
+    def __init__(self, config: BotConfig, render_service: RenderService, spool: SessionSpool) -> None:
+        if web is None:
+            raise RuntimeError('Для HTTP API установите aiohttp: pip install "appraiser-photo-bot[api]"')
+        self.config: BotConfig = config
+        self.render_service: RenderService = render_service
+        self.spool: SessionSpool = spool
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.job_expiry: ExpiryIndex = ExpiryIndex()
+        self._runner: Optional[Any] = None
+
+    def build_app(self) -> Any:
+        @web.middleware
+        async def error_middleware(request: Any, handler: Any) -> Any:
+            try:
+                return await handler(request)
+            except ApiError as e:
+                metrics.inc(f"api.errors.{e.status}")
+                return web.json_response({"error": str(e)}, status=e.status)
+
+        @web.middleware
+        async def auth_middleware(request: Any, handler: Any) -> Any:
+            if self.config.api_token and request.path != "/health":
+                # Сравнение за постоянное время: по времени ответа нельзя подобрать токен по символам
+                provided: bytes = request.headers.get("Authorization", "").encode()
+                if not hmac.compare_digest(provided, f"Bearer {self.config.api_token}".encode()):
+                    raise ApiError(401, "неверный или отсутствующий токен")
+            return await handler(request)
+
+        app = web.Application(
+            middlewares=[error_middleware, auth_middleware],
+            client_max_size=self.config.api_max_upload_mb * 1024 * 1024,
+        )
+        app.router.add_get("/health", self.health)
+        app.router.add_post("/documents", self.create_document)
+        app.router.add_get("/jobs/{job_id}", self.job_status)
+        app.router.add_get("/jobs/{job_id}/document", self.job_document)
+        return app
+
+    async def start(self) -> None:
+        """Запускает сервер в текущем цикле событий (встроенный режим)."""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.config.api_host, self.config.api_port).start()
+        logger.info(f"HTTP API запущен на http://{self.config.api_host}:{self.config.api_port}")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def health(self, request: Any) -> Any:
+        return web.json_response({"status": "ok", "jobs": len(self.jobs)})
+
+    async def _read_request(self, request: Any) -> Tuple[Dict[str, str], List[bytes]]:
+        """Читает multipart: поля формы и фото. Фото пишутся частями в спул и сжимаются на общем пуле."""
+        if not request.content_type.startswith("multipart/"):
+            raise ApiError(415, "ожидается multipart/form-data")
+
+        fields: Dict[str, str] = {}
+        photos: List[bytes] = []
+        total: int = 0
+        limit: int = self.config.api_max_upload_mb * 1024 * 1024
+        spool_key: str = f"api_{uuid.uuid4().hex}"
+
+        try:
+            reader = await request.multipart()
+            async for part in reader:
+                if part.filename is None:
+                    fields[part.name] = (await part.text()).strip()
+                    continue
+                if len(photos) >= self.config.max_photos:
+                    raise ApiError(413, f"фото больше {self.config.max_photos}")
+                with self.spool.open(spool_key) as spool_file:
+                    while chunk := await part.read_chunk(STREAM_CHUNK_SIZE):
+                        total += len(chunk)
+                        if total > limit:
+                            raise ApiError(413, f"размер загрузки больше {self.config.api_max_upload_mb} MB")
+                        spool_file.write(chunk)
+                    if spool_file.tell() == 0:
+                        continue
+                    spool_file.seek(0)
+                    photos.append(await self.render_service.compress(spool_file))
+        finally:
+            self.spool.discard(spool_key)
+
+        metrics.inc("api.upload_bytes", total)
+        return fields, photos
+
+    def _parse_layout(self, fields: Dict[str, str], photos_count: int) -> Tuple[Optional[str], int, int, str]:
+        try:
+            rows: int = int(fields.get("rows", ""))
+            cols: int = int(fields.get("cols", ""))
+        except ValueError as e:
+            raise ApiError(400, "rows и cols должны быть целыми числами") from e
+        size_option: str = fields.get("size_option") or "auto"
+        error: Optional[str] = self.render_service.validate_layout(rows, cols, size_option, photos_count)
+        if error:
+            raise ApiError(400, error)
+        return fields.get("title") or None, rows, cols, size_option
+
+    async def _stream_document(self, request: Any, document_bytes: bytes, filename: str) -> Any:
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": DOCX_CONTENT_TYPE,
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+            }
+        )
+        response.content_length = len(document_bytes)
+        await response.prepare(request)
+        view: memoryview = memoryview(document_bytes)
+        for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+            await response.write(view[offset : offset + STREAM_CHUNK_SIZE])
+        await response.write_eof()
+        return response
+
+    async def create_document(self, request: Any) -> Any:
+        """POST /documents: синхронно возвращает .docx или создает задание (?mode=job)."""
+        fields, photos = await self._read_request(request)
+        title, rows, cols, size_option = self._parse_layout(fields, len(photos))
+        filename: str = MessageGenerator.generate_filename(title, len(photos), rows, cols)
+        metrics.inc("api.documents")
+
+        if request.query.get("mode") == "job":
+            self._prune_jobs()
+            job_id: str = uuid.uuid4().hex
+            job: Dict[str, Any] = {
+                "status": "queued",
+                "filename": filename,
+                "photos_count": len(photos),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.jobs[job_id] = job
+            self.job_expiry.schedule("job", job_id, JOB_TTL)
+            job["task"] = asyncio.create_task(self._run_job(job, photos, title, rows, cols, size_option))
+            return web.json_response(
+                {"job_id": job_id, "status": job["status"], "status_url": f"/jobs/{job_id}"}, status=202
+            )
+
+        _, document_bytes = await self.render_service.render(photos, title, rows, cols, size_option, source="api")
+        return await self._stream_document(request, document_bytes, filename)
+
+    async def _run_job(
+        self, job: Dict[str, Any], photos: List[bytes], title: Optional[str], rows: int, cols: int, size_option: str
+    ) -> None:
+        job["status"] = "running"
+        try:
+            cache_key, document_bytes = await self.render_service.render(
+                photos, title, rows, cols, size_option, source="api"
+            )
+            job.update(status="done", cache_key=cache_key, size=len(document_bytes))
+        except Exception as e:
+            logger.error(f"Ошибка задания HTTP API: {e}", exc_info=True)
+            job.update(status="error", error=str(e))
+
+    def _get_job(self, request: Any) -> Dict[str, Any]:
+        self._prune_jobs()
+        job: Optional[Dict[str, Any]] = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise ApiError(404, "задание не найдено или устарело")
+        return job
+
+    async def job_status(self, request: Any) -> Any:
+        """GET /jobs/{job_id}: статус задания."""
+        job: Dict[str, Any] = self._get_job(request)
+        return web.json_response({key: value for key, value in job.items() if key not in ("task", "cache_key")})
+
+    async def job_document(self, request: Any) -> Any:
+        """GET /jobs/{job_id}/document: готовый документ из общего кеша."""
+        job: Dict[str, Any] = self._get_job(request)
+        if job["status"] != "done":
+            raise ApiError(409, f"документ еще не готов: {job['status']}")
+        document_bytes: Optional[bytes] = await asyncio.get_running_loop().run_in_executor(
+            self.render_service.executor, self.render_service.output_cache.get, job["cache_key"]
+        )
+        if document_bytes is None:
+            raise ApiError(410, "документ удален из кеша, создайте его заново")
+        return await self._stream_document(request, document_bytes, job["filename"])
+
+    def _prune_jobs(self) -> None:
+        for _, job_id in self.job_expiry.pop_expired():
+            self.jobs.pop(job_id, None)
+
+
+def main() -> None:
+    """Отдельный запуск HTTP API (без бота)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from dotenv import load_dotenv
+
+    from .document_creators.temp_manager import TempFileManager
+    from .flight_recorder import flight_recorder
+    from .logging_setup import setup_logging
+    from .loop_monitor import LoopLagMonitor
+    from .output_cache import OutputCache
+
+    load_dotenv()
+    config: BotConfig = BotConfig.from_env()
+    setup_logging(config)
+    flight_recorder.configure(config.flight_recorder_size, config.flight_recorder_file)
+
+    TempFileManager.set_quota(config.temp_quota_mb * 1024 * 1024)
+    executor = ThreadPoolExecutor(max_workers=config.render_workers, thread_name_prefix="render")
+    output_cache = OutputCache(config.output_cache_dir, config.output_cache_max_mb * 1024 * 1024)
+    service = RenderService(config, executor, output_cache, create_page_executor(config))
+    api = RenderApi(config, service, SessionSpool())
+    app = api.build_app()
+    if config.loop_lag_threshold_ms > 0:
+        monitor = LoopLagMonitor(config.loop_lag_threshold_ms / 1000)
+
+        async def start_monitor(app: Any) -> None:
+            monitor.start()
+
+        async def stop_monitor(app: Any) -> None:
+            await monitor.stop()
+
+        app.on_startup.append(start_monitor)
+        app.on_cleanup.append(stop_monitor)
+    try:
+        web.run_app(app, host=config.api_host, port=config.api_port)
+    finally:
+        service.shutdown_page_executor()
+
+
+if __name__ == "__main__":
+    main()
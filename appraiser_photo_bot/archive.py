@@ -0,0 +1,75 @@
+"""Прием фото одним ZIP-архивом."""
+
+import io
+import logging
+import os
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, List, Optional, Tuple
+
+from .document_creators.constants import IMAGE_EXTENSIONS
+from .document_creators.utils import _import_pil, compress_image_with_hash
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на распакованный размер одного фото (защита от zip-бомб)
+MAX_ENTRY_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class ArchiveContents:
+    """Фото архива в порядке имен и число пропущенных файлов."""
+
+    entries: List[zipfile.ZipInfo] = field(default_factory=list)
+    skipped: int = 0
+
+
+def _is_hidden(name: str) -> bool:
+    return any(part.startswith(".") or part == "__MACOSX" for part in name.split("/"))
+
+
+def list_archive_images(archive: zipfile.ZipFile) -> ArchiveContents:
+    """Изображения архива, отсортированные по имени; служебные и слишком большие файлы пропускаются."""
+    contents: ArchiveContents = ArchiveContents()
+    for info in archive.infolist():
+        if info.is_dir() or _is_hidden(info.filename):
+            continue
+        if not info.filename.lower().endswith(IMAGE_EXTENSIONS) or info.file_size > MAX_ENTRY_BYTES:
+            contents.skipped += 1
+            continue
+        contents.entries.append(info)
+    contents.entries.sort(key=lambda info: info.filename)
+    return contents
+
+
+def open_archive(source: BinaryIO) -> Optional[zipfile.ZipFile]:
+    """Открывает архив из файла (спул или файл локального Bot API). None - не ZIP."""
+    try:
+        return zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        return None
+
+
+def compress_entry(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    quality: int,
+    max_size: int,
+    ssim_target: Optional[float] = None,
+) -> Optional[Tuple[bytes, Optional[int]]]:
+    """Распаковывает и сжимает одно фото, возвращает его вместе с перцептивным хешем.
+
+    Вызывается на пуле: ZipFile допускает чтение из нескольких потоков.
+    """
+    try:
+        with archive.open(info) as entry:
+            data: bytes = entry.read(MAX_ENTRY_BYTES + 1)
+        if not data or len(data) > MAX_ENTRY_BYTES:
+            return None
+        # Читается только заголовок: файлы с расширением картинки, но без изображения внутри, пропускаются
+        with _import_pil().open(io.BytesIO(data)):
+            pass
+        return compress_image_with_hash(data, quality, max_size, ssim_target=ssim_target)
+    except Exception as e:
+        logger.warning(f"Не удалось обработать {os.path.basename(info.filename)} из архива: {e}")
+        return None
@@ -0,0 +1,211 @@
+"""Пакетное создание документов из фото на диске (без Telegram)."""
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing.context import BaseContext
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import BotConfig
+from .document_creators.constants import IMAGE_EXTENSIONS, SIZE_OPTIONS
+from .flight_recorder import JobTrace, flight_recorder
+from .logging_setup import forward_worker_logs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchJob:
+    """Один документ: параметры таблицы и пути к фото в порядке вставки."""
+
+    output: str
+    photos: List[str]
+    rows: int
+    cols: int
+    size_option: str = "auto"
+    title: Optional[str] = None
+
+
+def list_images(folder: str) -> List[str]:
+    """Изображения в папке, отсортированные по имени."""
+    names: List[str] = sorted(
+        entry.name for entry in os.scandir(folder) if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [os.path.join(folder, name) for name in names]
+
+
+def _safe_filename(name: str) -> str:
+    clean: str = "".join(c for c in name if c.isalnum() or c in (" ", "-", "_")).strip()
+    return clean.replace(" ", "_") or "document"
+
+
+def jobs_from_folders(
+    folders: List[str], output_dir: str, rows: int, cols: int, size_option: str, title: Optional[str]
+) -> List[BatchJob]:
+    """По одному документу на папку: <output_dir>/<имя папки>.docx."""
+    jobs: List[BatchJob] = []
+    for folder in folders:
+        name: str = os.path.basename(os.path.normpath(folder))
+        jobs.append(
+            BatchJob(
+                output=os.path.join(output_dir, f"{_safe_filename(name)}.docx"),
+                photos=list_images(folder),
+                rows=rows,
+                cols=cols,
+                size_option=size_option,
+                title=title,
+            )
+        )
+    return jobs
+
+
+def jobs_from_manifest(path: str, output_dir: str) -> List[BatchJob]:
+    """Задания из JSON (список объектов) или CSV (фото через ';').
+
+    Поля: title, rows, cols, size_option, photos, output (необязательно).
+    Вместо photos можно указать folder. Относительные пути считаются от файла манифеста.
+    """
+    base_dir: str = os.path.dirname(os.path.abspath(path))
+    records: List[Dict[str, Any]]
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            records = list(csv.DictReader(f))
+        for record in records:
+            record["photos"] = [p.strip() for p in (record.get("photos") or "").split(";") if p.strip()]
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+
+    jobs: List[BatchJob] = []
+    for index, record in enumerate(records, start=1):
+        title: Optional[str] = (record.get("title") or "").strip() or None
+        if record.get("folder"):
+            photos: List[str] = list_images(os.path.join(base_dir, record["folder"]))
+        else:
+            photos = [os.path.join(base_dir, photo) for photo in record.get("photos", [])]
+        output: str = record.get("output") or f"{_safe_filename(title or f'document_{index}')}.docx"
+        jobs.append(
+            BatchJob(
+                output=os.path.join(output_dir, output),
+                photos=photos,
+                rows=int(record["rows"]),
+                cols=int(record["cols"]),
+                size_option=(record.get("size_option") or "auto").strip(),
+                title=title,
+            )
+        )
+    return jobs
+
+
+def validate_job(job: BatchJob, config: BotConfig) -> Optional[str]:
+    """Проверяет задание по тем же ограничениям, что и бот. Возвращает текст ошибки или None."""
+    if not job.photos:
+        return "нет фото"
+    if not 1 <= job.rows <= config.max_rows:
+        return f"строк должно быть от 1 до {config.max_rows}"
+    if not 1 <= job.cols <= config.max_cols:
+        return f"столбцов должно быть от 1 до {config.max_cols}"
+    if job.size_option not in SIZE_OPTIONS:
+        return f"неизвестный размер '{job.size_option}', допустимо: {', '.join(SIZE_OPTIONS)}"
+    if len(job.photos) > config.max_photos:
+        return f"слишком много фото: {len(job.photos)} > {config.max_photos}"
+    missing: List[str] = [photo for photo in job.photos if not os.path.isfile(photo)]
+    if missing:
+        return f"файл не найден: {missing[0]}"
+    return None
+
+
+def run_job(
+    job: BatchJob,
+    quality: int,
+    max_size: int,
+    ssim_target: Optional[float] = None,
+    docx_compress_level: int = 6,
+) -> Tuple[str, int, int, JobTrace]:
+    """Создает документ задания: то же сжатие, что при загрузке в бот, и тот же DocumentCreator.
+
+    Возвращает (путь, число фото, размер документа, трасса задания для бортового самописца).
+    """
+    from .document_creators import DocumentCreator
+    from .document_creators.utils import compress_image
+
+    trace: JobTrace = flight_recorder.start("batch")
+    photos: List[bytes] = []
+    with trace.stage("upload_compress"):
+        for path in job.photos:
+            with open(path, "rb") as f:
+                photos.append(compress_image(f, quality, max_size, ssim_target=ssim_target))
+    trace.describe(photos, job.rows, job.cols, job.size_option)
+
+    creator = DocumentCreator(
+        title=job.title,
+        rows=job.rows,
+        cols=job.cols,
+        size_option=job.size_option,
+        docx_compress_level=docx_compress_level,
+        trace=trace,
+    )
+    document_bytes: bytes = creator.create_document(photos)
+    trace.bytes["document"] = len(document_bytes)
+
+    with trace.stage("write"):
+        os.makedirs(os.path.dirname(os.path.abspath(job.output)), exist_ok=True)
+        with open(job.output, "wb") as f:
+            f.write(document_bytes)
+    return job.output, len(photos), len(document_bytes), trace
+
+
+def run_batch(jobs: List[BatchJob], config: BotConfig, workers: Optional[int] = None) -> int:
+    """Выполняет задания на пуле процессов и печатает прогресс. Возвращает число ошибок.
+
+    Логи рабочих процессов (например, ошибки сжатия) пересылаются в логирование главного процесса.
+    """
+    failed: int = 0
+    runnable: List[BatchJob] = []
+    for job in jobs:
+        error: Optional[str] = validate_job(job, config)
+        if error:
+            failed += 1
+            print(f"❌ {job.output}: {error}")
+        else:
+            runnable.append(job)
+
+    total: int = len(runnable)
+    started: float = time.monotonic()
+    context: BaseContext = multiprocessing.get_context("spawn")
+    with (
+        forward_worker_logs(context) as (initializer, initargs),
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=initializer, initargs=initargs
+        ) as executor,
+    ):
+        futures: Dict[Future, BatchJob] = {
+            executor.submit(
+                run_job,
+                job,
+                config.image_quality,
+                config.image_max_size,
+                config.adaptive_ssim_target,
+                config.docx_compress_level,
+            ): job
+            for job in runnable
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                output, photos_count, size, trace = future.result()
+                flight_recorder.finish(trace, "done")
+                print(f"[{done}/{total}] ✅ {output} ({photos_count} фото, {size / 1024 / 1024:.2f} MB)")
+            except Exception as e:
+                failed += 1
+                flight_recorder.finish(flight_recorder.start("batch"), "error", repr(e))
+                logger.error(f"Ошибка при создании {job.output}: {e}", exc_info=True)
+                print(f"[{done}/{total}] ❌ {job.output}: {e}")
+
+    print(f"Готово: {len(jobs) - failed} из {len(jobs)} за {time.monotonic() - started:.1f} сек")
+    return failed
@@ -8,8 +8,13 @@ from telegram.ext import ApplicationBuilder, MessageHandler, filters
 
 from .config import BotConfig
 from .document_creators.messages import MessageGenerator
+from .flight_recorder import flight_recorder
 from .handlers import BotHandlers
 from .keyboards import Keyboards
+from .logging_setup import setup_logging
+from .loop_monitor import LoopLagMonitor
+from .outbound import OutboundScheduler
+from .transport import build_requests
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +27,8 @@ class PhotoTableBot:
         self.handlers: BotHandlers = BotHandlers(config)
         self.application: Optional[Any] = None
         self.message_generator: MessageGenerator = MessageGenerator()
+        self.api: Optional[Any] = None
+        self.loop_monitor: Optional[LoopLagMonitor] = None
 
     async def _setup_periodic_tasks(self, application: Any) -> None:
         """Настраивает периодические задачи."""
@@ -40,11 +47,22 @@ class PhotoTableBot:
                 ("help", "Помощь по боту"),
                 ("status", "Статус бота"),
                 ("cleanup", "Очистить память бота"),
+                ("resend", "Отправить последний документ повторно"),
             ]
 
             await application.bot.set_my_commands(commands)
             logger.info("Команды меню бота установлены")
 
+            if self.config.loop_lag_threshold_ms > 0:
+                self.loop_monitor = LoopLagMonitor(self.config.loop_lag_threshold_ms / 1000)
+                self.loop_monitor.start()
+
+            if self.config.api_enabled:
+                from .api import RenderApi
+
+                self.api = RenderApi(self.config, self.handlers.render_service, self.handlers.spool)
+                await self.api.start()
+
             if self.config.admin_id:
                 try:
                     await application.bot.send_message(
@@ -58,10 +76,20 @@ class PhotoTableBot:
         except Exception as e:
             logger.error(f"Ошибка в post_init: {e}")
 
+    async def post_shutdown(self, application: Any) -> None:
+        """Выполняется при остановке бота."""
+        if self.api:
+            await self.api.stop()
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+        self.handlers.render_service.shutdown_page_executor(wait=False)
+
     def setup_handlers(self) -> None:
         """Настраивает все обработчики в правильном порядке."""
         logger.info("=== НАСТРОЙКА ОБРАБОТЧИКОВ ===")
 
+        self.application.add_handler(self.handlers.get_activity_handler(), group=-1)
+
         conv_handler = self.handlers.get_conversation_handler()
         logger.info("1. ✅ Добавляем ConversationHandler")
         self.application.add_handler(conv_handler)
@@ -171,19 +199,31 @@ class PhotoTableBot:
 
     def run(self) -> None:
         """Запускает бота."""
-        logging.basicConfig(
-            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            level=logging.DEBUG if self.config.debug else logging.INFO,
-        )
+        setup_logging(self.config)
+        flight_recorder.configure(self.config.flight_recorder_size, self.config.flight_recorder_file)
+
+        request, get_updates_request = build_requests(self.config)
+        # Фото и архивы скачиваются через пул download того же транспорта
+        self.handlers.downloader.attach(request)
 
         self.application = (
             ApplicationBuilder()
             .token(self.config.token)
-            .read_timeout(60)
-            .write_timeout(60)
-            .connect_timeout(30)
-            .pool_timeout(30)
+            .base_url(self.config.bot_api_url)
+            .base_file_url(self.config.bot_api_file_url)
+            .local_mode(self.config.local_mode)
+            .request(request)
+            .get_updates_request(get_updates_request)
+            .rate_limiter(
+                OutboundScheduler(
+                    global_rate=self.config.outbound_global_rate,
+                    global_burst=max(int(self.config.outbound_global_rate), 1),
+                    chat_rate=self.config.outbound_chat_rate,
+                    chat_burst=self.config.outbound_chat_burst,
+                )
+            )
             .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
             .build()
         )
 
@@ -202,6 +242,8 @@ class PhotoTableBot:
         logger.info(f"   Кнопки меню: {'ВКЛ' if self.config.enable_buttons else 'ВЫКЛ'}")
         logger.info(f"   Таймаут сессии: {self.config.session_timeout} сек")
         logger.info(f"   Интервал очистки: {self.config.cleanup_interval} сек")
+        logger.info(f"   Bot API: {self.config.bot_api_url} ({'локальный' if self.config.local_mode else 'облачный'})")
+        logger.info(f"   Лимит документа: {self.config.max_document_mb:.0f} MB")
         logger.info("=" * 60)
 
         if self.config.enable_buttons:
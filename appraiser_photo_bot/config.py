@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dataclasses import dataclass
 from typing import Optional
 
@@ -9,6 +10,11 @@ class BotConfig:
 
     token: str
     log_level: str = "INFO"
+    log_file: str = "bot.log"
+    log_max_mb: int = 10
+    log_backups: int = 5
+    log_format: str = "text"
+    log_sampling: str = "appraiser_photo_bot.handlers.photos=10,appraiser_photo_bot.document_creators.utils=10"
     cleanup_interval: int = 600
     session_timeout: int = 1800
     max_photos: int = 100
@@ -16,10 +22,49 @@ class BotConfig:
     max_cols: int = 10
     image_quality: int = 85
     image_max_size: int = 2000
+    adaptive_quality: bool = False
+    ssim_target: float = 0.99
+    duplicate_photos: str = "warn"
+    duplicate_distance: int = 8
     debug: bool = False
     admin_id: Optional[int] = None
     enable_buttons: bool = True
     button_timeout: int = 3600
+    render_workers: int = 2
+    page_workers: int = 0
+    docx_compress_level: int = 6
+    loop_lag_threshold_ms: int = 250
+    flight_recorder_size: int = 200
+    flight_recorder_file: str = ""
+    preview_max_pages: int = 10
+    progress_update_interval: float = 2.0
+    outbound_global_rate: float = 30.0
+    outbound_chat_rate: float = 1.0
+    outbound_chat_burst: int = 3
+    read_timeout: float = 60.0
+    write_timeout: float = 60.0
+    connect_timeout: float = 30.0
+    pool_timeout: float = 30.0
+    download_timeout: float = 120.0
+    upload_timeout: float = 300.0
+    api_pool_size: int = 8
+    download_pool_size: int = 4
+    upload_pool_size: int = 2
+    http2: bool = False
+    http_keepalive_expiry: float = 30.0
+    output_cache_dir: str = os.path.join(tempfile.gettempdir(), "appraiser_photo_bot_cache")
+    output_cache_max_mb: int = 512
+    output_cache_ttl: int = 86400
+    send_retries: int = 3
+    local_mode: bool = False
+    temp_quota_mb: int = 1024
+    api_enabled: bool = False
+    api_host: str = "127.0.0.1"
+    api_port: int = 8080
+    api_token: Optional[str] = None
+    api_max_upload_mb: int = 200
+    bot_api_url: str = "https://api.telegram.org/bot"
+    bot_api_file_url: str = "https://api.telegram.org/file/bot"
 
     @classmethod
     def from_env(cls) -> "BotConfig":
@@ -27,6 +72,11 @@ class BotConfig:
         return cls(
             token=os.getenv("BOT_TOKEN", ""),
             log_level=os.getenv("LOG_LEVEL", "INFO"),
+            log_file=os.getenv("LOG_FILE", "bot.log"),
+            log_max_mb=int(os.getenv("LOG_MAX_MB", "10")),
+            log_backups=int(os.getenv("LOG_BACKUPS", "5")),
+            log_format=os.getenv("LOG_FORMAT", "text").lower(),
+            log_sampling=os.getenv("LOG_SAMPLING", cls.log_sampling),
             cleanup_interval=int(os.getenv("CLEANUP_INTERVAL", "600")),
             session_timeout=int(os.getenv("SESSION_TIMEOUT", "1800")),
             max_photos=int(os.getenv("MAX_PHOTOS", "100")),
@@ -34,8 +84,66 @@ class BotConfig:
             max_cols=int(os.getenv("MAX_COLS", "10")),
             image_quality=int(os.getenv("IMAGE_QUALITY", "85")),
             image_max_size=int(os.getenv("IMAGE_MAX_SIZE", "2000")),
+            adaptive_quality=os.getenv("ADAPTIVE_QUALITY", "false").lower() == "true",
+            ssim_target=float(os.getenv("SSIM_TARGET", "0.99")),
+            duplicate_photos=os.getenv("DUPLICATE_PHOTOS", "warn").lower(),
+            duplicate_distance=int(os.getenv("DUPLICATE_DISTANCE", "8")),
             debug=os.getenv("DEBUG", "false").lower() == "true",
             admin_id=int(os.getenv("ADMIN_ID")) if os.getenv("ADMIN_ID") else None,
             enable_buttons=os.getenv("ENABLE_BUTTONS", "true").lower() == "true",
             button_timeout=int(os.getenv("BUTTON_TIMEOUT", "3600")),
+            render_workers=int(os.getenv("RENDER_WORKERS", "2")),
+            page_workers=int(os.getenv("PAGE_WORKERS", "0")),
+            docx_compress_level=int(os.getenv("DOCX_COMPRESS_LEVEL", "6")),
+            loop_lag_threshold_ms=int(os.getenv("LOOP_LAG_THRESHOLD_MS", "250")),
+            flight_recorder_size=int(os.getenv("FLIGHT_RECORDER_SIZE", "200")),
+            flight_recorder_file=os.getenv("FLIGHT_RECORDER_FILE", cls.flight_recorder_file),
+            preview_max_pages=int(os.getenv("PREVIEW_MAX_PAGES", "10")),
+            progress_update_interval=float(os.getenv("PROGRESS_UPDATE_INTERVAL", "2.0")),
+            outbound_global_rate=float(os.getenv("OUTBOUND_GLOBAL_RATE", "30")),
+            outbound_chat_rate=float(os.getenv("OUTBOUND_CHAT_RATE", "1")),
+            outbound_chat_burst=int(os.getenv("OUTBOUND_CHAT_BURST", "3")),
+            read_timeout=float(os.getenv("READ_TIMEOUT", "60")),
+            write_timeout=float(os.getenv("WRITE_TIMEOUT", "60")),
+            connect_timeout=float(os.getenv("CONNECT_TIMEOUT", "30")),
+            pool_timeout=float(os.getenv("POOL_TIMEOUT", "30")),
+            download_timeout=float(os.getenv("DOWNLOAD_TIMEOUT", "120")),
+            upload_timeout=float(os.getenv("UPLOAD_TIMEOUT", "300")),
+            api_pool_size=int(os.getenv("API_POOL_SIZE", "8")),
+            download_pool_size=int(os.getenv("DOWNLOAD_POOL_SIZE", "4")),
+            upload_pool_size=int(os.getenv("UPLOAD_POOL_SIZE", "2")),
+            http2=os.getenv("HTTP2", "false").lower() == "true",
+            http_keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+            output_cache_dir=os.getenv(
+                "OUTPUT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "appraiser_photo_bot_cache")
+            ),
+            output_cache_max_mb=int(os.getenv("OUTPUT_CACHE_MAX_MB", "512")),
+            output_cache_ttl=int(os.getenv("OUTPUT_CACHE_TTL", "86400")),
+            send_retries=int(os.getenv("SEND_RETRIES", "3")),
+            local_mode=os.getenv("LOCAL_MODE", "false").lower() == "true",
+            temp_quota_mb=int(os.getenv("TEMP_QUOTA_MB", "1024")),
+            api_enabled=os.getenv("API_ENABLED", "false").lower() == "true",
+            api_host=os.getenv("API_HOST", "127.0.0.1"),
+            api_port=int(os.getenv("API_PORT", "8080")),
+            api_token=os.getenv("API_TOKEN") or None,
+            api_max_upload_mb=int(os.getenv("API_MAX_UPLOAD_MB", "200")),
+            bot_api_url=os.getenv("BOT_API_URL", "https://api.telegram.org/bot"),
+            bot_api_file_url=os.getenv("BOT_API_FILE_URL", "https://api.telegram.org/file/bot"),
         )
+
+    @property
+    def max_document_mb(self) -> float:
+        """Максимальный размер отправляемого документа (с запасом до лимита Bot API)."""
+        # Облачный Bot API принимает до 50 MB, локальный сервер - до 2000 MB
+        return 1950.0 if self.local_mode else 45.0
+
+    @property
+    def adaptive_ssim_target(self) -> Optional[float]:
+        """Целевой SSIM для подбора качества при сжатии или None, если качество фиксированное."""
+        return self.ssim_target if self.adaptive_quality else None
+
+    @property
+    def max_archive_mb(self) -> float:
+        """Максимальный размер ZIP-архива с фото, который бот может получить."""
+        # Облачный Bot API отдает боту файлы до 20 MB
+        return 1950.0 if self.local_mode else 20.0
@@ -1,31 +1,39 @@
 """
 Модуль для создания Word документов с фотографиями в таблицах.
+
+Подмодули импортируются при первом обращении к атрибуту пакета, чтобы
+Telegram-часть бота запускалась без загрузки python-docx, lxml и Pillow.
 """
 
-from .constants import SIZE_OPTIONS
-from .document_base import (
-    create_document_with_table,
-    create_single_page_document,
-    set_table_borders,
-)
-from .document_creator import DocumentCreator
-from .messages import MessageGenerator
-from .temp_manager import (
-    TempFileManager,
-    cleanup_all_temp_files,
-    cleanup_old_temp_files,
-)
-from .utils import (
-    calculate_auto_size,
-    calculate_pages_info,
-    compress_image,
-    get_size_option_name,
-    split_into_pages,
-)
+import importlib
+from typing import Any, Dict
+
+# Имя атрибута → подмодуль, в котором он определен
+_LAZY_ATTRIBUTES: Dict[str, str] = {
+    "SIZE_OPTIONS": "constants",
+    "create_single_page_document": "document_base",
+    "create_document_with_table": "document_base",
+    "set_table_borders": "document_base",
+    "DocumentCreator": "document_creator",
+    "MessageGenerator": "messages",
+    "message_generator": "messages",
+    "TempFileManager": "temp_manager",
+    "cleanup_old_temp_files": "temp_manager",
+    "cleanup_all_temp_files": "temp_manager",
+    "calculate_auto_size": "utils",
+    "calculate_pages_info": "utils",
+    "compress_image": "utils",
+    "create_contact_sheet": "utils",
+    "create_contact_sheets": "utils",
+    "get_size_option_name": "utils",
+    "split_into_pages": "utils",
+}
 
 __all__ = [
     "SIZE_OPTIONS",
     "compress_image",
+    "create_contact_sheet",
+    "create_contact_sheets",
     "calculate_auto_size",
     "split_into_pages",
     "calculate_pages_info",
@@ -40,4 +48,15 @@ __all__ = [
     "cleanup_all_temp_files",
 ]
 
-message_generator = MessageGenerator()
+
+def __getattr__(name: str) -> Any:
+    module_name: str = _LAZY_ATTRIBUTES.get(name, "")
+    if not module_name:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value: Any = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,114 @@
+"""Подбор качества JPEG по SSIM: минимальное качество, при котором фото выглядит как оригинал.
+
+Требует NumPy (pip install "appraiser-photo-bot[adaptive]"). Без него сжатие
+использует фиксированное качество. Модуль импортируется из compress_image только
+при включенном ADAPTIVE_QUALITY.
+"""
+
+import io
+import logging
+from typing import Any, Optional
+
+from PIL import Image
+
+from .constants import ADAPTIVE_MIN_QUALITY, ADAPTIVE_QUALITY_STEP
+from .layout import photo_pixel_limits
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависимость необязательная
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Окна SSIM: 8×8 с шагом 4, перекрываются и захватывают границы блоков JPEG
+SSIM_WINDOW = 8
+SSIM_STRIDE = 4
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+_warned: bool = False
+
+
+def is_available() -> bool:
+    """Доступен ли подбор качества (установлен ли NumPy)."""
+    global _warned
+    if np is None and not _warned:
+        _warned = True
+        logger.warning('Для ADAPTIVE_QUALITY установите NumPy: pip install "appraiser-photo-bot[adaptive]"')
+    return np is not None
+
+
+def _window_sums(values: Any) -> Any:
+    """Суммы по окнам SSIM_WINDOW×SSIM_WINDOW с шагом SSIM_STRIDE через интегральное изображение."""
+    integral = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    w = SSIM_WINDOW
+    sums = integral[w:, w:] - integral[:-w, w:] - integral[w:, :-w] + integral[:-w, :-w]
+    return sums[::SSIM_STRIDE, ::SSIM_STRIDE]
+
+
+def ssim(reference: Any, candidate: Any) -> float:
+    """Средний SSIM двух полутоновых изображений (массивы float64 одного размера)."""
+    area: int = SSIM_WINDOW * SSIM_WINDOW
+    mean_x = _window_sums(reference) / area
+    mean_y = _window_sums(candidate) / area
+    var_x = _window_sums(reference * reference) / area - mean_x**2
+    var_y = _window_sums(candidate * candidate) / area - mean_y**2
+    cov = _window_sums(reference * candidate) / area - mean_x * mean_y
+
+    index = ((2 * mean_x * mean_y + SSIM_C1) * (2 * cov + SSIM_C2)) / (
+        (mean_x**2 + mean_y**2 + SSIM_C1) * (var_x + var_y + SSIM_C2)
+    )
+    return float(index.mean())
+
+
+def probe_size(width: int, height: int) -> int:
+    """Наибольшая сторона фото на странице в пикселях, если оно займет ее одно (auto, 1×1).
+
+    Это самый крупный вариант размещения при DOCUMENT_IMAGE_DPI: в таблицах с несколькими
+    фото или с фиксированным размером фото на странице меньше, и артефакты заметны слабее.
+    """
+    return photo_pixel_limits([height / width], 1, 1, "auto")[0]
+
+
+def _encoded(gray: Any, quality: int) -> Any:
+    """Копия, сжатая в JPEG с заданным качеством и снова декодированная."""
+    buffer: io.BytesIO = io.BytesIO()
+    gray.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    with Image.open(buffer) as decoded:
+        return np.asarray(decoded, dtype=np.float64)
+
+
+def choose_quality(image: Any, max_quality: int, target: float, min_quality: int = ADAPTIVE_MIN_QUALITY) -> int:
+    """Минимальное качество из [min_quality, max_quality], при котором SSIM не ниже target.
+
+    Яркость уменьшается до размера фото на странице (probe_size), и каждый кандидат
+    сжимается и сравнивается в этом размере: так оценка идет в масштабе, в котором фото
+    видно в документе, а двоичный поиск не кодирует полноразмерное фото на каждом шаге.
+    SSIM растет с качеством, поэтому кандидаты перебираются двоичным поиском.
+    """
+    if min_quality >= max_quality or np is None:
+        return max_quality
+
+    gray = image.convert("L")
+    if min(gray.size) < SSIM_WINDOW:
+        return max_quality
+    size: int = probe_size(*gray.size)
+    gray.thumbnail((size, size), Image.Resampling.LANCZOS)
+    if min(gray.size) < SSIM_WINDOW:
+        return max_quality
+    reference = np.asarray(gray, dtype=np.float64)
+
+    candidates = list(range(min_quality, max_quality, ADAPTIVE_QUALITY_STEP)) + [max_quality]
+    best: Optional[int] = None
+    low, high = 0, len(candidates) - 1
+    while low <= high:
+        middle: int = (low + high) // 2
+        if ssim(reference, _encoded(gray, candidates[middle])) >= target:
+            best = candidates[middle]
+            high = middle - 1
+        else:
+            low = middle + 1
+
+    return best if best is not None else max_quality
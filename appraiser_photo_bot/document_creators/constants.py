@@ -2,11 +2,6 @@
 Константы для создания документов.
 """
 
-from PIL import ImageFile
-
-# Разрешить загрузку усеченных изображений
-ImageFile.LOAD_TRUNCATED_IMAGES = True
-
 # Опции для размера изображений
 SIZE_OPTIONS = {
     "small": (3.0, 3.0),  # см
@@ -27,6 +22,56 @@ DEFAULT_MARGINS = {
     "bottom": 1.0,  # см
 }
 
+# Расширения файлов изображений (пакетный режим, ZIP-архивы)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff", ".heic")
+
 # Максимальные размеры
 MAX_IMAGE_SIZE = 1200  # пикселей
 DEFAULT_IMAGE_QUALITY = 70
+
+# Раскладка страницы: отступ вокруг фото в ячейке, наибольший размер фото в режиме auto,
+# место под заголовок таблицы
+CELL_PADDING_CM = 0.2
+AUTO_MAX_IMAGE_CM = 10.0
+TITLE_RESERVE_CM = 1.0
+
+# Фото в документе: разрешение для размера на странице и верхняя граница по большей стороне
+DOCUMENT_IMAGE_DPI = 200
+DOCUMENT_MAX_IMAGE_SIZE = 2000  # пикселей
+
+# Подбор качества по SSIM (ADAPTIVE_QUALITY): нижняя граница, шаг перебора и целевой SSIM
+# по умолчанию. Оценка идет в размере фото на странице (adaptive_quality.probe_size)
+ADAPTIVE_MIN_QUALITY = 40
+ADAPTIVE_QUALITY_STEP = 5
+DEFAULT_SSIM_TARGET = 0.99
+
+# JPEG без перекодирования: качество по таблицам квантования не выше целевого + запас,
+# и не больше заданного числа бит на пиксель (иначе в файле много метаданных или мало сжатия)
+JPEG_PASSTHROUGH_QUALITY_MARGIN = 5
+JPEG_PASSTHROUGH_MAX_BPP = 4.0
+
+# Стандартная таблица квантования яркости IJG (качество 50), по ней оценивается качество JPEG
+IJG_LUMINANCE_TABLE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)  # fmt: skip
+
+# Превью страниц (контактный лист) перед созданием документа
+PREVIEW_CELL_SIZE = 160  # пикселей
+PREVIEW_GAP = 6  # пикселей
+PREVIEW_QUALITY = 60
+
+# Детерминированный .docx: фиксированные метки времени в ZIP и свойствах документа
+DOCX_ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+DOCX_CORE_TIMESTAMP = (2000, 1, 1, 0, 0, 0)
+
+# Упаковка .docx: уровень deflate для XML-частей и медиа, которые хранятся без сжатия
+# (JPEG и PNG уже сжаты, deflate тратит на них время почти без выигрыша)
+DEFAULT_DOCX_COMPRESS_LEVEL = 6
+DOCX_STORED_EXTENSIONS = (".jpeg", ".jpg", ".png", ".gif", ".webp", ".tif", ".tiff")
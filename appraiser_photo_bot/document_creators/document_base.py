@@ -1,22 +1,54 @@
 """Базовые функции для создания документов Word."""
 
+import copy
 import io
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 from docx import Document
 from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_TABLE_ALIGNMENT
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml import OxmlElement, parse_xml
 from docx.oxml.ns import qn
 from docx.shared import Cm, Pt, RGBColor
-
-from .constants import A4_HEIGHT_CM, A4_WIDTH_CM, DEFAULT_MARGINS, SIZE_OPTIONS
-from .utils import calculate_auto_size, split_into_pages
+from lxml import etree
+
+from .constants import (
+    A4_HEIGHT_CM,
+    A4_WIDTH_CM,
+    DEFAULT_DOCX_COMPRESS_LEVEL,
+    DEFAULT_MARGINS,
+    DOCX_CORE_TIMESTAMP,
+    SIZE_OPTIONS,
+)
+from .layout import PageLayout, page_layout, photo_aspects
+from .shared_photos import SharedSlice
+from .utils import ProgressCallback, calculate_auto_size, split_into_pages, write_docx_zip
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PageFragment:
+    """Страница без заголовка, пригодная для передачи между процессами.
+
+    Document из python-docx не сериализуется, поэтому страница, отрисованная
+    в рабочем процессе, возвращается как XML элементов тела и изображения по rId.
+    """
+
+    elements: List[bytes] = field(default_factory=list)
+    images: Dict[str, bytes] = field(default_factory=dict)
+    # Изображения, оставленные рабочим процессом в общей памяти (см. shared_photos)
+    shared_images: Dict[str, SharedSlice] = field(default_factory=dict)
+
+
+# Готовая страница: отрисованная в этом процессе (Document) или в рабочем (PageFragment)
+RenderedPage = Union["Document", PageFragment]
+
+
 def set_table_borders(table: Any, visible: bool = False) -> None:
     """Устанавливает видимость границ таблицы."""
     tbl = table._element
@@ -132,15 +164,49 @@ def get_image_width_for_table(
     return Cm(size_cm[0])
 
 
-def create_single_page_document(
-    photos: List[bytes],
-    rows: int,
-    cols: int,
-    table_title: str,
-    image_size_option: str = "auto",
-) -> Document:
-    """Создает одностраничный документ с таблицей из фотографий."""
+def set_fixed_core_properties(doc: Document) -> None:
+    """Фиксирует даты и ревизию в свойствах документа, чтобы вывод был воспроизводимым."""
+    fixed: datetime = datetime(*DOCX_CORE_TIMESTAMP)
+    properties = doc.core_properties
+    properties.created = fixed
+    properties.modified = fixed
+    properties.last_printed = fixed
+    properties.revision = 1
+    properties.last_modified_by = ""
+
+
+class _PartCollector:
+    """Вместо ZIP-файла собирает части пакета в словарь (имя в архиве → содержимое)."""
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, bytes] = {}
+
+    def write(self, pack_uri: Any, blob: bytes) -> None:
+        self.entries[pack_uri.membername] = blob
+
+
+def save_document(doc: Document, target: BinaryIO, compress_level: int = DEFAULT_DOCX_COMPRESS_LEVEL) -> None:
+    """Сохраняет документ сразу в детерминированный .docx (см. write_docx_zip).
+
+    Части пакета сериализуются так же, как в doc.save(), но ZIP пишется один раз:
+    без deflate для фото и без распаковки и повторного сжатия всего архива.
+    """
+    package = doc.part.package
+    parts: List[Any] = package.parts
+    for part in parts:
+        part.before_marshal()
+
+    collector: _PartCollector = _PartCollector()
+    PackageWriter._write_content_types_stream(collector, parts)
+    PackageWriter._write_pkg_rels(collector, package.rels)
+    PackageWriter._write_parts(collector, parts)
+    write_docx_zip(collector.entries, target, compress_level)
+
+
+def create_base_document() -> Document:
+    """Создает пустой документ с настройками страницы A4 и шрифтом по умолчанию."""
     doc: Document = Document()
+    set_fixed_core_properties(doc)
 
     style = doc.styles["Normal"]
     style.font.name = "Times New Roman"
@@ -155,17 +221,52 @@ def create_single_page_document(
     section.top_margin = Cm(DEFAULT_MARGINS["top"])
     section.bottom_margin = Cm(DEFAULT_MARGINS["bottom"])
 
+    return doc
+
+
+def add_title_paragraph(doc: Document, title: str) -> None:
+    """Добавляет в документ абзац заголовка таблицы."""
+    title_paragraph = doc.add_paragraph()
+    title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    run = title_paragraph.add_run(title)
+    run.font.name = "Times New Roman"
+    run.font.bold = True
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    title_paragraph.paragraph_format.space_after = Pt(12)
+
+
+def get_page_title(table_title: Optional[str], page_num: int, total_pages: int) -> str:
+    """Возвращает заголовок страницы многостраничного документа."""
+    if total_pages == 1:
+        return table_title or ""
     if table_title:
-        title_paragraph = doc.add_paragraph()
-        title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        return f"{table_title} (стр. {page_num} из {total_pages})"
+    if page_num == 1:
+        return ""
+    return f"Страница {page_num} из {total_pages}"
 
-        run = title_paragraph.add_run(table_title)
-        run.font.name = "Times New Roman"
-        run.font.bold = True
-        run.font.size = Pt(12)
-        run.font.color.rgb = RGBColor(0, 0, 0)
 
-        title_paragraph.paragraph_format.space_after = Pt(12)
+def create_single_page_document(
+    photos: List[bytes],
+    rows: int,
+    cols: int,
+    table_title: str,
+    image_size_option: str = "auto",
+    aspects: Optional[Sequence[float]] = None,
+) -> Document:
+    """Создает одностраничный документ с таблицей из фотографий.
+
+    Фото вставляются в своих пропорциях: высота строки подбирается по самому
+    высокому фото в ней (см. layout.page_layout), а не равна ширине ячейки.
+    aspects - уже известные пропорции фото (иначе читаются из заголовков).
+    """
+    doc: Document = create_base_document()
+
+    if table_title:
+        add_title_paragraph(doc, table_title)
 
     table = doc.add_table(rows=rows, cols=cols)
     table.alignment = WD_TABLE_ALIGNMENT.CENTER
@@ -173,9 +274,10 @@ def create_single_page_document(
     table.autofit = False
     table.allow_autofit = False
 
-    image_width: Cm = get_image_width_for_table(rows, cols, image_size_option)
-    cell_width: Cm = image_width + Cm(0.2)
-    cell_height: Cm = image_width + Cm(0.2)
+    if aspects is None:
+        aspects = photo_aspects(photos[: rows * cols])
+    layout: PageLayout = page_layout(aspects[: rows * cols], rows, cols, image_size_option)
+    cell_width: Cm = Cm(layout.cell_width)
 
     for row_idx in range(rows):
         for col_idx in range(cols):
@@ -207,8 +309,9 @@ def create_single_page_document(
                     run = paragraph.add_run()
 
                     image_stream: io.BytesIO = io.BytesIO(photos[photo_index])
+                    image_width, image_height = layout.image_sizes[photo_index]
                     try:
-                        run.add_picture(image_stream, width=image_width)
+                        run.add_picture(image_stream, width=Cm(image_width), height=Cm(image_height))
                     except Exception as e:
                         logger.error(f"Ошибка при добавлении изображения: {e}")
                         run.add_text("[Изображение]")
@@ -216,9 +319,9 @@ def create_single_page_document(
                 cell = table.cell(row_idx, col_idx)
                 cell.text = ""
 
-    for row in table.rows:
+    for row, row_height in zip(table.rows, layout.row_heights, strict=True):
         row.height_rule = 1
-        row.height = cell_height
+        row.height = Cm(row_height)
 
         for cell in row.cells:
             cell.width = cell_width
@@ -242,38 +345,120 @@ def create_multi_page_document(
     cols: int,
     table_title: str,
     image_size_option: str = "auto",
+    prerendered_pages: Optional[Dict[int, RenderedPage]] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    aspects: Optional[Sequence[float]] = None,
 ) -> Document:
-    """Создает многостраничный документ с таблицами из фотографий."""
-    pages: List[List[bytes]] = split_into_pages(photos, rows, cols)
-
-    if len(pages) == 1:
-        return create_single_page_document(photos, rows, cols, table_title, image_size_option)
+    """Создает многостраничный документ с таблицами из фотографий.
 
-    first_page: Document = create_single_page_document(
-        pages[0],
-        rows,
-        cols,
-        f"{table_title} (стр. 1 из {len(pages)})" if table_title else "",
-        image_size_option,
-    )
-
-    for page_num, page_photos in enumerate(pages[1:], 2):
-        first_page.add_page_break()
-
-        page_doc: Document = create_single_page_document(
-            page_photos,
-            rows,
-            cols,
-            f"{table_title} (стр. {page_num} из {len(pages)})"
-            if table_title
-            else f"Страница {page_num} из {len(pages)}",
-            image_size_option,
-        )
-
-        for element in page_doc.element.body:
-            first_page.element.body.append(element)
-
-    return first_page
+    prerendered_pages - уже отрисованные страницы без заголовков (индекс страницы → документ
+    или фрагмент), для них фото из photos не используются.
+    aspects - пропорции всех фото в порядке photos (иначе читаются из заголовков по страницам).
+    """
+    pages: List[List[bytes]] = split_into_pages(photos, rows, cols)
+    prerendered_pages = prerendered_pages or {}
+
+    if len(pages) == 1 and not prerendered_pages:
+        document: Document = create_single_page_document(photos, rows, cols, table_title, image_size_option, aspects)
+        if progress_callback:
+            progress_callback("render", 1, 1)
+        return document
+
+    document = create_base_document()
+
+    for page_num, page_photos in enumerate(pages, 1):
+        if page_num > 1:
+            document.add_page_break()
+
+        page_title: str = get_page_title(table_title, page_num, len(pages))
+        if page_title:
+            add_title_paragraph(document, page_title)
+
+        page: Optional[RenderedPage] = prerendered_pages.get(page_num - 1)
+        if isinstance(page, PageFragment):
+            append_page_fragment(document, page)
+        else:
+            if page is None:
+                start: int = (page_num - 1) * len(pages[0])
+                page_aspects: Optional[Sequence[float]] = (
+                    aspects[start : start + len(page_photos)] if aspects is not None else None
+                )
+                page = create_single_page_document(page_photos, rows, cols, "", image_size_option, page_aspects)
+            append_page_document(document, page)
+
+        if progress_callback:
+            progress_callback("render", page_num, len(pages))
+
+    image_parts: int = len(document.part.package.image_parts)
+    logger.info(f"Изображений в документе: {len(photos)}, уникальных медиа-частей: {image_parts}")
+
+    return document
+
+
+def append_page_document(target: Document, page_doc: Document) -> None:
+    """Копирует содержимое страницы в целевой документ с перепривязкой изображений.
+
+    Каждое изображение страницы заново регистрируется в пакете целевого документа.
+    python-docx ищет уже добавленные изображения по SHA1 содержимого, поэтому
+    повторяющиеся фото (в том числе на разных страницах) ссылаются на одну медиа-часть.
+    Исходный документ страницы не изменяется.
+    """
+    source_part = page_doc.part
+    elements: List[Any] = [copy.deepcopy(element) for element in page_doc.element.body if element.tag != qn("w:sectPr")]
+    append_body_elements(target, elements, lambda rid: source_part.related_parts[rid].blob)
+
+
+def page_fragment(page_doc: Document) -> PageFragment:
+    """Сериализует страницу (таблицу без заголовка) во фрагмент."""
+    part = page_doc.part
+    fragment: PageFragment = PageFragment()
+    for element in page_doc.element.body:
+        if element.tag == qn("w:sectPr"):
+            continue
+        fragment.elements.append(etree.tostring(element))
+        for blip in element.iter(qn("a:blip")):
+            rid: Optional[str] = blip.get(qn("r:embed"))
+            if rid and rid not in fragment.images:
+                fragment.images[rid] = part.related_parts[rid].blob
+    return fragment
+
+
+def append_page_fragment(target: Document, fragment: PageFragment) -> None:
+    """Вставляет фрагмент страницы в целевой документ (как append_page_document)."""
+    elements: List[Any] = [parse_xml(xml) for xml in fragment.elements]
+    append_body_elements(target, elements, fragment.images.__getitem__)
+
+
+def append_body_elements(target: Document, elements: List[Any], image_blob: Callable[[str], bytes]) -> None:
+    """Добавляет элементы в конец тела документа, перепривязывая изображения и id фигур.
+
+    image_blob возвращает содержимое изображения по rId источника.
+    """
+    target_part = target.part
+    rid_map: Dict[str, str] = {}
+
+    next_shape_id: int = target_part.next_id
+    for element in elements:
+        for blip in element.iter(qn("a:blip")):
+            old_rid: Optional[str] = blip.get(qn("r:embed"))
+            if not old_rid:
+                continue
+            if old_rid not in rid_map:
+                new_rid, _ = target_part.get_or_add_image(io.BytesIO(image_blob(old_rid)))
+                rid_map[old_rid] = new_rid
+            blip.set(qn("r:embed"), rid_map[old_rid])
+
+        for doc_pr in element.iter(qn("wp:docPr")):
+            doc_pr.set("id", str(next_shape_id))
+            next_shape_id += 1
+
+    target_body = target.element.body
+    target_sect_pr = target_body.sectPr
+    for element in elements:
+        if target_sect_pr is not None:
+            target_sect_pr.addprevious(element)
+        else:
+            target_body.append(element)
 
 
 create_document_with_table = create_single_page_document
@@ -2,17 +2,47 @@
 
 import io
 import logging
-from typing import List, Optional
+from concurrent.futures import BrokenExecutor, Executor, Future, wait
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Iterable, List, Optional, Set
 
 from docx import Document
 
-from .document_base import create_multi_page_document, create_single_page_document
+from ..flight_recorder import JobTrace
+from .constants import DEFAULT_DOCX_COMPRESS_LEVEL
+from .document_base import (
+    PageFragment,
+    RenderedPage,
+    create_multi_page_document,
+    create_single_page_document,
+    page_fragment,
+    save_document,
+)
+from .layout import photo_aspects, photo_pixel_limits
+from .shared_photos import SharedPhotoBuffer, SharedSlice, page_region, read_slices, write_slices
 from .temp_manager import TempFileManager
-from .utils import compress_photos_for_document
+from .utils import ProgressCallback, compress_photos_for_document, split_into_pages
 
 logger = logging.getLogger(__name__)
 
 
+def render_page_fragment(page_photos: List[bytes], rows: int, cols: int, size_option: str) -> PageFragment:
+    """Сжимает фото и отрисовывает одну страницу. Выполняется в рабочем процессе."""
+    return page_fragment(DocumentCreator(rows=rows, cols=cols, size_option=size_option).render_page(page_photos))
+
+
+def render_shared_page_fragment(page_slices: List[SharedSlice], rows: int, cols: int, size_option: str) -> PageFragment:
+    """Как render_page_fragment, но фото берутся из общей памяти, и изображения страницы
+    записываются туда же, на место исходных фото страницы.
+    """
+    fragment: PageFragment = render_page_fragment(read_slices(page_slices), rows, cols, size_option)
+    slices: Optional[List[SharedSlice]] = write_slices(page_region(page_slices), iter(fragment.images.values()))
+    if slices is not None:
+        fragment.shared_images = dict(zip(fragment.images, slices, strict=True))
+        fragment.images = {}
+    return fragment
+
+
 class DocumentCreator:
     """Упрощенный создатель документов."""
 
@@ -23,78 +53,285 @@ class DocumentCreator:
         cols: int = 1,
         size_option: str = "medium",
         use_temp_files: bool = True,
+        progress_callback: Optional[ProgressCallback] = None,
+        page_executor: Optional[Executor] = None,
+        docx_compress_level: int = DEFAULT_DOCX_COMPRESS_LEVEL,
+        trace: Optional[JobTrace] = None,
     ) -> None:
         self.title: Optional[str] = title
         self.rows: int = rows
         self.cols: int = cols
         self.size_option: str = size_option
         self.use_temp_files: bool = use_temp_files
-        self.temp_manager: TempFileManager = TempFileManager()
+        # Создается только на пути через временный файл: рабочим процессам страниц он не нужен
+        self._temp_manager: Optional[TempFileManager] = None
+        self.progress_callback: Optional[ProgressCallback] = progress_callback
+        # Пул процессов для параллельной отрисовки страниц одного документа (PAGE_WORKERS)
+        self.page_executor: Optional[Executor] = page_executor
+        # Пул сломан (рабочий процесс погиб): владелец пула должен заменить его новым
+        self.page_executor_broken: bool = False
+        # Уровень deflate для XML-частей .docx (фото хранятся без сжатия)
+        self.docx_compress_level: int = docx_compress_level
+        # Трасса задания для бортового самописца: этапы, путь сборки, число страниц
+        self.trace: Optional[JobTrace] = trace
+
+    @property
+    def temp_manager(self) -> TempFileManager:
+        if self._temp_manager is None:
+            self._temp_manager = TempFileManager()
+        return self._temp_manager
+
+    def _stage(self, name: str) -> ContextManager[None]:
+        """Замер этапа в трассе задания (или ничего, если трассы нет)."""
+        return self.trace.stage(name) if self.trace else nullcontext()
+
+    def _engine(self, name: str) -> None:
+        if self.trace:
+            self.trace.add_engine(name)
+
+    def _report(self, stage: str, done: int, total: int) -> None:
+        """Сообщает о прогрессе этапа, если задан колбэк."""
+        if self.progress_callback:
+            self.progress_callback(stage, done, total)
+
+    def _compress(
+        self, photos: List[bytes], aspects: List[float], progress_callback: Optional[ProgressCallback] = None
+    ) -> List[bytes]:
+        """Сжимает фото страниц до разрешения, нужного для их размера в таблице.
+
+        Сжатие сохраняет пропорции, поэтому aspects исходных фото подходят и для верстки сжатых.
+        """
+        with self._stage("compress"):
+            max_sizes: List[int] = photo_pixel_limits(aspects, self.rows, self.cols, self.size_option)
+            return compress_photos_for_document(photos, progress_callback=progress_callback, max_sizes=max_sizes)
+
+    def _aspects(self, photos: List[bytes], skip_pages: Iterable[int] = ()) -> List[float]:
+        """Пропорции фото задания (один раз на задание); для страниц skip_pages не читаются."""
+        skip: Set[int] = set(skip_pages)
+        aspects: List[float] = []
+        for page_index, page_photos in enumerate(split_into_pages(photos, self.rows, self.cols)):
+            aspects.extend([0.0] * len(page_photos) if page_index in skip else photo_aspects(page_photos))
+        return aspects
+
+    def create_document(
+        self, photos: List[bytes], prerendered_pages: Optional[Dict[int, RenderedPage]] = None
+    ) -> bytes:
+        """Создает документ с фотографиями.
 
-    def create_document(self, photos: List[bytes]) -> bytes:
-        """Создает документ с фотографиями."""
-        compressed_photos: List[bytes] = compress_photos_for_document(photos)
+        prerendered_pages - страницы, заранее отрисованные через render_page (индекс → документ).
+        С page_executor недостающие страницы отрисовываются параллельно в рабочих процессах.
+        """
+        pages: List[List[bytes]] = split_into_pages(photos, self.rows, self.cols)
+        if self.page_executor is not None and len(pages) - len(prerendered_pages or {}) > 1:
+            rendered: Dict[int, RenderedPage] = dict(prerendered_pages or {})
+            self._engine("workers")
+            with self._stage("workers"):
+                rendered.update(self._render_in_workers(pages, rendered))
+            return self._create_multi_page(photos, rendered)
+
+        if prerendered_pages:
+            logger.info(f"Используются заранее отрисованные страницы: {len(prerendered_pages)}")
+            self._engine("prerendered")
+            aspects: List[float] = self._aspects(photos, prerendered_pages)
+            compressed: List[bytes] = self._compress_remaining(photos, aspects, prerendered_pages)
+            return self._create_multi_page(compressed, prerendered_pages, aspects)
+
+        aspects = self._aspects(photos)
+        compressed_photos: List[bytes] = self._compress(photos, aspects, self.progress_callback)
 
         photos_per_page: int = self.rows * self.cols
         if photos_per_page <= 0 or len(compressed_photos) <= photos_per_page:
-            return self._create_single_page(compressed_photos)
+            return self._create_single_page(compressed_photos, aspects)
 
-        return self._create_multi_page(compressed_photos)
+        return self._create_multi_page(compressed_photos, aspects=aspects)
 
-    def _create_single_page(self, photos: List[bytes]) -> bytes:
-        """Создает одностраничный документ."""
-        doc: Document = create_single_page_document(
-            photos=photos,
+    def render_page(self, page_photos: List[bytes]) -> Document:
+        """Отрисовывает одну страницу (таблицу без заголовка) для последующей сборки."""
+        aspects: List[float] = photo_aspects(page_photos)
+        compressed_photos: List[bytes] = self._compress(page_photos, aspects)
+        return create_single_page_document(
+            photos=compressed_photos,
             rows=self.rows,
             cols=self.cols,
-            table_title=self.title,
+            table_title="",
             image_size_option=self.size_option,
+            aspects=aspects,
         )
-        buffer: io.BytesIO = io.BytesIO()
-        doc.save(buffer)
-        return buffer.getvalue()
 
-    def _create_multi_page(self, photos: List[bytes]) -> bytes:
-        """Создает многостраничный документ."""
-        if self.use_temp_files and len(photos) > 10:
-            return self._create_via_temp_file(photos)
-        else:
-            return self._create_in_memory(photos)
+    def _render_in_workers(
+        self, pages: List[List[bytes]], prerendered_pages: Dict[int, RenderedPage]
+    ) -> Dict[int, RenderedPage]:
+        """Отрисовывает недостающие страницы на пуле процессов, собирая результаты по порядку страниц.
 
-    def _create_in_memory(self, photos: List[bytes]) -> bytes:
-        """Создает документ в памяти."""
+        Фото передаются через общую память (если ее хватает), а не копированием через pickle.
+        Страница, которую не удалось отрисовать в рабочем процессе, отрисовывается здесь;
+        если пул сломан или остановлен, здесь отрисовываются и все еще не отправленные страницы.
+        """
+        indices: List[int] = [index for index in range(len(pages)) if index not in prerendered_pages]
+        buffer: Optional[SharedPhotoBuffer] = SharedPhotoBuffer.create(
+            [photo for index in indices for photo in pages[index]]
+        )
+        futures: Dict[int, Future] = {}
         try:
-            doc: Document = create_multi_page_document(
+            position: int = 0
+            for index in indices:
+                try:
+                    if buffer is not None:
+                        page_slices: List[SharedSlice] = buffer.slices[position : position + len(pages[index])]
+                        futures[index] = self.page_executor.submit(
+                            render_shared_page_fragment, page_slices, self.rows, self.cols, self.size_option
+                        )
+                    else:
+                        futures[index] = self.page_executor.submit(
+                            render_page_fragment, pages[index], self.rows, self.cols, self.size_option
+                        )
+                except RuntimeError as e:
+                    # BrokenProcessPool после гибели рабочего процесса или отказ остановленного пула
+                    logger.warning(f"Пул процессов недоступен, страницы отрисовываются здесь: {e!r}")
+                    self._mark_broken(e)
+                    break
+                position += len(pages[index])
+            logger.info(f"Страниц на отрисовку в рабочих процессах: {len(futures)} из {len(indices)}")
+
+            total: int = sum(len(pages[index]) for index in indices)
+            done: int = 0
+            rendered: Dict[int, RenderedPage] = {}
+            for index in indices:
+                future: Optional[Future] = futures.get(index)
+                if future is None:
+                    rendered[index] = self.render_page(pages[index])
+                else:
+                    try:
+                        fragment: PageFragment = future.result()
+                        if buffer is not None:
+                            for rid, item in fragment.shared_images.items():
+                                fragment.images[rid] = buffer.read(item)
+                            fragment.shared_images = {}
+                        rendered[index] = fragment
+                    except Exception as e:
+                        logger.warning(f"Страница {index + 1} не отрисована в рабочем процессе: {e!r}")
+                        self._mark_broken(e)
+                        rendered[index] = self.render_page(pages[index])
+                done += len(pages[index])
+                self._report("compress", done, total)
+            return rendered
+        finally:
+            if buffer is not None:
+                # Сегмент удаляется только после завершения всех задач, которые могут в него писать
+                for pending in futures.values():
+                    pending.cancel()
+                wait(futures.values())
+                buffer.close()
+
+    def _mark_broken(self, error: BaseException) -> None:
+        if isinstance(error, BrokenExecutor):
+            self.page_executor_broken = True
+
+    def _compress_remaining(
+        self, photos: List[bytes], aspects: List[float], prerendered_pages: Dict[int, RenderedPage]
+    ) -> List[bytes]:
+        """Сжимает только фото страниц, которые еще не отрисованы."""
+        result: List[bytes] = []
+        for page_index, page_photos in enumerate(split_into_pages(photos, self.rows, self.cols)):
+            if page_index in prerendered_pages:
+                result.extend(page_photos)
+            else:
+                start: int = len(result)
+                result.extend(self._compress(page_photos, aspects[start : start + len(page_photos)]))
+            self._report("compress", len(result), len(photos))
+        return result
+
+    def _create_single_page(self, photos: List[bytes], aspects: Optional[List[float]] = None) -> bytes:
+        """Создает одностраничный документ."""
+        self._engine("single_page")
+        with self._stage("layout"):
+            doc: Document = create_single_page_document(
                 photos=photos,
                 rows=self.rows,
                 cols=self.cols,
                 table_title=self.title,
                 image_size_option=self.size_option,
+                aspects=aspects,
             )
-            buffer: io.BytesIO = io.BytesIO()
-            doc.save(buffer)
-            return buffer.getvalue()
+        self._report("render", 1, 1)
+        return self._save_to_bytes(doc)
+
+    def _save_to_bytes(self, doc: Document) -> bytes:
+        """Сохраняет документ в байты (детерминированно: одинаковый вход - одинаковый файл)."""
+        self._report("save", 0, 1)
+        buffer: io.BytesIO = io.BytesIO()
+        with self._stage("save"):
+            save_document(doc, buffer, self.docx_compress_level)
+        document_bytes: bytes = buffer.getvalue()
+        self._report("save", 1, 1)
+        return document_bytes
+
+    def _create_multi_page(
+        self,
+        photos: List[bytes],
+        prerendered_pages: Optional[Dict[int, RenderedPage]] = None,
+        aspects: Optional[List[float]] = None,
+    ) -> bytes:
+        """Создает многостраничный документ."""
+        if self.use_temp_files and len(photos) > 10:
+            return self._create_via_temp_file(photos, prerendered_pages, aspects)
+        else:
+            return self._create_in_memory(photos, prerendered_pages, aspects)
+
+    def _create_in_memory(
+        self,
+        photos: List[bytes],
+        prerendered_pages: Optional[Dict[int, RenderedPage]] = None,
+        aspects: Optional[List[float]] = None,
+    ) -> bytes:
+        """Создает документ в памяти."""
+        self._engine("in_memory")
+        try:
+            with self._stage("layout"):
+                doc: Document = create_multi_page_document(
+                    photos=photos,
+                    rows=self.rows,
+                    cols=self.cols,
+                    table_title=self.title,
+                    image_size_option=self.size_option,
+                    prerendered_pages=prerendered_pages,
+                    progress_callback=self.progress_callback,
+                    aspects=aspects,
+                )
+            return self._save_to_bytes(doc)
         except Exception as e:
             logger.error(f"Ошибка создания в памяти: {e}")
-            return self._create_via_temp_file(photos)
+            return self._create_via_temp_file(photos, prerendered_pages, aspects)
 
-    def _create_via_temp_file(self, photos: List[bytes]) -> bytes:
-        """Создает документ через временный файл."""
-        temp_file: Optional[str] = None
+    def _create_via_temp_file(
+        self,
+        photos: List[bytes],
+        prerendered_pages: Optional[Dict[int, RenderedPage]] = None,
+        aspects: Optional[List[float]] = None,
+    ) -> bytes:
+        """Создает документ через временный файл (удаляется сразу после чтения)."""
+        self._engine("temp_file")
         try:
-            temp_file = self.temp_manager.create_temp_file(suffix=".docx")
+            with self.temp_manager.temp_file(suffix=".docx") as temp_file:
+                with self._stage("layout"):
+                    doc: Document = create_multi_page_document(
+                        photos=photos,
+                        rows=self.rows,
+                        cols=self.cols,
+                        table_title=self.title,
+                        image_size_option=self.size_option,
+                        prerendered_pages=prerendered_pages,
+                        progress_callback=self.progress_callback,
+                        aspects=aspects,
+                    )
+                self._report("save", 0, 1)
+                with self._stage("save"):
+                    with open(temp_file, "wb") as f:
+                        save_document(doc, f, self.docx_compress_level)
 
-            doc: Document = create_multi_page_document(
-                photos=photos,
-                rows=self.rows,
-                cols=self.cols,
-                table_title=self.title,
-                image_size_option=self.size_option,
-            )
-            doc.save(temp_file)
-
-            with open(temp_file, "rb") as f:
-                document_bytes: bytes = f.read()
+                    with open(temp_file, "rb") as f:
+                        document_bytes: bytes = f.read()
+                self._report("save", 1, 1)
 
             file_size: float = len(document_bytes) / 1024 / 1024
             logger.info(f"Документ создан через файл: {file_size:.2f} MB")
@@ -104,9 +341,6 @@ class DocumentCreator:
         except Exception as e:
             logger.error(f"Ошибка при создании через файл: {e}")
             raise
-        finally:
-            if temp_file:
-                logger.debug(f"Временный файл зарегистрирован: {temp_file}")
 
     def create_table(self, photos: List[bytes]) -> bytes:
         """Старый метод для обратной совместимости."""
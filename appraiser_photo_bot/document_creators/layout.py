@@ -0,0 +1,100 @@
+"""Раскладка фото на странице с учетом пропорций."""
+
+import io
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from .constants import (
+    A4_HEIGHT_CM,
+    A4_WIDTH_CM,
+    AUTO_MAX_IMAGE_CM,
+    CELL_PADDING_CM,
+    DEFAULT_MARGINS,
+    DOCUMENT_IMAGE_DPI,
+    DOCUMENT_MAX_IMAGE_SIZE,
+    SIZE_OPTIONS,
+    TITLE_RESERVE_CM,
+)
+from .utils import _import_pil
+
+
+@dataclass
+class PageLayout:
+    """Геометрия таблицы одной страницы, см."""
+
+    cell_width: float
+    row_heights: List[float]
+    image_sizes: List[Tuple[float, float]]  # (ширина, высота) каждого фото страницы
+
+
+def photo_aspect(photo: bytes) -> float:
+    """Отношение высоты к ширине по заголовку изображения (без декодирования)."""
+    try:
+        with _import_pil().open(io.BytesIO(photo)) as image:
+            width, height = image.size
+        return height / width if width and height else 1.0
+    except Exception:
+        return 1.0
+
+
+def photo_aspects(photos: Sequence[bytes]) -> List[float]:
+    """Пропорции фото задания; считаются один раз и передаются и в photo_pixel_limits, и в верстку."""
+    return [photo_aspect(photo) if photo else 0.0 for photo in photos]
+
+
+def usable_page_size(margins: Optional[dict] = None) -> Tuple[float, float]:
+    """Ширина и высота области таблицы на A4 за вычетом полей и места под заголовок."""
+    margins = margins or DEFAULT_MARGINS
+    return (
+        A4_WIDTH_CM - margins["left"] - margins["right"],
+        A4_HEIGHT_CM - margins["top"] - margins["bottom"] - TITLE_RESERVE_CM,
+    )
+
+
+def page_layout(aspects: Sequence[float], rows: int, cols: int, size_option: str = "auto") -> PageLayout:
+    """Размеры ячеек и фото для страницы rows×cols.
+
+    Фиксированный размер (small/medium/large) задает ширину фото, высота строки
+    равна самому высокому фото в ней. В режиме auto фото занимают всю ширину столбца
+    (не больше AUTO_MAX_IMAGE_CM); если строки с такими фото не помещаются по высоте,
+    все фото страницы уменьшаются в одной пропорции, чтобы таблица не переходила
+    на следующую страницу. Пропорции фото сохраняются.
+    """
+    usable_width, usable_height = usable_page_size()
+
+    if size_option != "auto":
+        image_width: float = SIZE_OPTIONS.get(size_option, (5.0, 5.0))[0]
+    else:
+        image_width = min(usable_width / cols - CELL_PADDING_CM, AUTO_MAX_IMAGE_CM)
+        natural: float = sum(
+            image_width * max(aspects[row * cols : (row + 1) * cols], default=0.0) for row in range(rows)
+        )
+        available: float = usable_height - rows * CELL_PADDING_CM
+        if natural > available > 0:
+            # Без нижней границы размера: при 10 строках вертикальных фото любая граница выводила бы таблицу за страницу
+            image_width *= available / natural
+
+    image_sizes: List[Tuple[float, float]] = [(image_width, image_width * aspect) for aspect in aspects]
+    row_heights: List[float] = [
+        max((height for _, height in image_sizes[row * cols : (row + 1) * cols]), default=0.0) + CELL_PADDING_CM
+        for row in range(rows)
+    ]
+    return PageLayout(cell_width=image_width + CELL_PADDING_CM, row_heights=row_heights, image_sizes=image_sizes)
+
+
+def photo_pixel_limits(
+    aspects: Sequence[float], rows: int, cols: int, size_option: str = "auto", dpi: int = DOCUMENT_IMAGE_DPI
+) -> List[int]:
+    """Наибольшая сторона каждого фото в пикселях, достаточная для его размера на странице при dpi.
+
+    aspects - пропорции фото (photo_aspects) в порядке вставки.
+    """
+    per_page: int = rows * cols if rows * cols > 0 else max(len(aspects), 1)
+    limits: List[int] = []
+    for start in range(0, len(aspects), per_page):
+        layout: PageLayout = page_layout(aspects[start : start + per_page], rows, cols, size_option)
+        for width_cm, height_cm in layout.image_sizes:
+            pixels: int = math.ceil(max(width_cm, height_cm) / 2.54 * dpi)
+            limits.append(min(pixels, DOCUMENT_MAX_IMAGE_SIZE))
+    return limits
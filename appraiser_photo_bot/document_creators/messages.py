@@ -1,7 +1,7 @@
 """Функции для генерации сообщений пользователю."""
 
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from .utils import calculate_pages_info, get_size_option_name
 
@@ -97,6 +97,61 @@ class MessageGenerator:
         """Сообщение об ошибке формата фото."""
         return "Пожалуйста, отправьте фото в формате JPG или PNG"
 
+    @staticmethod
+    def get_archive_error() -> str:
+        """Сообщение об ошибке: файл не является ZIP-архивом."""
+        return "❌ Не удалось открыть архив. Отправьте ZIP-архив с фото в формате JPG или PNG."
+
+    @staticmethod
+    def get_archive_too_big_error(size_mb: float, limit_mb: float) -> str:
+        """Сообщение об ошибке: архив больше лимита Bot API."""
+        return (
+            f"❌ Архив слишком большой ({size_mb:.1f} MB), бот может получить не более {limit_mb:.0f} MB.\n"
+            f"Разделите фото на несколько архивов."
+        )
+
+    @staticmethod
+    def get_archive_full_error(max_photos: int) -> str:
+        """Сообщение об ошибке: в сессии уже максимум фото."""
+        return f"❌ В документе уже {max_photos} фото - это максимум. Нажмите '✅ Готово'."
+
+    @staticmethod
+    def get_archive_summary(
+        added: int, skipped: int, over_limit: int, duplicates: int = 0, duplicates_skipped: bool = False
+    ) -> str:
+        """Итог загрузки архива."""
+        text = f"📦 *Из архива добавлено фото: {added}*\n"
+        if skipped:
+            text += f"⏭️ Пропущено файлов (не фото или повреждены): {skipped}\n"
+        if over_limit:
+            text += f"⚠️ Не добавлено сверх лимита: {over_limit}\n"
+        if duplicates:
+            action = "пропущено" if duplicates_skipped else "добавлено, проверьте перед созданием"
+            text += f"🔁 Похожих на уже загруженные: {duplicates} ({action})\n"
+        return text + "\n"
+
+    @staticmethod
+    def get_duplicate_warning(photo_number: int) -> str:
+        """Предупреждение: фото похоже на уже загруженное."""
+        return f"🔁 *Похоже на фото №{photo_number}* - возможно, повтор\n\n"
+
+    @staticmethod
+    def get_duplicate_skipped_message(photo_number: int) -> str:
+        """Сообщение: повторное фото не добавлено."""
+        return f"🔁 Фото не добавлено: оно похоже на фото №{photo_number}."
+
+    @staticmethod
+    def get_duplicates_report(duplicates: List[Tuple[int, int]], limit: int = 10) -> str:
+        """Список похожих фото перед созданием документа (номера с 1)."""
+        pairs = ", ".join(f"№{index + 1} ≈ №{earlier + 1}" for index, earlier in duplicates[:limit])
+        if len(duplicates) > limit:
+            pairs += f" и еще {len(duplicates) - limit}"
+        return (
+            f"🔁 *Похожие фото: {len(duplicates)}*\n"
+            f"{pairs}\n"
+            f"Если это повторы, нажмите '◀️ Назад' и загрузите фото заново.\n\n"
+        )
+
     @staticmethod
     def get_photo_processing_error() -> str:
         """Сообщение об ошибке обработки фото."""
@@ -182,6 +237,16 @@ class MessageGenerator:
             f"*Создаем многостраничный документ?*"
         )
 
+    @staticmethod
+    def get_preview_caption(page_num: int, total_pages: int) -> str:
+        """Подпись к превью страницы."""
+        return f"👀 Превью: страница {page_num} из {total_pages}"
+
+    @staticmethod
+    def get_preview_truncated_message(shown_pages: int, total_pages: int) -> str:
+        """Сообщение о том, что показаны не все страницы превью."""
+        return f"👀 Показаны первые {shown_pages} из {total_pages} страниц."
+
     @staticmethod
     def generate_document_stats(photos_count: int, rows: int, cols: int, page_info: Dict[str, int]) -> str:
         """Генерирует статистику документа для сообщения пользователю."""
@@ -293,13 +358,16 @@ class MessageGenerator:
         cols: int,
         page_info: Dict[str, int],
         progress: int = 10,
+        stage_text: str = "",
     ) -> str:
-        """Сообщение о начале создания документа с прогрессом."""
+        """Сообщение о создании документа с прогрессом и текущим этапом."""
+        stage_line = f"⚙️ {stage_text}\n" if stage_text else ""
         return (
             f"🛠️ *Создаю документ...* ({progress}%)\n\n"
             f"📷 Фото: {photos_count}\n"
             f"📊 Таблица: {rows}×{cols}\n"
             f"📄 Страниц: {page_info['total_pages']}\n"
+            f"{stage_line}"
             f"⏱️ Это займет некоторое время..."
         )
 
@@ -441,6 +509,35 @@ class MessageGenerator:
         """Статус сессии при готовности к работе."""
         return "📊 *Статус вашей сессии:*\n\n• Состояние: *Готов к работе*\n\nДля начала нажмите '🟢 Начать'."
 
+    @staticmethod
+    def get_metrics_message(metrics_text: str) -> str:
+        """Метрики бота для администратора."""
+        return f"📈 *Метрики бота:*\n\n```\n{metrics_text}\n```"
+
+    @staticmethod
+    def get_jobs_message(traces: List[str]) -> str:
+        """Трассы последних заданий для администратора (обрезаются по лимиту длины сообщения)."""
+        if not traces:
+            return "🛫 Заданий пока не было."
+        shown: List[str] = []
+        length: int = 0
+        for trace in traces:
+            length += len(trace) + 2
+            if length > 3800:
+                break
+            shown.append(trace)
+        return f"🛫 *Последние задания ({len(shown)}):*\n\n```\n" + "\n\n".join(shown) + "\n```"
+
+    @staticmethod
+    def get_jobs_usage_message() -> str:
+        """Подсказка по аргументам /jobs."""
+        return "Использование: `/jobs [N]` или `/jobs user <id> [N]`"
+
+    @staticmethod
+    def get_admin_only_message() -> str:
+        """Сообщение о команде, доступной только администратору."""
+        return "⛔ Команда доступна только администратору."
+
     # ===== Помощь =====
 
     @staticmethod
@@ -464,7 +561,7 @@ class MessageGenerator:
             "3. Введите количество строк в таблице (например, 3)\n"
             "4. Введите количество столбцов (например, 4)\n"
             "5. Выберите размер фото из меню\n"
-            "6. Загружайте фото по одному\n"
+            "6. Загружайте фото по одному или одним ZIP-архивом\n"
             "7. Нажмите '✅ Готово' когда все фото загружены\n"
             "8. Подтвердите создание документа кнопкой '✅ Да, всё верно'\n"
             "9. Получите готовый Word-файл\n\n"
@@ -494,11 +591,11 @@ class MessageGenerator:
         )
 
     @staticmethod
-    def get_document_too_big_error(doc_size_mb: float) -> str:
+    def get_document_too_big_error(doc_size_mb: float, limit_mb: float = 45.0) -> str:
         """Сообщение об ошибке: документ слишком большой."""
         return (
             f"⚠️ *Документ слишком большой ({doc_size_mb:.1f} MB)*\n\n"
-            f"Telegram не может отправить файлы больше 50MB.\n\n"
+            f"Бот может отправить документ размером до {limit_mb:.0f} MB.\n\n"
             f"📋 *Рекомендации:*\n"
             f"• Используйте до 10 фото за раз\n"
             f"• Выбирайте 'Маленький' размер фото\n"
@@ -512,13 +609,27 @@ class MessageGenerator:
         """Сообщение об ошибке таймаута."""
         return (
             "⏳ *Отправка занимает слишком много времени*\n\n"
-            f"Документ ({doc_size_mb:.1f} MB) слишком большой для быстрой отправки.\n\n"
+            f"Документ ({doc_size_mb:.1f} MB) не удалось отправить за несколько попыток.\n"
+            "Готовый файл сохранен - создавать его заново не нужно.\n\n"
             "📋 *Что делать:*\n"
             "1. Подождите несколько минут - файл может быть доставлен\n"
-            "2. Попробуйте с меньшим количеством фото (до 5-10)\n"
-            "3. Используйте фото меньшего размера\n"
-            "4. Выбирайте 'Маленький' размер в настройках\n\n"
-            "🔄 Начните заново: /start"
+            "2. Нажмите '🔁 Отправить повторно' или /resend\n"
+            "3. Для следующих документов выбирайте 'Маленький' размер\n\n"
+            "🔄 Начать заново: /start"
+        )
+
+    @staticmethod
+    def get_resending_message(doc_size_mb: float) -> str:
+        """Сообщение о повторной отправке готового документа."""
+        return f"🔁 *Повторная отправка документа* ({doc_size_mb:.1f} MB)...\n\nДокумент не пересоздается."
+
+    @staticmethod
+    def get_resend_unavailable_message() -> str:
+        """Сообщение: нет документа для повторной отправки."""
+        return (
+            "🤷 *Нет документа для повторной отправки*\n\n"
+            "Сохраненный документ не найден или устарел.\n\n"
+            "🔄 Создайте документ заново, нажмите: '🟢 Начать'"
         )
 
     @staticmethod
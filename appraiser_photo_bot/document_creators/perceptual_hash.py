@@ -0,0 +1,76 @@
+"""Перцептивный хеш (dHash) для поиска повторных и почти одинаковых фото в сессии."""
+
+from typing import Any, List, Optional, Tuple
+
+DHASH_SIZE = 8  # 8×8 = 64 бита
+
+
+def dhash(image: Any) -> int:
+    """dHash: знаки разности яркости соседних пикселей копии 9×8.
+
+    Не зависит от масштаба и степени сжатия, поэтому совпадает у повторно
+    отправленного фото и почти совпадает у кадров серийной съемки.
+    """
+    from PIL import Image
+
+    # Сначала яркость, потом усреднение: так же считается хеш JPEG, декодированного сразу в "L" (draft)
+    gray = image if image.mode == "L" else image.convert("L")
+    small = gray.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BOX, reducing_gap=2.0)
+    pixels: bytes = small.tobytes()
+    value: int = 0
+    for row in range(DHASH_SIZE):
+        offset: int = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class PhotoHashIndex:
+    """Хеши фото сессии в порядке загрузки (None - хеш не вычислен).
+
+    В сессии не больше MAX_PHOTOS фото, поэтому поиск - линейный просмотр
+    с XOR и bit_count: на таком объеме это быстрее любых деревьев.
+    """
+
+    def __init__(self) -> None:
+        self._hashes: List[Optional[int]] = []
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, value: Optional[int]) -> None:
+        self._hashes.append(value)
+
+    def clear(self) -> None:
+        self._hashes.clear()
+
+    def find(self, value: Optional[int], max_distance: int) -> Optional[int]:
+        """Индекс ближайшего фото не дальше max_distance бит или None."""
+        if value is None:
+            return None
+        best: Optional[int] = None
+        best_distance: int = max_distance + 1
+        for index, other in enumerate(self._hashes):
+            if other is None:
+                continue
+            distance: int = hamming(value, other)
+            if distance < best_distance:
+                best, best_distance = index, distance
+        return best
+
+    def duplicates(self, max_distance: int) -> List[Tuple[int, int]]:
+        """Пары (фото, более раннее похожее фото) в порядке загрузки."""
+        pairs: List[Tuple[int, int]] = []
+        for index, value in enumerate(self._hashes):
+            if value is None:
+                continue
+            for earlier in range(index):
+                other: Optional[int] = self._hashes[earlier]
+                if other is not None and hamming(value, other) <= max_distance:
+                    pairs.append((index, earlier))
+                    break
+        return pairs
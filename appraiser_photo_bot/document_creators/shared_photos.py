@@ -0,0 +1,129 @@
+"""Передача фото рабочим процессам через общую память.
+
+Аргументы и результаты ProcessPoolExecutor сериализуются pickle и копируются
+через канал в обе стороны. Вместо этого фото документа один раз укладываются
+подряд в сегмент общей памяти, а рабочему процессу передаются только срезы
+(имя сегмента, смещение, длина). Сжатые изображения страницы рабочий процесс
+записывает на место ее исходных фото: после сжатия они не больше оригиналов.
+"""
+
+import errno
+import logging
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Каталог сегментов в Linux. В Docker по умолчанию всего 64 MB, а запись сверх
+# свободного места приводит к SIGBUS, поэтому место под сегмент резервируется заранее
+SHM_DIR = "/dev/shm"
+
+
+@dataclass(frozen=True)
+class SharedSlice:
+    """Участок сегмента общей памяти."""
+
+    name: str
+    offset: int
+    size: int
+
+
+def _reserve(name: str, size: int) -> None:
+    """Выделяет страницы сегмента сразу (ENOSPC - OSError), чтобы запись в него не упала SIGBUS.
+
+    Проверка и выделение - одна операция, поэтому одновременные рендеры не могут
+    оба пройти проверку свободного места и затем переполнить tmpfs.
+    """
+    path: str = os.path.join(SHM_DIR, name.lstrip("/"))
+    if not hasattr(os, "posix_fallocate") or not os.path.exists(path):
+        return
+    fd: int = os.open(path, os.O_RDWR)
+    try:
+        os.posix_fallocate(fd, 0, size)
+    finally:
+        os.close(fd)
+
+
+class SharedPhotoBuffer:
+    """Фото документа в одном сегменте общей памяти. Сегмент удаляется при закрытии."""
+
+    def __init__(self, photos: List[bytes]) -> None:
+        total: int = sum(len(photo) for photo in photos)
+        self._memory: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        try:
+            _reserve(self._memory.name, max(total, 1))
+        except OSError:
+            self.close()
+            raise
+        self.slices: List[SharedSlice] = []
+        offset: int = 0
+        for photo in photos:
+            self._memory.buf[offset : offset + len(photo)] = photo
+            self.slices.append(SharedSlice(self._memory.name, offset, len(photo)))
+            offset += len(photo)
+
+    @classmethod
+    def create(cls, photos: List[bytes]) -> Optional["SharedPhotoBuffer"]:
+        """Буфер с фото или None, если общей памяти не хватает (тогда фото передаются через pickle)."""
+        try:
+            return cls(photos)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                total: int = sum(len(photo) for photo in photos)
+                logger.warning(f"В {SHM_DIR} нет {total / 1024 / 1024:.1f} MB, фото передаются процессам копированием")
+            else:
+                logger.warning(f"Не удалось выделить общую память: {e}")
+            return None
+
+    def read(self, item: SharedSlice) -> bytes:
+        return bytes(self._memory.buf[item.offset : item.offset + item.size])
+
+    def close(self) -> None:
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self) -> "SharedPhotoBuffer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def page_region(slices: List[SharedSlice]) -> SharedSlice:
+    """Участок, занятый фото одной страницы (они лежат в сегменте подряд)."""
+    return SharedSlice(slices[0].name, slices[0].offset, sum(item.size for item in slices))
+
+
+def read_slices(slices: List[SharedSlice]) -> List[bytes]:
+    """Копирует фото из общей памяти в рабочем процессе."""
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+    try:
+        result: List[bytes] = []
+        for item in slices:
+            if item.name not in segments:
+                segments[item.name] = shared_memory.SharedMemory(name=item.name)
+            result.append(bytes(segments[item.name].buf[item.offset : item.offset + item.size]))
+        return result
+    finally:
+        for segment in segments.values():
+            segment.close()
+
+
+def write_slices(region: SharedSlice, blobs: Iterator[bytes]) -> Optional[List[SharedSlice]]:
+    """Записывает данные подряд в участок общей памяти. None - не поместились (ничего не записано)."""
+    data: List[bytes] = list(blobs)
+    if sum(len(blob) for blob in data) > region.size:
+        return None
+    segment: shared_memory.SharedMemory = shared_memory.SharedMemory(name=region.name)
+    try:
+        slices: List[SharedSlice] = []
+        offset: int = region.offset
+        for blob in data:
+            segment.buf[offset : offset + len(blob)] = blob
+            slices.append(SharedSlice(region.name, offset, len(blob)))
+            offset += len(blob)
+        return slices
+    finally:
+        segment.close()
@@ -1,4 +1,4 @@
-"""Менеджер временных файлов с автоматической очисткой."""
+"""Менеджер временных файлов: каталоги сессий и задач, квота на диск, очистка."""
 
 import atexit
 import logging
@@ -6,21 +6,63 @@ import os
 import shutil
 import tempfile
 import threading
-from datetime import datetime, timedelta
-from typing import List, Optional, Set
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from ..metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Квота по умолчанию на все временные файлы бота
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Как часто temp_file/job_dir обходят весь базовый каталог для проверки квоты (в секундах)
+QUOTA_SCAN_INTERVAL = 10.0
+# Доля квоты, начиная с которой каталог обходится при каждом создании файла
+QUOTA_SCAN_ALWAYS_RATIO = 0.9
+
+
+def _tree_usage(path: str) -> Tuple[int, float]:
+    """Размер дерева и время последнего изменения в нем (обход через os.scandir)."""
+    total: int = 0
+    latest: float = 0.0
+    stack: List[str] = [path]
+    while stack:
+        current: str = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    latest = max(latest, stat.st_mtime)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total += stat.st_size
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return total, latest
+
 
 class TempFileManager:
-    """Менеджер временных файлов с автоматической очисткой."""
+    """Временные файлы бота в общем базовом каталоге.
+
+    Каждая сессия пользователя и каждая задача получают свой подкаталог.
+    Каталоги задач и отдельные файлы живут в пределах with-блока и удаляются
+    при выходе из него; каталог сессии - до release_session. При превышении
+    квоты удаляются давно не изменявшиеся записи, которые сейчас не используются.
+
+    Обход всего каталога стоит тем дороже, чем больше в нем файлов, поэтому при
+    создании файла квота проверяется не чаще раза в QUOTA_SCAN_INTERVAL секунд,
+    пока последний замер далек от квоты.
+    """
 
     _instance: Optional["TempFileManager"] = None
     _lock: threading.Lock = threading.Lock()
-    _temp_files: Set[str] = set()
-    _temp_dirs: Set[str] = set()
-    _cleanup_thread: Optional[threading.Thread] = None
-    _stop_cleanup: threading.Event = threading.Event()
+    max_bytes: int = DEFAULT_MAX_BYTES
 
     def __new__(cls) -> "TempFileManager":
         with cls._lock:
@@ -31,119 +73,177 @@ class TempFileManager:
 
     def _initialize(self) -> None:
         self.base_temp_dir: str = tempfile.mkdtemp(prefix="photo_bot_")
-        self._temp_dirs.add(self.base_temp_dir)
+        self._active: Set[str] = set()
+        self._sessions: Dict[str, str] = {}
+        self._state_lock: threading.Lock = threading.Lock()
+        # Результат последнего обхода: размер и время (monotonic)
+        self._scanned_bytes: int = 0
+        self._scanned_at: float = float("-inf")
         logger.info(f"Создана базовая временная директория: {self.base_temp_dir}")
 
         atexit.register(self.cleanup_all)
-        self._start_background_cleanup()
-
-    def create_temp_file(self, suffix: str = ".docx") -> str:
-        temp_file: str = tempfile.mktemp(suffix=suffix, dir=self.base_temp_dir)
-        self._temp_files.add(temp_file)
-        logger.debug(f"Создан временный файл: {temp_file}")
-        return temp_file
-
-    def create_temp_dir(self, prefix: str = "temp_") -> str:
-        temp_dir: str = tempfile.mkdtemp(prefix=prefix, dir=self.base_temp_dir)
-        self._temp_dirs.add(temp_dir)
-        logger.debug(f"Создана временная директория: {temp_dir}")
-        return temp_dir
-
-    def register_temp_file(self, filepath: str) -> None:
-        if os.path.exists(filepath):
-            self._temp_files.add(filepath)
-
-    def unregister_temp_file(self, filepath: str) -> None:
-        self._temp_files.discard(filepath)
-
-    def cleanup_old_files(self, max_age_hours: int = 24) -> None:
-        cutoff_time: datetime = datetime.now() - timedelta(hours=max_age_hours)
-
-        files_to_remove: List[str] = []
-        for filepath in self._temp_files.copy():
-            try:
-                if os.path.exists(filepath):
-                    file_mtime: datetime = datetime.fromtimestamp(os.path.getmtime(filepath))
-                    if file_mtime < cutoff_time:
-                        files_to_remove.append(filepath)
-                else:
-                    files_to_remove.append(filepath)
-            except Exception as e:
-                logger.warning(f"Ошибка при проверке файла {filepath}: {e}")
-                files_to_remove.append(filepath)
-
-        for filepath in files_to_remove:
-            self._delete_file_safe(filepath)
-            self._temp_files.discard(filepath)
-
-        dirs_to_remove: List[str] = []
-        for dirpath in self._temp_dirs.copy():
-            if dirpath != self.base_temp_dir:
-                try:
-                    if not os.listdir(dirpath):
-                        dirs_to_remove.append(dirpath)
-                except Exception as e:
-                    logger.warning(f"Ошибка при проверке директории {dirpath}: {e}")
-
-        for dirpath in dirs_to_remove:
-            self._delete_dir_safe(dirpath)
-            self._temp_dirs.discard(dirpath)
-
-        if files_to_remove or dirs_to_remove:
-            logger.info(f"Очищено {len(files_to_remove)} файлов и {len(dirs_to_remove)} директорий")
-
-    def _delete_file_safe(self, filepath: str) -> None:
-        try:
-            os.unlink(filepath)
-            logger.debug(f"Удален файл: {filepath}")
-        except Exception as e:
-            logger.warning(f"Не удалось удалить файл {filepath}: {e}")
 
-    def _delete_dir_safe(self, dirpath: str) -> None:
+    @classmethod
+    def set_quota(cls, max_bytes: int) -> None:
+        """Задает квоту на суммарный размер временных файлов."""
+        cls.max_bytes = max_bytes
+
+    @classmethod
+    def is_initialized(cls) -> bool:
+        return cls._instance is not None
+
+    def session_dir(self, session_key: str) -> str:
+        """Каталог сессии: создается при первом обращении, живет до release_session."""
+        with self._state_lock:
+            path: Optional[str] = self._sessions.get(session_key)
+            if path is None:
+                path = tempfile.mkdtemp(prefix=f"session_{session_key}_", dir=self.base_temp_dir)
+                self._sessions[session_key] = path
+                self._active.add(path)
+                logger.debug(f"Создан каталог сессии: {path}")
+        return path
+
+    def release_session(self, session_key: str) -> None:
+        """Удаляет каталог сессии со всем содержимым."""
+        with self._state_lock:
+            path: Optional[str] = self._sessions.pop(session_key, None)
+            if path:
+                self._active.discard(path)
+        if path:
+            self._delete_safe(path)
+
+    @contextmanager
+    def job_dir(self, prefix: str = "job_") -> Iterator[str]:
+        """Каталог задачи, удаляемый при выходе из with-блока."""
+        self._check_quota()
+        path: str = tempfile.mkdtemp(prefix=prefix, dir=self.base_temp_dir)
+        with self._state_lock:
+            self._active.add(path)
+        try:
+            yield path
+        finally:
+            with self._state_lock:
+                self._active.discard(path)
+            self._delete_safe(path)
+
+    @contextmanager
+    def temp_file(self, suffix: str = ".docx", directory: Optional[str] = None) -> Iterator[str]:
+        """Путь к новому пустому файлу (mkstemp, без гонки mktemp); файл удаляется после with-блока."""
+        self._check_quota()
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=directory or self.base_temp_dir)
+        os.close(fd)
+        with self._state_lock:
+            self._active.add(path)
+        try:
+            yield path
+        finally:
+            with self._state_lock:
+                self._active.discard(path)
+            self._delete_safe(path)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Записи верхнего уровня базового каталога: (время изменения, размер, путь)."""
+        entries: List[Tuple[float, int, str]] = []
+        try:
+            with os.scandir(self.base_temp_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            size, latest = _tree_usage(entry.path)
+                            latest = max(latest, entry.stat(follow_symlinks=False).st_mtime)
+                        else:
+                            stat = entry.stat(follow_symlinks=False)
+                            size, latest = stat.st_size, stat.st_mtime
+                    except FileNotFoundError:
+                        continue
+                    entries.append((latest, size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def disk_usage(self) -> int:
+        """Суммарный размер временных файлов в байтах."""
+        total: int = sum(size for _, size, _ in self._entries())
+        metrics.set_gauge("temp.bytes", total)
+        return total
+
+    def _check_quota(self) -> None:
+        """Проверка квоты перед созданием файла: полный обход только по интервалу или вблизи квоты."""
+        recent: bool = time.monotonic() - self._scanned_at < QUOTA_SCAN_INTERVAL
+        if recent and self._scanned_bytes < self.max_bytes * QUOTA_SCAN_ALWAYS_RATIO:
+            return
+        self.enforce_quota()
+
+    def enforce_quota(self) -> int:
+        """Удаляет неиспользуемые записи, начиная с самых старых, пока размер не уложится в квоту."""
+        entries: List[Tuple[float, int, str]] = sorted(self._entries())
+        total: int = sum(size for _, size, _ in entries)
+        evicted: int = 0
+
+        if total > self.max_bytes:
+            with self._state_lock:
+                active: Set[str] = set(self._active)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path in active:
+                    continue
+                self._delete_safe(path)
+                total -= size
+                evicted += 1
+            metrics.inc("temp.evicted", evicted)
+            if total > self.max_bytes:
+                metrics.inc("temp.quota_exceeded")
+                logger.warning(
+                    f"Временные файлы занимают {total / 1024 / 1024:.1f} MB при квоте "
+                    f"{self.max_bytes / 1024 / 1024:.0f} MB: все файлы используются"
+                )
+
+        self._scanned_bytes, self._scanned_at = total, time.monotonic()
+        metrics.set_gauge("temp.bytes", total)
+        metrics.set_gauge("temp.entries", len(entries) - evicted)
+        return evicted
+
+    def cleanup_old_files(self, max_age_hours: float = 24) -> None:
+        """Удаляет неиспользуемые записи старше max_age_hours и проверяет квоту."""
+        cutoff: float = time.time() - max_age_hours * 3600
+        with self._state_lock:
+            active: Set[str] = set(self._active)
+
+        removed: int = 0
+        for latest, _, path in self._entries():
+            if latest < cutoff and path not in active:
+                self._delete_safe(path)
+                removed += 1
+
+        if removed:
+            logger.info(f"Очищено {removed} устаревших временных файлов и директорий")
+        self.enforce_quota()
+
+    def _delete_safe(self, path: str) -> None:
         try:
-            shutil.rmtree(dirpath, ignore_errors=True)
-            logger.debug(f"Удалена директория: {dirpath}")
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+            logger.debug(f"Удалено: {path}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logger.warning(f"Не удалось удалить директорию {dirpath}: {e}")
-
-    def _start_background_cleanup(self) -> None:
-        def cleanup_worker() -> None:
-            while not self._stop_cleanup.is_set():
-                try:
-                    self.cleanup_old_files(max_age_hours=1)
-                except Exception as e:
-                    logger.error(f"Ошибка в фоновой очистке: {e}")
-                self._stop_cleanup.wait(timeout=1800)
-
-        self._cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        self._cleanup_thread.start()
-        logger.info("Запущена фоновая очистка временных файлов")
-
-    def stop_background_cleanup(self) -> None:
-        self._stop_cleanup.set()
-        if self._cleanup_thread:
-            self._cleanup_thread.join(timeout=5)
+            logger.warning(f"Не удалось удалить {path}: {e}")
 
     def cleanup_all(self) -> None:
         logger.info("Начинаю полную очистку временных файлов...")
-        self.stop_background_cleanup()
-
-        for filepath in self._temp_files.copy():
-            self._delete_file_safe(filepath)
-
-        for dirpath in self._temp_dirs.copy():
-            if dirpath != self.base_temp_dir:
-                self._delete_dir_safe(dirpath)
-
-        if os.path.exists(self.base_temp_dir):
-            self._delete_dir_safe(self.base_temp_dir)
-
-        self._temp_files.clear()
-        self._temp_dirs.clear()
+        with self._state_lock:
+            self._active.clear()
+            self._sessions.clear()
+        shutil.rmtree(self.base_temp_dir, ignore_errors=True)
         logger.info("Полная очистка временных файлов завершена")
 
 
-def cleanup_old_temp_files(max_age_hours: int = 24) -> None:
+def cleanup_old_temp_files(max_age_hours: float = 24) -> None:
+    if not TempFileManager.is_initialized():
+        return
     manager: TempFileManager = TempFileManager()
     manager.cleanup_old_files(max_age_hours)
 
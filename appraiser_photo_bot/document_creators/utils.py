@@ -2,29 +2,128 @@
 
 import io
 import logging
-from typing import Dict, List, Optional, Tuple, Union
+import mmap
+import zipfile
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from ..metrics import metrics
+from .constants import (
+    DEFAULT_DOCX_COMPRESS_LEVEL,
+    DEFAULT_IMAGE_QUALITY,
+    DOCUMENT_MAX_IMAGE_SIZE,
+    DOCX_STORED_EXTENSIONS,
+    DOCX_ZIP_TIMESTAMP,
+    IJG_LUMINANCE_TABLE,
+    JPEG_PASSTHROUGH_MAX_BPP,
+    JPEG_PASSTHROUGH_QUALITY_MARGIN,
+    MAX_IMAGE_SIZE,
+    PREVIEW_CELL_SIZE,
+    PREVIEW_GAP,
+    PREVIEW_QUALITY,
+    SIZE_OPTIONS,
+)
+from .perceptual_hash import dhash
 
-from PIL import Image
+logger = logging.getLogger(__name__)
 
-from .constants import DEFAULT_IMAGE_QUALITY, MAX_IMAGE_SIZE, SIZE_OPTIONS
+# Колбэк прогресса: (этап, выполнено, всего). Этапы: "compress", "render", "save".
+ProgressCallback = Callable[[str, int, int], None]
 
-logger = logging.getLogger(__name__)
+# Исходное изображение: байты в памяти, файл, отображенный в память (локальный Bot API),
+# или файловый объект (спул загрузки)
+ImageSource = Union[bytes, bytearray, mmap.mmap, BinaryIO]
+
+
+def _import_pil() -> Any:
+    """Импортирует Pillow при первом использовании: для запуска бота он не нужен."""
+    from PIL import Image, ImageFile
+
+    # Разрешить загрузку усеченных изображений
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    return Image
+
+
+def _source_size(source: ImageSource) -> int:
+    if isinstance(source, (bytes, bytearray, mmap.mmap)):
+        return len(source)
+    size: int = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    return size
+
+
+def _source_bytes(source: ImageSource) -> bytes:
+    if isinstance(source, (bytes, bytearray, mmap.mmap)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def estimate_jpeg_quality(quantization: Optional[Dict[int, Any]]) -> Optional[int]:
+    """Оценивает качество JPEG (шкала IJG 1-100) по таблице квантования яркости."""
+    table = quantization.get(0) if quantization else None
+    if not table or len(table) != 64:
+        return None
+    # Кодировщики IJG/libjpeg масштабируют стандартную таблицу: scale = 5000/q при q < 50, иначе 200 - 2q
+    scale: float = sum(table) * 100 / sum(IJG_LUMINANCE_TABLE)
+    quality: float = 5000 / scale if scale > 100 else (200 - scale) / 2
+    return max(1, min(100, round(quality)))
+
+
+def _can_pass_through(image: Any, size: int, quality: int, max_size: int) -> bool:
+    """Решает по заголовку JPEG (без декодирования), нужно ли перекодировать изображение."""
+    if image.format != "JPEG" or image.mode not in ("RGB", "L"):
+        return False
+    width, height = image.size
+    if max(width, height) > max_size or size * 8 > width * height * JPEG_PASSTHROUGH_MAX_BPP:
+        return False
+    estimated: Optional[int] = estimate_jpeg_quality(getattr(image, "quantization", None))
+    return estimated is not None and estimated <= quality + JPEG_PASSTHROUGH_QUALITY_MARGIN
 
 
 def compress_image(
-    image_bytes: bytes,
+    image_bytes: ImageSource,
     quality: int = DEFAULT_IMAGE_QUALITY,
     max_size: int = MAX_IMAGE_SIZE,
     target_format: str = "JPEG",
+    ssim_target: Optional[float] = None,
 ) -> bytes:
-    """Сжимает изображение до указанного качества и размера."""
+    """Сжимает изображение до указанного качества и размера.
+
+    С ssim_target качество подбирается по SSIM: quality становится верхней границей.
+    """
+    return compress_image_with_hash(image_bytes, quality, max_size, target_format, ssim_target, with_hash=False)[0]
+
+
+def compress_image_with_hash(
+    image_bytes: ImageSource,
+    quality: int = DEFAULT_IMAGE_QUALITY,
+    max_size: int = MAX_IMAGE_SIZE,
+    target_format: str = "JPEG",
+    ssim_target: Optional[float] = None,
+    with_hash: bool = True,
+) -> Tuple[bytes, Optional[int]]:
+    """Как compress_image, но возвращает и перцептивный хеш (dHash) по уже декодированному изображению."""
+    Image = _import_pil()
+    photo_hash: Optional[int] = None
     try:
-        original_size: int = len(image_bytes)
+        original_size: int = _source_size(image_bytes)
 
-        with Image.open(io.BytesIO(image_bytes)) as image:
+        # mmap и файлы читаются Pillow напрямую, без копирования оригинала в память
+        source = io.BytesIO(image_bytes) if isinstance(image_bytes, (bytes, bytearray)) else image_bytes
+        with Image.open(source) as image:
             original_format: Optional[str] = image.format or "JPEG"
             width, height = image.size
 
+            # Image.open читает только заголовок: подходящий JPEG возвращается без декодирования
+            if target_format == "JPEG" and _can_pass_through(image, original_size, quality, max_size):
+                metrics.inc("compress.passthrough")
+                logger.info("JPEG %dx%d уже соответствует параметрам, сжатие пропущено", width, height)
+                if with_hash:
+                    # Для хеша хватает декодирования с уменьшением в 8 раз (масштабирование DCT)
+                    image.draft("L", (width // 8, height // 8))
+                    photo_hash = dhash(image)
+                return _source_bytes(image_bytes), photo_hash
+
             if max(width, height) > max_size:
                 new_width: int
                 new_height: int
@@ -35,8 +134,12 @@ def compress_image(
                     new_height = max_size
                     new_width = int(width * (max_size / height))
 
+                # JPEG декодируется сразу с уменьшением в 2/4/8 раз (не меньше целевого размера)
+                if image.format == "JPEG" and max(width, height) >= 2 * max_size:
+                    image.draft(image.mode, (new_width, new_height))
+
                 image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                logger.info(f"Масштабирование: {width}x{height} → {new_width}x{new_height}")
+                logger.info("Масштабирование: %dx%d → %dx%d", width, height, new_width, new_height)
 
             if image.mode in ("RGBA", "LA", "P"):
                 background: Image.Image = Image.new("RGB", image.size, (255, 255, 255))
@@ -50,6 +153,18 @@ def compress_image(
             elif image.mode != "RGB":
                 image = image.convert("RGB")
 
+            if with_hash:
+                photo_hash = dhash(image)
+
+            if ssim_target and target_format == "JPEG":
+                from . import adaptive_quality
+
+                if adaptive_quality.is_available():
+                    chosen: int = adaptive_quality.choose_quality(image, quality, ssim_target)
+                    metrics.observe("compress.adaptive_quality", chosen, buckets=tuple(range(40, 101, 5)))
+                    logger.info("Качество по SSIM %s: %d (максимум %d)", ssim_target, chosen, quality)
+                    quality = chosen
+
             output_buffer: io.BytesIO = io.BytesIO()
             image.save(
                 output_buffer,
@@ -59,44 +174,122 @@ def compress_image(
                 progressive=True,
             )
 
-            compressed_size: int = len(output_buffer.getvalue())
+            compressed_bytes: bytes = output_buffer.getvalue()
+            compressed_size: int = len(compressed_bytes)
             compression_ratio: float = compressed_size / original_size
 
             logger.info(
-                f"Сжатие: {original_format} → {target_format}, "
-                f"{original_size} → {compressed_size} ({compression_ratio * 100:.1f}%)"
+                "Сжатие: %s → %s, %d → %d (%.1f%%)",
+                original_format,
+                target_format,
+                original_size,
+                compressed_size,
+                compression_ratio * 100,
             )
 
             if compression_ratio > 0.95:
+                metrics.inc("compress.kept_original")
                 logger.info("Уменьшение менее 5%, возвращаю оригинал")
-                return image_bytes
+                return _source_bytes(image_bytes), photo_hash
 
-            return output_buffer.getvalue()
+            metrics.inc("compress.reencoded")
+            return compressed_bytes, photo_hash
 
     except Exception as e:
-        logger.error(f"Ошибка при сжатии изображения: {e}", exc_info=True)
-        return image_bytes
+        metrics.inc("compress.failed")
+        logger.error("Ошибка при сжатии изображения: %s", e, exc_info=True)
+        return _source_bytes(image_bytes), photo_hash
 
 
-def compress_photos_for_document(photos: List[bytes], max_size_pixels: int = 2000 * 2000) -> List[bytes]:
-    """Сжимает список фотографий для вставки в документ."""
+def compress_photos_for_document(
+    photos: List[bytes],
+    max_size_pixels: int = 2000 * 2000,
+    progress_callback: Optional[ProgressCallback] = None,
+    max_sizes: Optional[List[int]] = None,
+) -> List[bytes]:
+    """Сжимает список фотографий для вставки в документ.
+
+    max_sizes - наибольшая сторона каждого фото (по его размеру на странице, см. layout.photo_pixel_limits).
+    """
     compressed_photos: List[bytes] = []
     for i, photo in enumerate(photos):
         try:
             compressed: bytes = compress_image(
                 photo,
                 quality=65,
-                max_size=2000,
+                max_size=max_sizes[i] if max_sizes else DOCUMENT_MAX_IMAGE_SIZE,
                 target_format="JPEG",
             )
             compressed_photos.append(compressed)
-            logger.debug(f"Сжато фото {i + 1}: {len(photo)} → {len(compressed)} байт")
+            logger.debug("Сжато фото %d: %d → %d байт", i + 1, len(photo), len(compressed))
         except Exception as e:
-            logger.warning(f"Ошибка сжатия фото {i + 1}: {e}")
+            logger.warning("Ошибка сжатия фото %d: %s", i + 1, e)
             compressed_photos.append(photo)
+        if progress_callback:
+            progress_callback("compress", i + 1, len(photos))
     return compressed_photos
 
 
+def create_contact_sheet(
+    photos: List[bytes],
+    rows: int,
+    cols: int,
+    cell_size: int = PREVIEW_CELL_SIZE,
+    quality: int = PREVIEW_QUALITY,
+) -> bytes:
+    """Собирает превью страницы: миниатюры фото в сетке rows×cols с номерами ячеек."""
+    Image = _import_pil()
+    from PIL import ImageDraw
+
+    gap: int = PREVIEW_GAP
+    sheet_width: int = cols * cell_size + (cols + 1) * gap
+    sheet_height: int = rows * cell_size + (rows + 1) * gap
+    sheet: Image.Image = Image.new("RGB", (sheet_width, sheet_height), (255, 255, 255))
+    draw: ImageDraw.ImageDraw = ImageDraw.Draw(sheet)
+
+    for index, photo in enumerate(photos[: rows * cols]):
+        row_idx, col_idx = divmod(index, cols)
+        left: int = gap + col_idx * (cell_size + gap)
+        top: int = gap + row_idx * (cell_size + gap)
+
+        try:
+            with Image.open(io.BytesIO(photo)) as image:
+                # Для JPEG декодирование сразу в уменьшенном масштабе (DCT scaling)
+                image.draft("RGB", (cell_size, cell_size))
+                thumbnail: Image.Image = image.convert("RGB")
+                thumbnail.thumbnail((cell_size, cell_size), Image.Resampling.BILINEAR)
+        except Exception as e:
+            logger.warning(f"Не удалось построить миниатюру фото {index + 1}: {e}")
+            draw.rectangle((left, top, left + cell_size, top + cell_size), outline=(200, 0, 0))
+        else:
+            offset_x: int = left + (cell_size - thumbnail.width) // 2
+            offset_y: int = top + (cell_size - thumbnail.height) // 2
+            sheet.paste(thumbnail, (offset_x, offset_y))
+
+        label: str = str(index + 1)
+        label_box = draw.textbbox((left + 2, top + 2), label)
+        draw.rectangle((label_box[0] - 2, label_box[1] - 2, label_box[2] + 2, label_box[3] + 2), fill=(0, 0, 0))
+        draw.text((left + 2, top + 2), label, fill=(255, 255, 255))
+
+    for empty_index in range(len(photos), rows * cols):
+        row_idx, col_idx = divmod(empty_index, cols)
+        left = gap + col_idx * (cell_size + gap)
+        top = gap + row_idx * (cell_size + gap)
+        draw.rectangle((left, top, left + cell_size, top + cell_size), outline=(220, 220, 220))
+
+    output_buffer: io.BytesIO = io.BytesIO()
+    sheet.save(output_buffer, format="JPEG", quality=quality)
+    return output_buffer.getvalue()
+
+
+def create_contact_sheets(photos: List[bytes], rows: int, cols: int, max_pages: Optional[int] = None) -> List[bytes]:
+    """Собирает превью для страниц документа (не более max_pages первых страниц)."""
+    pages: List[List[bytes]] = split_into_pages(photos, rows, cols)
+    if max_pages is not None:
+        pages = pages[:max_pages]
+    return [create_contact_sheet(page, rows, cols) for page in pages]
+
+
 def calculate_auto_size(
     rows: int,
     cols: int,
@@ -154,3 +347,34 @@ def get_size_option_name(size_key: str) -> str:
         size_cm: float = SIZE_OPTIONS[size_key][0]
         return f"{size_cm} см"
     return "неизвестный"
+
+
+def write_docx_zip(
+    entries: Dict[str, bytes], target: BinaryIO, compress_level: int = DEFAULT_DOCX_COMPRESS_LEVEL
+) -> None:
+    """Записывает части .docx в ZIP так, чтобы одинаковое содержимое давало одинаковые байты.
+
+    Записи идут в стабильном порядке ([Content_Types].xml первым, остальные по имени)
+    с фиксированной меткой времени и атрибутами. Уже сжатые медиа записываются
+    без сжатия (ZIP_STORED), XML - с deflate уровня compress_level.
+    """
+    names: List[str] = sorted(entries, key=lambda name: (name != "[Content_Types].xml", name))
+    with zipfile.ZipFile(target, "w") as archive:
+        for name in names:
+            info: zipfile.ZipInfo = zipfile.ZipInfo(name, date_time=DOCX_ZIP_TIMESTAMP)
+            info.external_attr = 0o600 << 16
+            if name.lower().endswith(DOCX_STORED_EXTENSIONS):
+                info.compress_type = zipfile.ZIP_STORED
+                archive.writestr(info, entries[name])
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, entries[name], compresslevel=compress_level)
+
+
+def make_docx_deterministic(document_bytes: bytes, compress_level: int = DEFAULT_DOCX_COMPRESS_LEVEL) -> bytes:
+    """Перепаковывает готовый .docx через write_docx_zip."""
+    with zipfile.ZipFile(io.BytesIO(document_bytes)) as source:
+        entries: Dict[str, bytes] = {name: source.read(name) for name in source.namelist()}
+    buffer: io.BytesIO = io.BytesIO()
+    write_docx_zip(entries, buffer, compress_level)
+    return buffer.getvalue()
@@ -0,0 +1,58 @@
+"""Индекс сроков истечения: единая куча для таймаутов сессий и отложенных удалений."""
+
+import heapq
+import itertools
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# (срок, порядковый номер, вид, ключ)
+HeapEntry = Tuple[float, int, str, Hashable]
+
+
+class ExpiryIndex:
+    """Минимальная куча сроков с ленивым удалением.
+
+    На каждую пару (вид, ключ) действует один срок: повторный schedule заменяет
+    предыдущий, cancel снимает его. Старые записи остаются в куче и пропускаются
+    при извлечении; куча перестраивается, когда таких записей становится больше живых.
+    schedule, cancel и извлечение одного истекшего срока - O(log n).
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[HeapEntry] = []
+        self._live: Dict[Tuple[str, Hashable], int] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, kind: str, key: Hashable, delay: float, now: Optional[float] = None) -> None:
+        """Назначает (или переносит) срок для ключа через delay секунд."""
+        deadline: float = (time.monotonic() if now is None else now) + delay
+        seq: int = next(self._counter)
+        self._live[(kind, key)] = seq
+        heapq.heappush(self._heap, (deadline, seq, kind, key))
+        self._maybe_compact()
+
+    def cancel(self, kind: str, key: Hashable) -> None:
+        """Снимает срок ключа, если он был назначен."""
+        self._live.pop((kind, key), None)
+
+    def is_scheduled(self, kind: str, key: Hashable) -> bool:
+        return (kind, key) in self._live
+
+    def pop_expired(self, now: Optional[float] = None) -> List[Tuple[str, Hashable]]:
+        """Извлекает все истекшие сроки в порядке их наступления."""
+        current: float = time.monotonic() if now is None else now
+        expired: List[Tuple[str, Hashable]] = []
+        while self._heap and self._heap[0][0] <= current:
+            _, seq, kind, key = heapq.heappop(self._heap)
+            if self._live.get((kind, key)) == seq:
+                del self._live[(kind, key)]
+                expired.append((kind, key))
+        return expired
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._live):
+            self._heap = [entry for entry in self._heap if self._live.get((entry[2], entry[3])) == entry[1]]
+            heapq.heapify(self._heap)
@@ -0,0 +1,159 @@
+"""Бортовой самописец заданий: трасса каждого документа по этапам.
+
+Для каждого задания рендеринга записываются длительности этапов (загрузка,
+сжатие, верстка, сохранение, отправка), объемы данных, число страниц, путь сборки
+(кеш, одна страница, в памяти, через временный файл, рабочие процессы) и итог.
+Последние трассы хранятся в кольцевом буфере, а при FLIGHT_RECORDER_FILE еще и
+дописываются в JSONL. Запись в файл идет через очередь в отдельном потоке
+(как и остальные логи), поэтому цикл событий не ждет диска.
+Администратор смотрит трассы командой /jobs.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from logging.handlers import QueueHandler, QueueListener
+from typing import Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Строки JSONL пишутся этим логгером; он не передает записи корневому логгеру
+journal = logging.getLogger(f"{__name__}.journal")
+journal.propagate = False
+
+
+@dataclass
+class JobTrace:
+    """Трасса одного задания. Этапы с одинаковым именем суммируются."""
+
+    job_id: str
+    source: str
+    user_id: Optional[int] = None
+    started_at: float = field(default_factory=time.time)
+    photos: int = 0
+    pages: int = 0
+    layout: str = ""
+    engine: List[str] = field(default_factory=list)
+    stages: Dict[str, float] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+    outcome: str = "running"
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = round(self.stages.get(name, 0.0) + seconds, 4)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - started)
+
+    def describe(self, photos: List[bytes], rows: int, cols: int, size_option: str) -> None:
+        """Заполняет параметры задания: число фото и страниц, таблицу, объем фото."""
+        self.photos = len(photos)
+        self.pages = -(-len(photos) // max(rows * cols, 1))
+        self.layout = f"{rows}×{cols} {size_option}"
+        self.bytes["photos"] = sum(len(photo) for photo in photos)
+
+    def add_engine(self, name: str) -> None:
+        if name not in self.engine:
+            self.engine.append(name)
+
+
+class FlightRecorder:
+    """Кольцевой буфер последних трасс и необязательный JSONL-файл."""
+
+    def __init__(self, capacity: int = 200, path: Optional[str] = None) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._traces: Deque[JobTrace] = deque(maxlen=capacity)
+        self._listener: Optional[QueueListener] = None
+        self.path: Optional[str] = None
+        self.configure(capacity, path)
+        atexit.register(self.stop)
+
+    def configure(self, capacity: int, path: Optional[str]) -> None:
+        """Задает размер буфера и файл JSONL (пусто - не писать)."""
+        with self._lock:
+            self._traces = deque(self._traces, maxlen=max(capacity, 1))
+        self.stop()
+        self.path = path or None
+        if self.path:
+            file_handler: logging.Handler = logging.FileHandler(self.path, encoding="utf-8", delay=True)
+            file_handler.setFormatter(logging.Formatter("%(message)s"))
+            journal_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            journal.addHandler(QueueHandler(journal_queue))
+            journal.setLevel(logging.INFO)
+            self._listener = QueueListener(journal_queue, file_handler)
+            self._listener.start()
+
+    def stop(self) -> None:
+        """Дописывает трассы из очереди в файл и останавливает поток записи."""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+        for handler in journal.handlers[:]:
+            journal.removeHandler(handler)
+
+    def start(self, source: str, user_id: Optional[int] = None) -> JobTrace:
+        return JobTrace(job_id=uuid.uuid4().hex[:12], source=source, user_id=user_id)
+
+    def finish(self, trace: JobTrace, outcome: str, error: Optional[str] = None) -> None:
+        """Закрывает трассу: итог, общая длительность, запись в буфер и файл."""
+        if trace.outcome != "running":
+            return
+        trace.outcome = outcome
+        trace.error = error
+        trace.duration = round(time.time() - trace.started_at, 4)
+        with self._lock:
+            self._traces.append(trace)
+        if self.path:
+            journal.info(json.dumps(asdict(trace), ensure_ascii=False))
+        logger.info(
+            "Задание %s (%s) завершено: %s за %.2f с, этапы %s",
+            trace.job_id,
+            trace.source,
+            outcome,
+            trace.duration,
+            trace.stages,
+        )
+
+    def recent(self, limit: int = 10, user_id: Optional[int] = None) -> List[JobTrace]:
+        """Последние трассы, новые первыми (только пользователя user_id, если задан)."""
+        with self._lock:
+            traces: List[JobTrace] = list(self._traces)
+        traces.reverse()
+        if user_id is not None:
+            traces = [trace for trace in traces if trace.user_id == user_id]
+        return traces[:limit]
+
+    @staticmethod
+    def format_trace(trace: JobTrace) -> str:
+        """Компактное описание трассы для администратора."""
+        started: str = time.strftime("%d.%m %H:%M:%S", time.localtime(trace.started_at))
+        stages: str = " ".join(f"{name}={seconds:.2f}" for name, seconds in trace.stages.items())
+        sizes: str = " ".join(f"{name}={value / 1024 / 1024:.2f}MB" for name, value in trace.bytes.items())
+        lines: List[str] = [
+            f"{started} {trace.job_id} {trace.source} user={trace.user_id} → {trace.outcome} ({trace.duration:.2f} с)",
+            f"  фото={trace.photos} стр={trace.pages} {trace.layout} путь={'+'.join(trace.engine) or '-'}",
+            f"  {stages or 'нет этапов'}",
+        ]
+        if sizes:
+            lines.append(f"  {sizes}")
+        if trace.error:
+            lines.append(f"  ошибка: {trace.error[:200]}")
+        return "\n".join(lines)
+
+
+flight_recorder = FlightRecorder()
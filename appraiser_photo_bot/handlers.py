@@ -1,31 +1,64 @@
 """Обработчики сообщений и команд бота."""
 
 import asyncio
+import contextlib
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Coroutine, Dict, List, Optional, Tuple
 
 import telegram.error
-from telegram import Update
-from telegram.constants import ChatAction
+from telegram import File, InputMediaPhoto, Update
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
+from .archive import compress_entry, list_archive_images, open_archive
 from .config import BotConfig
-from .document_creators import DocumentCreator, calculate_pages_info, compress_image, get_size_option_name
 from .document_creators.messages import MessageGenerator
+from .document_creators.perceptual_hash import PhotoHashIndex
+from .document_creators.temp_manager import TempFileManager, cleanup_old_temp_files
+from .document_creators.utils import (
+    calculate_pages_info,
+    create_contact_sheets,
+    get_size_option_name,
+)
+from .expiry import ExpiryIndex
+from .flight_recorder import JobTrace, flight_recorder
 from .keyboards import Keyboards
+from .local_files import get_local_path, map_local_file
+from .metrics import metrics
+from .output_cache import OutputCache
+from .prerender import PagePrerenderer
+from .progress import ProgressMessage
+from .render_service import RenderService, create_page_executor
+from .spool import SessionSpool
+from .transport import FileDownloader
 
 logger = logging.getLogger(__name__)
+# События по каждому фото: частые, прореживаются через LOG_SAMPLING
+photo_logger = logging.getLogger(f"{__name__}.photos")
 
 TITLE, ROWS, COLS, SIZE_OPTION, PHOTOS, CONFIRM, CONFIRM_BACK = range(7)
 
+# Виды сроков в индексе истечения
+EXPIRY_SESSION = "session"  # неактивная сессия очищается
+EXPIRY_PURGE = "purge"  # очищенная сессия удаляется из user_data
+EXPIRY_DOCUMENT = "document"  # документ больше не доступен для /resend
+
+SESSION_PURGE_DELAY = 3600
+
+JOBS_DEFAULT_LIMIT = 5  # трасс в ответе /jobs по умолчанию
+JOBS_MAX_LIMIT = 20
+
 
 class BotHandlers:
     """Обработчики команд бота."""
@@ -34,6 +67,21 @@ class BotHandlers:
         self.config: BotConfig = config
         self.user_data: Dict[int, Dict[str, Any]] = {}
         self.messages: MessageGenerator = MessageGenerator()
+        self.render_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=config.render_workers, thread_name_prefix="render"
+        )
+        self.prerenderer: PagePrerenderer = PagePrerenderer(self.render_executor)
+        self.output_cache: OutputCache = OutputCache(config.output_cache_dir, config.output_cache_max_mb * 1024 * 1024)
+        # Пул процессов отрисовки страниц принадлежит render_service: тот заменяет его, если пул сломан
+        self.render_service: RenderService = RenderService(
+            config, self.render_executor, self.output_cache, create_page_executor(config)
+        )
+        self.downloader: FileDownloader = FileDownloader()
+        self.spool: SessionSpool = SessionSpool()
+        TempFileManager.set_quota(config.temp_quota_mb * 1024 * 1024)
+        # Сведения о последнем документе пользователя для повторной отправки (переживают очистку сессии)
+        self.last_documents: Dict[int, Dict[str, Any]] = {}
+        self.expiry: ExpiryIndex = ExpiryIndex()
 
     def get_button_handler(self) -> MessageHandler:
         """Возвращает обработчик кнопок основной клавиатуры."""
@@ -74,9 +122,12 @@ class BotHandlers:
             "cols": None,
             "size_option": None,
             "photos": [],
+            "photo_hashes": PhotoHashIndex(),
             "created_at": datetime.now(),
             "state": "title",
         }
+        self.expiry.cancel(EXPIRY_PURGE, user_id)
+        self.expiry.schedule(EXPIRY_SESSION, user_id, self.config.session_timeout)
 
         await update.message.reply_text(
             self.messages.get_initial_bot_message(),
@@ -244,7 +295,7 @@ class BotHandlers:
         """Получаем фотографии от пользователя."""
         user_id: int = update.effective_user.id
 
-        logger.info(f"=== ПОЛУЧЕНО СООБЩЕНИЕ от пользователя {user_id} ===")
+        photo_logger.info("=== ПОЛУЧЕНО СООБЩЕНИЕ от пользователя %s ===", user_id)
 
         if user_id not in self.user_data:
             logger.warning(f"Пользователь {user_id} не найден в данных")
@@ -255,19 +306,17 @@ class BotHandlers:
             return ConversationHandler.END
 
         try:
-            photo_bytes = None
+            photo_file = None
 
             if update.message.photo:
-                logger.info(f"Получено как фото, размеров: {len(update.message.photo)}")
+                photo_logger.info("Получено как фото, размеров: %d", len(update.message.photo))
                 photo_file = await update.message.photo[-1].get_file()
-                photo_bytes = await photo_file.download_as_bytearray()
 
             elif update.message.document:
-                logger.info(f"Получено как документ: {update.message.document.file_name}")
+                photo_logger.info("Получено как документ: %s", update.message.document.file_name)
                 mime_type = update.message.document.mime_type
                 if mime_type and ("image" in mime_type):
                     photo_file = await update.message.document.get_file()
-                    photo_bytes = await photo_file.download_as_bytearray()
                 else:
                     logger.warning(f"Документ не является изображением: {mime_type}")
                     await update.message.reply_text(
@@ -276,7 +325,10 @@ class BotHandlers:
                     )
                     return PHOTOS
 
-            if not photo_bytes:
+            loaded = await self._load_photo(user_id, photo_file) if photo_file else None
+            compressed_bytes, photo_hash = loaded if loaded else (None, None)
+
+            if not compressed_bytes:
                 logger.warning("Не удалось получить фото из сообщения")
                 await update.message.reply_text(
                     self.messages.get_photo_format_error(),
@@ -284,22 +336,34 @@ class BotHandlers:
                 )
                 return PHOTOS
 
-            logger.info(f"Фото загружено, размер в байтах: {len(photo_bytes)}")
-
-            logger.info("Сжимаем фото...")
-            compressed_bytes: bytes = compress_image(photo_bytes, self.config.image_quality, self.config.image_max_size)
-            logger.info(f"Фото сжато, размер после сжатия: {len(compressed_bytes)}")
+            duplicate_of: Optional[int] = self._find_duplicate(user_id, photo_hash)
+            if duplicate_of is not None:
+                metrics.inc("photos.duplicates")
+                photo_logger.info("Фото похоже на фото №%d", duplicate_of + 1)
+                if self.config.duplicate_photos == "skip":
+                    await update.message.reply_text(
+                        self.messages.get_duplicate_skipped_message(duplicate_of + 1),
+                        reply_markup=Keyboards.create_upload_keyboard(),
+                    )
+                    return PHOTOS
 
             self.user_data[user_id]["photos"].append(compressed_bytes)
-            logger.info(f"Фото сохранено. Всего фото: {len(self.user_data[user_id]['photos'])}")
+            self._photo_index(user_id).add(photo_hash)
+            photo_logger.info("Фото сохранено. Всего фото: %d", len(self.user_data[user_id]["photos"]))
 
             rows: int = self.user_data[user_id]["rows"]
             cols: int = self.user_data[user_id]["cols"]
             received: int = len(self.user_data[user_id]["photos"])
 
+            self.prerenderer.on_photo_added(
+                user_id, self.user_data[user_id]["photos"], rows, cols, self.user_data[user_id]["size_option"]
+            )
+
             response_text: str = self.messages.generate_upload_progress(current=received, rows=rows, cols=cols)
+            if duplicate_of is not None:
+                response_text = self.messages.get_duplicate_warning(duplicate_of + 1) + response_text
 
-            logger.info("Отправляем ответ пользователю")
+            photo_logger.debug("Отправляем ответ пользователю")
             await update.message.reply_text(
                 response_text,
                 parse_mode="Markdown",
@@ -315,6 +379,188 @@ class BotHandlers:
             )
             return PHOTOS
 
+    async def get_archive(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Принимаем ZIP-архив с фото: все фото добавляются в сессию одним шагом."""
+        user_id: int = update.effective_user.id
+        document = update.message.document
+
+        logger.info(f"=== ПОЛУЧЕН АРХИВ от пользователя {user_id}: {document.file_name} ===")
+
+        if user_id not in self.user_data:
+            logger.warning(f"Пользователь {user_id} не найден в данных")
+            await update.message.reply_text(
+                self.messages.get_session_expired_message(),
+                reply_markup=Keyboards.create_start_keyboard(),
+            )
+            return ConversationHandler.END
+
+        limit_mb: float = self.config.max_archive_mb
+        if document.file_size and document.file_size > limit_mb * 1024 * 1024:
+            await update.message.reply_text(
+                self.messages.get_archive_too_big_error(document.file_size / 1024 / 1024, limit_mb),
+                reply_markup=Keyboards.create_upload_keyboard(),
+            )
+            return PHOTOS
+
+        photos: List[bytes] = self.user_data[user_id]["photos"]
+        capacity: int = self.config.max_photos - len(photos)
+        if capacity <= 0:
+            await update.message.reply_text(
+                self.messages.get_archive_full_error(self.config.max_photos),
+                reply_markup=Keyboards.create_upload_keyboard(),
+            )
+            return PHOTOS
+
+        try:
+            result = await self._load_archive(user_id, await document.get_file(), capacity)
+            if result is None:
+                await update.message.reply_text(
+                    self.messages.get_archive_error(),
+                    reply_markup=Keyboards.create_upload_keyboard(),
+                )
+                return PHOTOS
+
+            loaded, skipped, over_limit = result
+            index: PhotoHashIndex = self._photo_index(user_id)
+            added: int = 0
+            duplicates: int = 0
+            for photo, photo_hash in loaded:
+                if self._find_duplicate(user_id, photo_hash) is not None:
+                    duplicates += 1
+                    if self.config.duplicate_photos == "skip":
+                        continue
+                photos.append(photo)
+                index.add(photo_hash)
+                added += 1
+            metrics.inc("archive.uploads")
+            metrics.inc("archive.photos", added)
+            metrics.inc("photos.duplicates", duplicates)
+            logger.info(f"Из архива добавлено {added} фото, пропущено {skipped}, повторов {duplicates}")
+
+            rows: int = self.user_data[user_id]["rows"]
+            cols: int = self.user_data[user_id]["cols"]
+            self.prerenderer.on_photos_added(user_id, photos, added, rows, cols, self.user_data[user_id]["size_option"])
+
+            response_text: str = self.messages.get_archive_summary(
+                added, skipped, over_limit, duplicates, self.config.duplicate_photos == "skip"
+            )
+            if photos:
+                response_text += self.messages.generate_upload_progress(current=len(photos), rows=rows, cols=cols)
+            await update.message.reply_text(
+                response_text,
+                parse_mode="Markdown",
+                reply_markup=Keyboards.create_upload_keyboard(),
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при обработке архива: {e}", exc_info=True)
+            await update.message.reply_text(
+                self.messages.get_photo_processing_error(),
+                reply_markup=Keyboards.create_upload_keyboard(),
+            )
+        return PHOTOS
+
+    async def _load_archive(
+        self, user_id: int, archive_file: File, capacity: int
+    ) -> Optional[Tuple[List[Tuple[bytes, Optional[int]]], int, int]]:
+        """Открывает архив с диска локального Bot API или из спула сессии и сжимает фото на общем пуле.
+
+        Возвращает ((фото, хеш) в порядке имен файлов, пропущено, не вошло в лимит) или None, если это не ZIP.
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        local_path: Optional[str] = get_local_path(archive_file.file_path, self.config.local_mode)
+
+        started: float = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            if local_path:
+                source = stack.enter_context(open(local_path, "rb"))
+            else:
+                # Архив пишется частями в спул и при большом размере уходит на диск, а не в память
+                source = stack.enter_context(self.spool.open(user_id))
+                if archive_file.file_path.startswith(("http://", "https://")):
+                    await self.downloader.download_to(archive_file.file_path, source)
+                else:
+                    await archive_file.download_to_memory(out=source)
+                    source.seek(0)
+
+            archive = await loop.run_in_executor(self.render_executor, open_archive, source)
+            if archive is None:
+                return None
+            stack.enter_context(archive)
+
+            contents = list_archive_images(archive)
+            entries = contents.entries[:capacity]
+            self._record_upload(user_id, "download", started, sum(info.file_size for info in entries))
+            started = time.perf_counter()
+            results: List[Optional[Tuple[bytes, Optional[int]]]] = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self.render_executor,
+                        compress_entry,
+                        archive,
+                        info,
+                        self.config.image_quality,
+                        self.config.image_max_size,
+                        self.config.adaptive_ssim_target,
+                    )
+                    for info in entries
+                )
+            )
+
+        self._record_upload(user_id, "upload_compress", started)
+        loaded: List[Tuple[bytes, Optional[int]]] = [result for result in results if result]
+        skipped: int = contents.skipped + len(entries) - len(loaded)
+        return loaded, skipped, len(contents.entries) - len(entries)
+
+    def _record_upload(self, user_id: int, stage: str, started: float, size: int = 0) -> None:
+        """Копит в сессии время этапа загрузки фото (download/compress) и объем полученных данных.
+
+        При создании документа эти суммы попадают в его трассу.
+        """
+        stats: Dict[str, float] = self.user_data[user_id].setdefault("upload_stats", {})
+        stats[stage] = stats.get(stage, 0.0) + time.perf_counter() - started
+        stats["bytes"] = stats.get("bytes", 0) + size
+
+    def _photo_index(self, user_id: int) -> PhotoHashIndex:
+        return self.user_data[user_id].setdefault("photo_hashes", PhotoHashIndex())
+
+    def _find_duplicate(self, user_id: int, photo_hash: Optional[int]) -> Optional[int]:
+        """Индекс уже загруженного похожего фото или None (и при DUPLICATE_PHOTOS=off)."""
+        if self.config.duplicate_photos == "off":
+            return None
+        return self._photo_index(user_id).find(photo_hash, self.config.duplicate_distance)
+
+    async def _load_photo(self, user_id: int, photo_file: File) -> Optional[Tuple[bytes, Optional[int]]]:
+        """Получает фото (с диска локального Bot API или частями по HTTP в спул сессии), сжимает его и считает хеш."""
+        local_path: Optional[str] = get_local_path(photo_file.file_path, self.config.local_mode)
+        if local_path:
+            if os.path.getsize(local_path) == 0:
+                return None
+            photo_logger.info("Фото читается с диска локального Bot API: %s", local_path)
+            with map_local_file(local_path) as mapped:
+                photo_logger.info("Фото загружено, размер в байтах: %d", len(mapped))
+                self._record_upload(user_id, "download", time.perf_counter(), len(mapped))
+                started: float = time.perf_counter()
+                compressed_bytes, photo_hash = await self.render_service.compress_with_hash(mapped)
+        else:
+            with self.spool.open(user_id) as spool_file:
+                started = time.perf_counter()
+                if photo_file.file_path.startswith(("http://", "https://")):
+                    size: int = await self.downloader.download_to(photo_file.file_path, spool_file)
+                else:
+                    await photo_file.download_to_memory(out=spool_file)
+                    size = spool_file.tell()
+                    spool_file.seek(0)
+                if not size:
+                    return None
+                photo_logger.info("Фото загружено, размер в байтах: %d", size)
+                self._record_upload(user_id, "download", started, size)
+                started = time.perf_counter()
+                compressed_bytes, photo_hash = await self.render_service.compress_with_hash(spool_file)
+        self._record_upload(user_id, "upload_compress", started)
+
+        photo_logger.info("Фото сжато, размер после сжатия: %d", len(compressed_bytes))
+        return compressed_bytes, photo_hash
+
     async def back_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Обработка кнопки Назад."""
         user_id: int = update.effective_user.id
@@ -384,6 +630,9 @@ class BotHandlers:
             user_id: int = update.effective_user.id
             if user_id in self.user_data:
                 self.user_data[user_id]["photos"] = []
+                self.user_data[user_id].pop("upload_stats", None)
+                self._photo_index(user_id).clear()
+                self.prerenderer.discard(user_id)
 
                 if self.user_data[user_id].get("size_option"):
                     rows: int = self.user_data[user_id]["rows"]
@@ -453,6 +702,14 @@ class BotHandlers:
             page_info=page_info,
         )
 
+        if self.config.duplicate_photos != "off":
+            duplicates = self._photo_index(user_id).duplicates(self.config.duplicate_distance)
+            if duplicates:
+                logger.info(f"Похожих фото перед созданием документа: {len(duplicates)}")
+                confirmation_text = self.messages.get_duplicates_report(duplicates) + confirmation_text
+
+        await self._send_preview(update, user_id, rows, cols, page_info)
+
         logger.info("Отправляем подтверждение пользователю с клавиатурой")
         await update.message.reply_text(
             confirmation_text,
@@ -464,6 +721,41 @@ class BotHandlers:
         self.user_data[user_id]["state"] = "confirmation"
         return CONFIRM
 
+    async def _send_preview(self, update: Update, user_id: int, rows: int, cols: int, page_info: Dict) -> None:
+        """Отправляет превью страниц (контактные листы) перед подтверждением."""
+        if self.config.preview_max_pages <= 0:
+            return
+
+        try:
+            sheets: List[bytes] = await asyncio.get_running_loop().run_in_executor(
+                self.render_executor,
+                create_contact_sheets,
+                list(self.user_data[user_id]["photos"]),
+                rows,
+                cols,
+                self.config.preview_max_pages,
+            )
+            total_pages: int = page_info["total_pages"]
+
+            for start in range(0, len(sheets), 10):
+                chunk: List[bytes] = sheets[start : start + 10]
+                if len(chunk) == 1:
+                    await update.message.reply_photo(
+                        chunk[0], caption=self.messages.get_preview_caption(start + 1, total_pages)
+                    )
+                else:
+                    await update.message.reply_media_group(
+                        [
+                            InputMediaPhoto(sheet, caption=self.messages.get_preview_caption(page_num, total_pages))
+                            for page_num, sheet in enumerate(chunk, start + 1)
+                        ]
+                    )
+
+            if len(sheets) < total_pages:
+                await update.message.reply_text(self.messages.get_preview_truncated_message(len(sheets), total_pages))
+        except Exception as e:
+            logger.warning(f"Не удалось отправить превью: {e}")
+
     async def handle_confirm_yes(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Обработка кнопки 'Да, всё верно'."""
         user_id: int = update.effective_user.id
@@ -475,7 +767,7 @@ class BotHandlers:
             )
             return ConversationHandler.END
 
-        await self.create_document_from_text(update, context, user_id)
+        self._run_in_background(update, context, self.create_document_from_text(update, context, user_id), "document")
         return ConversationHandler.END
 
     async def handle_confirm_no(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -495,11 +787,17 @@ class BotHandlers:
 
     async def _create_and_send_document(self, context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
         """Общая логика создания и отправки документа с явным прогрессом."""
+        progress: Optional[ProgressMessage] = None
+        session: Optional[Dict[str, Any]] = None
+        trace: JobTrace = flight_recorder.start("bot", user_id)
+        outcome: str = "error"
+        error: Optional[str] = None
         try:
             logger.info(f"=== НАЧАЛО СОЗДАНИЯ ДОКУМЕНТА для пользователя {user_id} ===")
 
             if user_id not in self.user_data:
                 logger.warning(f"Пользователь {user_id} не найден в данных")
+                outcome = "no_session"
                 await context.bot.send_message(
                     chat_id=user_id,
                     text=self.messages.get_session_expired_message(),
@@ -512,9 +810,11 @@ class BotHandlers:
                 )
                 return
 
-            photos_count: int = len(self.user_data[user_id]["photos"])
-            rows: int = self.user_data[user_id]["rows"]
-            cols: int = self.user_data[user_id]["cols"]
+            # Сессия берется один раз: пока документ создается в фоне, пользователь может начать новую
+            session = self.user_data[user_id]
+            photos_count: int = len(session["photos"])
+            rows: int = session["rows"]
+            cols: int = session["cols"]
             page_info: Dict = calculate_pages_info(photos_count, rows, cols)
 
             logger.info(
@@ -523,6 +823,7 @@ class BotHandlers:
 
             if photos_count > BotConfig.max_photos:
                 logger.warning(f"Слишком много фото: {photos_count} > {BotConfig.max_photos}")
+                outcome = "too_many_photos"
                 error_text: str = self.messages.get_too_many_photos_error(photos_count, BotConfig.max_photos)
 
                 await context.bot.send_message(chat_id=user_id, text=error_text, parse_mode="Markdown")
@@ -533,35 +834,43 @@ class BotHandlers:
                 )
                 return
 
-            creating_text: str = self.messages.get_creating_document_message_with_progress(
-                photos_count, rows, cols, page_info, progress=10
-            )
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=creating_text,
-                parse_mode="Markdown",
-                reply_markup=Keyboards.create_wait_keyboard(),
+            progress = ProgressMessage(
+                context.bot,
+                user_id,
+                lambda percent, stage_text: self.messages.get_creating_document_message_with_progress(
+                    photos_count, rows, cols, page_info, progress=percent, stage_text=stage_text
+                ),
+                min_interval=self.config.progress_update_interval,
             )
-
-            await context.bot.send_chat_action(chat_id=user_id, action=ChatAction.UPLOAD_DOCUMENT)
-
-            logger.info("Создаю DocumentCreator...")
-            creator: DocumentCreator = DocumentCreator(
-                title=self.user_data[user_id]["title"],
-                rows=rows,
-                cols=cols,
-                size_option=self.user_data[user_id]["size_option"],
+            await progress.start(reply_markup=Keyboards.create_wait_keyboard())
+
+            photos: List[bytes] = session["photos"]
+            title: Optional[str] = session["title"]
+            size_option: str = session["size_option"]
+            upload_stats: Dict[str, float] = session.get("upload_stats", {})
+            for stage in ("download", "upload_compress"):
+                if stage in upload_stats:
+                    trace.add_stage(stage, upload_stats[stage])
+            if upload_stats.get("bytes"):
+                trace.bytes["download"] = int(upload_stats["bytes"])
+            cache_key, document_bytes = await self.render_service.render(
+                photos,
+                title,
+                rows,
+                cols,
+                size_option,
+                prerendered=lambda: self.prerenderer.collect(user_id, photos, rows, cols, size_option),
+                progress_callback=progress.threadsafe_callback(),
+                trace=trace,
             )
 
-            logger.info(f"Начинаю создание документа из {photos_count} фото...")
-            document_bytes: bytes = creator.create_document(self.user_data[user_id]["photos"])
-
             doc_size_mb: float = len(document_bytes) / 1024 / 1024
             logger.info(f"Документ создан: {doc_size_mb:.2f} MB")
 
-            if doc_size_mb > 45:
+            if doc_size_mb > self.config.max_document_mb:
                 logger.error(f"Документ слишком большой: {doc_size_mb:.2f} MB")
-                error_text: str = self.messages.get_document_too_big_error(doc_size_mb)
+                outcome = "too_big"
+                error_text: str = self.messages.get_document_too_big_error(doc_size_mb, self.config.max_document_mb)
 
                 await context.bot.send_message(
                     chat_id=user_id,
@@ -570,114 +879,213 @@ class BotHandlers:
                     reply_markup=Keyboards.create_start_keyboard(),
                 )
 
-                self.cleanup_user_data(user_id)
+                self._release_job_session(user_id, session)
                 return
 
-            sending_text: str = self.messages.get_sending_document_message_with_progress(doc_size_mb, progress=50)
-
+            sending_text: str = self.messages.get_sending_document_message_with_progress(doc_size_mb, progress=90)
+            await progress.set_text(sending_text)
+
+            document_info: Dict[str, Any] = {
+                "cache_key": cache_key,
+                "filename": self.messages.generate_filename(
+                    title=session["title"],
+                    photos_count=photos_count,
+                    rows=rows,
+                    cols=cols,
+                ),
+                "caption": self.messages.get_document_caption(
+                    title=session["title"],
+                    photos_count=photos_count,
+                    rows=rows,
+                    cols=cols,
+                    size_option=session["size_option"],
+                    page_info=page_info,
+                ),
+                "photos_count": photos_count,
+                "rows": rows,
+                "cols": cols,
+                "page_info": page_info,
+                "doc_size_mb": doc_size_mb,
+                "created_at": datetime.now(),
+            }
+            self.last_documents[user_id] = document_info
+            self.expiry.schedule(EXPIRY_DOCUMENT, user_id, self.config.output_cache_ttl)
+
+            self._release_job_session(user_id, session)
+
+            with trace.stage("send"):
+                sent: bool = await self._deliver_document(context, user_id, document_bytes, document_info, progress)
+            outcome = "sent" if sent else "send_failed"
+
+        except telegram.error.TimedOut as e:
+            logger.error("Таймаут при создании/отправке документа")
+            outcome, error = "timeout", repr(e)
+            error_text: str = self.messages.get_creation_timeout_error()
             await context.bot.send_message(
                 chat_id=user_id,
-                text=sending_text,
+                text=error_text,
                 parse_mode="Markdown",
-                reply_markup=Keyboards.create_wait_keyboard(),
-            )
-
-            file_caption: str = self.messages.get_document_caption(
-                title=self.user_data[user_id]["title"],
-                photos_count=photos_count,
-                rows=rows,
-                cols=cols,
-                size_option=self.user_data[user_id]["size_option"],
-                page_info=page_info,
+                reply_markup=Keyboards.create_start_keyboard(),
             )
+            self._release_job_session(user_id, session)
 
-            filename: str = self.messages.generate_filename(
-                title=self.user_data[user_id]["title"],
-                photos_count=photos_count,
-                rows=rows,
-                cols=cols,
+        except Exception as e:
+            logger.error(f"Ошибка при создании документа: {e}", exc_info=True)
+            error = repr(e)
+            error_text: str = self.messages.get_generic_creation_error(str(e))
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=error_text,
+                parse_mode="Markdown",
+                reply_markup=Keyboards.create_start_keyboard(),
             )
-
-            self.cleanup_user_data(user_id)
-
+            self._release_job_session(user_id, session)
+
+        finally:
+            flight_recorder.finish(trace, outcome, error)
+            if progress:
+                await progress.stop()
+
+    @staticmethod
+    def _delivery_timeout(size_bytes: int, attempt: int) -> float:
+        """Таймаут отправки: растет с размером файла (~100 КБ/с) и номером попытки."""
+        size_mb: float = size_bytes / 1024 / 1024
+        return min(max(60.0, 30.0 + size_mb * 10.0) * attempt, 1800.0)
+
+    async def _send_document_with_retry(
+        self,
+        context: ContextTypes.DEFAULT_TYPE,
+        user_id: int,
+        document_bytes: bytes,
+        filename: str,
+        caption: str,
+    ) -> None:
+        """Отправляет документ с повтором при таймауте/ошибке сети и экспоненциальной паузой."""
+        attempts: int = max(self.config.send_retries, 1)
+        for attempt in range(1, attempts + 1):
+            timeout: float = self._delivery_timeout(len(document_bytes), attempt)
             try:
                 await context.bot.send_document(
                     chat_id=user_id,
                     document=document_bytes,
                     filename=filename,
-                    caption=file_caption,
-                    parse_mode="Markdown",
-                    read_timeout=300,
-                    write_timeout=300,
-                    connect_timeout=120,
-                )
-                logger.info("✅ Документ успешно отправлен!")
-
-                file_sent_text: str = self.messages.get_file_sent_message(progress=80)
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=file_sent_text,
-                    parse_mode="Markdown",
-                    reply_markup=Keyboards.create_wait_keyboard(),
-                )
-
-                await asyncio.sleep(1)
-
-                success_text: str = self.messages.get_document_success_message_with_progress(
-                    photos_count, rows, cols, page_info, doc_size_mb, progress=100
-                )
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=success_text,
+                    caption=caption,
                     parse_mode="Markdown",
-                    reply_markup=Keyboards.create_start_keyboard(),
+                    read_timeout=timeout,
+                    write_timeout=timeout,
+                    connect_timeout=self.config.connect_timeout,
                 )
-
-            except telegram.error.TimedOut:
-                logger.error("Таймаут при отправке документа в Telegram")
-                error_text: str = self.messages.get_timeout_error(doc_size_mb)
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=error_text,
-                    parse_mode="Markdown",
-                    reply_markup=Keyboards.create_start_keyboard(),
+                metrics.inc("delivery.sent")
+                return
+            except telegram.error.BadRequest:
+                raise
+            except telegram.error.NetworkError as e:
+                metrics.inc("delivery.failed_attempts")
+                if attempt == attempts:
+                    raise
+                delay: int = 2**attempt
+                logger.warning(
+                    f"Попытка {attempt}/{attempts} отправки документа пользователю {user_id} не удалась ({e}), "
+                    f"повтор через {delay} сек"
                 )
+                await asyncio.sleep(delay)
+
+    async def _deliver_document(
+        self,
+        context: ContextTypes.DEFAULT_TYPE,
+        user_id: int,
+        document_bytes: bytes,
+        document_info: Dict[str, Any],
+        progress: Optional[ProgressMessage] = None,
+    ) -> bool:
+        """Отправляет готовый документ и сообщает пользователю результат. Возвращает, доставлен ли документ."""
+        doc_size_mb: float = document_info["doc_size_mb"]
+        try:
+            await self._send_document_with_retry(
+                context, user_id, document_bytes, document_info["filename"], document_info["caption"]
+            )
+            logger.info("✅ Документ успешно отправлен!")
+
+            if progress:
+                await progress.stop()
+                await progress.set_text(self.messages.get_file_sent_message(progress=100))
+
+            success_text: str = self.messages.get_document_success_message_with_progress(
+                document_info["photos_count"],
+                document_info["rows"],
+                document_info["cols"],
+                document_info["page_info"],
+                doc_size_mb,
+                progress=100,
+            )
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=success_text,
+                parse_mode="Markdown",
+                reply_markup=Keyboards.create_start_keyboard(),
+            )
+            return True
 
-            except telegram.error.BadRequest as e:
-                logger.error(f"Ошибка BadRequest при отправке: {e}")
-                if "file is too big" in str(e).lower():
-                    error_text: str = self.messages.get_file_too_big_error(doc_size_mb)
-                else:
-                    error_text: str = self.messages.get_generic_api_error(str(e))
-
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=error_text,
-                    parse_mode="Markdown",
-                    reply_markup=Keyboards.create_start_keyboard(),
-                )
+        except telegram.error.BadRequest as e:
+            logger.error(f"Ошибка BadRequest при отправке: {e}")
+            if "file is too big" in str(e).lower():
+                error_text: str = self.messages.get_file_too_big_error(doc_size_mb)
+            else:
+                error_text: str = self.messages.get_generic_api_error(str(e))
 
-        except telegram.error.TimedOut:
-            logger.error("Таймаут при создании/отправке документа")
-            error_text: str = self.messages.get_creation_timeout_error()
             await context.bot.send_message(
                 chat_id=user_id,
                 text=error_text,
                 parse_mode="Markdown",
                 reply_markup=Keyboards.create_start_keyboard(),
             )
-            self.cleanup_user_data(user_id)
 
-        except Exception as e:
-            logger.error(f"Ошибка при создании документа: {e}", exc_info=True)
-            error_text: str = self.messages.get_generic_creation_error(str(e))
+        except telegram.error.NetworkError as e:
+            logger.error(f"Не удалось отправить документ в Telegram: {e}")
+            error_text: str = self.messages.get_timeout_error(doc_size_mb)
             await context.bot.send_message(
                 chat_id=user_id,
                 text=error_text,
                 parse_mode="Markdown",
+                reply_markup=Keyboards.create_resend_keyboard(),
+            )
+        return False
+
+    async def resend_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Повторная отправка последнего документа без пересоздания."""
+        self._run_in_background(update, context, self._resend_document(context, update.effective_user.id), "resend")
+
+    async def handle_resend_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработка кнопки '🔁 Отправить повторно'."""
+        await update.callback_query.answer()
+        self._run_in_background(update, context, self._resend_document(context, update.effective_user.id), "resend")
+
+    async def _resend_document(self, context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
+        """Берет последний документ пользователя из кеша и отправляет его снова."""
+        document_info: Optional[Dict[str, Any]] = self.last_documents.get(user_id)
+        document_bytes: Optional[bytes] = None
+        if document_info:
+            document_bytes = await asyncio.get_running_loop().run_in_executor(
+                self.render_executor, self.output_cache.get, document_info["cache_key"]
+            )
+
+        if document_bytes is None:
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=self.messages.get_resend_unavailable_message(),
+                parse_mode="Markdown",
                 reply_markup=Keyboards.create_start_keyboard(),
             )
-            self.cleanup_user_data(user_id)
+            return
+
+        logger.info(f"Повторная отправка документа пользователю {user_id}")
+        metrics.inc("delivery.resend")
+        await context.bot.send_message(
+            chat_id=user_id,
+            text=self.messages.get_resending_message(document_info["doc_size_mb"]),
+            parse_mode="Markdown",
+        )
+        await self._deliver_document(context, user_id, document_bytes, document_info)
 
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Отмена диалога."""
@@ -703,6 +1111,9 @@ class BotHandlers:
 
         photos_count: int = len(self.user_data[user_id].get("photos", []))
         self.user_data[user_id]["photos"] = []
+        self.user_data[user_id].pop("upload_stats", None)
+        self._photo_index(user_id).clear()
+        self.prerenderer.discard(user_id)
 
         await update.message.reply_text(
             self.messages.get_photos_cleared_message(photos_count),
@@ -760,6 +1171,44 @@ class BotHandlers:
 
             await update.message.reply_text(status_text, parse_mode="Markdown", reply_markup=reply_keyboard)
 
+    async def metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Показывает метрики бота администратору."""
+        user_id: int = update.effective_user.id
+
+        if not self.config.admin_id or user_id != self.config.admin_id:
+            await update.message.reply_text(self.messages.get_admin_only_message())
+            return
+
+        await update.message.reply_text(
+            self.messages.get_metrics_message(metrics.format_text()),
+            parse_mode="Markdown",
+        )
+
+    async def jobs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Показывает администратору трассы последних заданий: /jobs [N] или /jobs user <id> [N]."""
+        user_id: int = update.effective_user.id
+
+        if not self.config.admin_id or user_id != self.config.admin_id:
+            await update.message.reply_text(self.messages.get_admin_only_message())
+            return
+
+        args: List[str] = list(context.args or [])
+        filter_user: Optional[int] = None
+        try:
+            if args and args[0] == "user":
+                filter_user = int(args[1])
+                args = args[2:]
+            limit: int = int(args[0]) if args else JOBS_DEFAULT_LIMIT
+        except (IndexError, ValueError):
+            await update.message.reply_text(self.messages.get_jobs_usage_message(), parse_mode="Markdown")
+            return
+
+        traces: List[JobTrace] = flight_recorder.recent(min(max(limit, 1), JOBS_MAX_LIMIT), filter_user)
+        await update.message.reply_text(
+            self.messages.get_jobs_message([flight_recorder.format_trace(trace) for trace in traces]),
+            parse_mode="Markdown",
+        )
+
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Справка по боту."""
         user_id: int = update.effective_user.id
@@ -783,34 +1232,65 @@ class BotHandlers:
 
         await update.message.reply_text(help_text, parse_mode="Markdown", reply_markup=reply_keyboard)
 
+    def get_activity_handler(self) -> TypeHandler:
+        """Возвращает обработчик, отмечающий активность пользователя на каждом обновлении."""
+        return TypeHandler(Update, self.touch_session)
+
+    async def touch_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Переносит таймаут сессии пользователя: отсчет идет от последней активности."""
+        user = update.effective_user
+        if user is None or user.id not in self.user_data or self.expiry.is_scheduled(EXPIRY_PURGE, user.id):
+            return
+        self.user_data[user.id]["last_activity"] = datetime.now()
+        self.expiry.schedule(EXPIRY_SESSION, user.id, self.config.session_timeout)
+
+    @staticmethod
+    def _run_in_background(
+        update: Update, context: ContextTypes.DEFAULT_TYPE, coroutine: Coroutine[Any, Any, None], name: str
+    ) -> None:
+        """Запускает создание или отправку документа фоновой задачей приложения.
+
+        Обновления обрабатываются по одному (concurrent_updates=False), а рендеринг и повторы
+        отправки с таймаутами до 30 минут иначе задержали бы обновления всех пользователей.
+        Ошибки задачи попадают в общий обработчик ошибок вместе с update.
+        """
+        context.application.create_task(coroutine, update=update, name=f"{name}-{update.effective_user.id}")
+
+    def _release_job_session(self, user_id: int, session: Optional[Dict[str, Any]]) -> None:
+        """Очищает сессию задания, если пользователь не начал новую, пока документ создавался."""
+        if session is None or self.user_data.get(user_id) is session:
+            self.cleanup_user_data(user_id)
+
     def cleanup_user_data(self, user_id: int) -> None:
-        """Очищает данные пользователя из памяти."""
+        """Очищает данные пользователя из памяти; сама запись удаляется через SESSION_PURGE_DELAY."""
+        self.prerenderer.discard(user_id)
+        self.spool.discard(user_id)
+        self.expiry.cancel(EXPIRY_SESSION, user_id)
         if user_id in self.user_data:
             if "photos" in self.user_data[user_id]:
                 self.user_data[user_id]["photos"] = []
-            asyncio.create_task(self._delayed_cleanup(user_id))
-
-    async def _delayed_cleanup(self, user_id: int, delay: int = 3600) -> None:
-        """Отложенная очистка данных пользователя."""
-        await asyncio.sleep(delay)
-        if user_id in self.user_data:
-            del self.user_data[user_id]
-            logger.info(f"Очищены данные пользователя {user_id}")
+                self.user_data[user_id].pop("upload_stats", None)
+                self._photo_index(user_id).clear()
+            self.expiry.schedule(EXPIRY_PURGE, user_id, SESSION_PURGE_DELAY)
 
     async def periodic_cleanup(self, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Периодическая очистка старых данных."""
-        current_time: datetime = datetime.now()
-        users_to_clean: List[int] = []
+        """Периодическая очистка: обрабатывает только истекшие сроки из индекса."""
+        for kind, user_id in self.expiry.pop_expired():
+            if kind == EXPIRY_SESSION:
+                self.cleanup_user_data(user_id)
+                metrics.inc("sessions.expired")
+                logger.info(f"Автоматически очищены данные пользователя {user_id}")
+            elif kind == EXPIRY_PURGE:
+                if self.user_data.pop(user_id, None) is not None:
+                    metrics.inc("sessions.purged")
+                    logger.info(f"Очищены данные пользователя {user_id}")
+            elif kind == EXPIRY_DOCUMENT:
+                self.last_documents.pop(user_id, None)
 
-        for user_id, data in self.user_data.items():
-            if "created_at" in data:
-                age: float = (current_time - data["created_at"]).total_seconds()
-                if age > self.config.session_timeout:
-                    users_to_clean.append(user_id)
+        metrics.set_gauge("sessions.active", len(self.user_data))
+        metrics.set_gauge("sessions.expiry_index", len(self.expiry))
 
-        for user_id in users_to_clean:
-            self.cleanup_user_data(user_id)
-            logger.info(f"Автоматически очищены данные пользователя {user_id}")
+        await asyncio.get_running_loop().run_in_executor(self.render_executor, cleanup_old_temp_files, 1)
 
     def get_conversation_handler(self) -> ConversationHandler:
         """Возвращает настроенный ConversationHandler."""
@@ -846,6 +1326,7 @@ class BotHandlers:
                     ),
                 ],
                 PHOTOS: [
+                    MessageHandler(filters.Document.ZIP | filters.Document.FileExtension("zip"), self.get_archive),
                     MessageHandler(filters.PHOTO | filters.Document.IMAGE, self.get_photo),
                     MessageHandler(
                         filters.TEXT & filters.Regex(r"^(✅ Готово|◀️ Назад|🧹 Очистить|📊 Статус|❓ Помощь)$"),
@@ -902,6 +1383,7 @@ class BotHandlers:
         """Возвращает обработчики callback-запросов."""
         return [
             CallbackQueryHandler(self.size_option, pattern="^size_"),
+            CallbackQueryHandler(self.handle_resend_callback, pattern="^resend_"),
         ]
 
     def get_command_handlers(self) -> List[CommandHandler]:
@@ -910,4 +1392,7 @@ class BotHandlers:
             CommandHandler("cleanup", self.cleanup_command),
             CommandHandler("status", self.status_command),
             CommandHandler("help", self.help_command),
+            CommandHandler("metrics", self.metrics_command),
+            CommandHandler("jobs", self.jobs_command),
+            CommandHandler("resend", self.resend_command),
         ]
@@ -84,6 +84,14 @@ class Keyboards:
         ]
         return InlineKeyboardMarkup(keyboard)
 
+    @staticmethod
+    def create_resend_keyboard() -> InlineKeyboardMarkup:
+        """Inline клавиатура для повторной отправки готового документа."""
+        keyboard: List[List[InlineKeyboardButton]] = [
+            [InlineKeyboardButton("🔁 Отправить повторно", callback_data="resend_document")],
+        ]
+        return InlineKeyboardMarkup(keyboard)
+
     @staticmethod
     def create_wait_keyboard() -> ReplyKeyboardMarkup:
         """
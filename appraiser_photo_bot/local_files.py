@@ -0,0 +1,34 @@
+"""Чтение файлов, которые локальный Bot API сервер отдает путем на диске."""
+
+import logging
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_local_path(file_path: Optional[str], local_mode: bool) -> Optional[str]:
+    """Возвращает путь к файлу на диске, если он доступен боту напрямую.
+
+    В режиме --local сервер telegram-bot-api возвращает в getFile абсолютный путь.
+    Если каталог сервера не смонтирован у бота, файл скачивается по HTTP как обычно.
+    """
+    if not local_mode or not file_path or not os.path.isabs(file_path):
+        return None
+    if not os.path.isfile(file_path):
+        logger.warning(f"Файл локального Bot API недоступен по пути {file_path}, скачиваю по HTTP")
+        return None
+    return file_path
+
+
+@contextmanager
+def map_local_file(path: str) -> Iterator[mmap.mmap]:
+    """Отображает файл в память только для чтения (без копирования в процесс)."""
+    with open(path, "rb") as f:
+        mapped: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        mapped.close()
@@ -0,0 +1,193 @@
+"""Логирование через очередь: запись в консоль и файл в отдельном потоке.
+
+Обработчики событий только кладут запись в очередь (QueueHandler), а вывод,
+форматирование в JSON и ротацию файла выполняет поток QueueListener, поэтому
+цикл событий не ждет диска. Частые события горячих путей (по записи на каждое
+фото) пишутся в отдельные логгеры и прореживаются: из каждых N записей уровня
+INFO и ниже проходит одна, предупреждения и ошибки проходят всегда.
+
+Рабочие процессы (пакетный режим) не пишут в консоль и файл сами: их записи
+через multiprocessing.Queue возвращаются в главный процесс (forward_worker_logs).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import BotConfig
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Атрибуты LogRecord, которые не считаются полями extra
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, поля extra и исключение."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждую N-ю запись уровня INFO и ниже из заданных логгеров (и их потомков)."""
+
+    def __init__(self, rates: Dict[str, int]) -> None:
+        super().__init__()
+        self.rates: Dict[str, int] = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counters: Dict[str, int] = {}
+
+    def _rate(self, name: str) -> int:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate: int = self._rate(record.name)
+        if rate == 1:
+            return True
+        # Счетчик без блокировки: при гонке потоков запись может пройти лишний раз, это допустимо
+        count: int = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        if count % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который оставляет запись структурированной.
+
+    Стандартный prepare склеивает сообщение с текстом исключения; здесь подставляются
+    только аргументы %-форматирования, а исключение сохраняется отдельно в exc_text.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+def parse_sampling(value: str) -> Dict[str, int]:
+    """Разбирает LOG_SAMPLING вида "логгер=N,логгер=N"."""
+    rates: Dict[str, int] = {}
+    for item in value.split(","):
+        name, _, rate = item.strip().partition("=")
+        if name and rate.strip().isdigit():
+            rates[name.strip()] = int(rate)
+    return rates
+
+
+def setup_logging(config: BotConfig, log_file: Optional[str] = None) -> None:
+    """Настраивает корневой логгер: очередь, консоль и файл с ротацией (log_file или LOG_FILE)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    handlers: List[logging.Handler] = []
+    console: logging.Handler = logging.StreamHandler(sys.stdout)
+    console.setFormatter(JsonFormatter() if config.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    handlers.append(console)
+
+    path: str = config.log_file if log_file is None else log_file
+    if path:
+        file_handler: logging.Handler = RotatingFileHandler(
+            path,
+            maxBytes=config.log_max_mb * 1024 * 1024,
+            backupCount=config.log_backups,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler: QueueHandler = _DeferredQueueHandler(log_queue)
+    # Фильтр стоит до очереди: отброшенные записи не форматируются и не копируются
+    queue_handler.addFilter(SamplingFilter(parse_sampling(config.log_sampling)))
+
+    root: logging.Logger = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.DEBUG if config.debug else config.log_level.upper())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Дописывает записи из очереди и останавливает поток вывода."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _ForwardHandler(logging.Handler):
+    """Передает записи из рабочих процессов логгерам главного процесса (с их уровнями и фильтрами)."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        target: logging.Logger = logging.getLogger(record.name)
+        if target.isEnabledFor(record.levelno):
+            target.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+
+def init_worker_logging(log_queue: Any, level: int) -> None:
+    """Инициализатор рабочего процесса: все записи уходят в очередь главного процесса."""
+    root: logging.Logger = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+
+@contextmanager
+def forward_worker_logs(context: BaseContext) -> Iterator[Tuple[Callable[..., None], Tuple[Any, ...]]]:
+    """Очередь для логов рабочих процессов пула. Возвращает (initializer, initargs) для ProcessPoolExecutor.
+
+    Процесс, созданный через fork, унаследовал бы QueueHandler главного процесса, но не поток
+    QueueListener, и его записи терялись бы; поэтому пул создается с context (spawn),
+    а записи рабочих процессов читает отдельный QueueListener здесь.
+    """
+    log_queue: Any = context.Queue()
+    listener: QueueListener = QueueListener(log_queue, _ForwardHandler())
+    listener.start()
+    try:
+        yield init_worker_logging, (log_queue, logging.getLogger().getEffectiveLevel())
+    finally:
+        listener.stop()
@@ -0,0 +1,113 @@
+"""Сторож цикла событий: замер задержки и поиск обработчика, который его блокирует.
+
+Корутина на цикле просыпается каждые LAG_INTERVAL секунд и записывает, на сколько
+она опоздала (гистограмма loop.lag). Отдельный поток следит за последним пробуждением:
+если цикл не отвечает дольше порога, поток снимает стек потока цикла
+(sys._current_frames), определяет выполняемый обработчик (например,
+BotHandlers.get_photo) и пишет предупреждение со стеком.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+from typing import Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LAG_INTERVAL = 0.1  # секунд между пробуждениями
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PACKAGE_DIR: str = os.path.dirname(os.path.abspath(__file__))
+
+
+def blocking_handler(frame: Optional[FrameType]) -> str:
+    """Имя обработчика, блокирующего цикл: ближайшая к вершине стека корутина пакета.
+
+    Блокирует цикл синхронный вызов (например, compress_image), а корутина,
+    из которой он сделан, - это обработчик вроде BotHandlers.get_photo.
+    """
+    package_frame: Optional[FrameType] = None
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(PACKAGE_DIR):
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                return frame.f_code.co_qualname
+            package_frame = package_frame or frame
+        frame = frame.f_back
+    return package_frame.f_code.co_qualname if package_frame else "неизвестно"
+
+
+class LoopLagMonitor:
+    """Замеряет задержку цикла событий и сообщает о блокировках дольше threshold секунд."""
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold: float = threshold
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat: float = time.monotonic()
+        self._reported_beat: float = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._stop: threading.Event = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает замер; вызывается из работающего цикла событий."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Сторож цикла событий запущен, порог {self.threshold * 1000:.0f} мс")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected: float = time.monotonic() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            now: float = time.monotonic()
+            lag: float = max(now - expected, 0.0)
+            self._last_beat = now
+            metrics.observe("loop.lag", lag, buckets=LAG_BUCKETS)
+            if lag >= self.threshold:
+                metrics.inc("loop.stalls")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(LAG_INTERVAL):
+            beat: float = self._last_beat
+            stalled: float = time.monotonic() - beat - LAG_INTERVAL
+            # Об одной блокировке сообщается один раз
+            if stalled < self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        frame: Optional[FrameType] = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        handler: str = blocking_handler(frame)
+        stack: str = "".join(traceback.format_stack(frame))
+        metrics.inc(f"loop.stalls.{handler}")
+        logger.warning(
+            "Цикл событий заблокирован дольше %.0f мс в %s\n%s",
+            stalled * 1000,
+            handler,
+            stack,
+            extra={"handler": handler, "stalled_ms": round(stalled * 1000)},
+        )
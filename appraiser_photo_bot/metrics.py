@@ -0,0 +1,111 @@
+"""Простой реестр метрик в памяти процесса."""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, суммой и максимумом."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if self.count == 0:
+            return 0.0
+        rank: float = q * self.count
+        seen: int = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+
+class Metrics:
+    """Потокобезопасный реестр счетчиков, значений (gauge) и гистограмм."""
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Optional[Sequence[float]] = None) -> None:
+        with self._lock:
+            histogram: Optional[Histogram] = self._histograms.get(name)
+            if histogram is None:
+                histogram = Histogram(buckets or DEFAULT_BUCKETS)
+                self._histograms[name] = histogram
+            histogram.observe(value)
+
+    def get_counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_histogram(self, name: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Возвращает копию всех метрик."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": round(histogram.total, 6),
+                        "max": round(histogram.max, 6),
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "buckets": dict(zip([*map(str, histogram.buckets), "+Inf"], histogram.counts, strict=True)),
+                    }
+                    for name, histogram in self._histograms.items()
+                },
+            }
+
+    def format_text(self) -> str:
+        """Форматирует метрики в компактный текст для администратора."""
+        snapshot: Dict[str, Dict] = self.snapshot()
+        lines: List[str] = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name} = {value:g}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name} = {value:g}")
+        for name, data in sorted(snapshot["histograms"].items()):
+            lines.append(f"{name}: n={data['count']} p50≤{data['p50']:g} p95≤{data['p95']:g} max={data['max']:g}")
+        return "\n".join(lines) if lines else "нет данных"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,338 @@
+"""Планировщик исходящих запросов к Telegram Bot API."""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Источник монотонного времени для лимитов (в тестах - управляемые часы)
+Clock = Callable[[], float]
+
+# Приоритеты запросов: меньше - важнее
+PRIORITY_DOCUMENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_PROGRESS = 2
+
+PRIORITY_NAMES: Dict[int, str] = {
+    PRIORITY_DOCUMENT: "document",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_PROGRESS: "progress",
+}
+
+ENDPOINT_PRIORITIES: Dict[str, int] = {
+    "sendDocument": PRIORITY_DOCUMENT,
+    "answerCallbackQuery": PRIORITY_DOCUMENT,
+    "editMessageText": PRIORITY_PROGRESS,
+    "sendChatAction": PRIORITY_PROGRESS,
+}
+
+
+class TokenBucket:
+    """Token bucket: rate запросов в секунду с допустимым всплеском burst."""
+
+    def __init__(self, rate: float, burst: int, clock: Clock = time.monotonic) -> None:
+        self.rate: float = rate
+        self.burst: float = float(max(burst, 1))
+        self.tokens: float = self.burst
+        self.clock: Clock = clock
+        self.updated: float = clock()
+        self.paused_until: float = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена."""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and now >= self.paused_until
+
+
+@dataclass
+class OutboundRequest:
+    """Запрос в очереди планировщика."""
+
+    priority: int
+    seq: int
+    endpoint: str
+    chat_id: Optional[Hashable]
+    coalesce_key: Optional[Tuple]
+    callback: Callable[..., Coroutine[Any, Any, Any]]
+    args: Any
+    kwargs: Dict[str, Any]
+    enqueued_at: float
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    attempts: int = 0
+
+
+class OutboundScheduler(BaseRateLimiter[int]):
+    """Централизованный слой исходящих запросов для ExtBot.
+
+    - глобальный и per-chat лимиты (token bucket);
+    - приоритеты: отправка документов раньше служебных сообщений и прогресса;
+    - схлопывание устаревших запросов: новое редактирование того же сообщения
+      (или новый chat action) заменяет еще не отправленное предыдущее;
+    - при RetryAfter чат (или весь бот) ставится на паузу, запрос повторяется;
+    - задержка в очереди пишется в метрики outbound.queue_delay.*.
+
+    Через rate_limit_args можно явно передать приоритет запроса. Если вызывающая задача
+    отменена, пока запрос ждет в очереди, ее ожидание снимается, а запрос без ожидающих
+    удаляется из очереди и не отправляется.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        global_burst: int = 30,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        self.clock: Clock = clock
+        self.global_bucket: TokenBucket = TokenBucket(global_rate, global_burst, clock)
+        self.chat_rate: float = chat_rate
+        self.chat_burst: int = chat_burst
+        self.max_retries: int = max_retries
+
+        self._chat_buckets: Dict[Hashable, TokenBucket] = {}
+        self._queue: List[OutboundRequest] = []
+        self._pending: Dict[Tuple, OutboundRequest] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+    async def initialize(self) -> None:
+        self._ensure_dispatcher()
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for request in self._queue:
+            for waiter in request.waiters:
+                if not waiter.done():
+                    waiter.cancel()
+        self._queue.clear()
+        self._pending.clear()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    @staticmethod
+    def _coalesce_key(endpoint: str, data: Dict[str, Any]) -> Optional[Tuple]:
+        """Ключ, по которому новый запрос заменяет еще не отправленный старый."""
+        if endpoint == "editMessageText" and data.get("message_id") is not None:
+            return (endpoint, data.get("chat_id"), data.get("message_id"))
+        if endpoint == "sendChatAction":
+            return (endpoint, data.get("chat_id"), data.get("action"))
+        return None
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        self._ensure_dispatcher()
+
+        priority: int = (
+            rate_limit_args if rate_limit_args is not None else ENDPOINT_PRIORITIES.get(endpoint, PRIORITY_NORMAL)
+        )
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        coalesce_key: Optional[Tuple] = self._coalesce_key(endpoint, data)
+
+        pending: Optional[OutboundRequest] = self._pending.get(coalesce_key) if coalesce_key else None
+        if pending is not None:
+            # Старый запрос сохраняет место в очереди, но уйдет с актуальными параметрами
+            pending.callback, pending.args, pending.kwargs = callback, args, kwargs
+            pending.waiters.append(future)
+            metrics.inc("outbound.coalesced")
+        else:
+            request: OutboundRequest = OutboundRequest(
+                priority=priority,
+                seq=next(self._seq),
+                endpoint=endpoint,
+                chat_id=data.get("chat_id"),
+                coalesce_key=coalesce_key,
+                callback=callback,
+                args=args,
+                kwargs=kwargs,
+                enqueued_at=self.clock(),
+                waiters=[future],
+            )
+            self._enqueue(request)
+
+        metrics.set_gauge("outbound.queue_size", len(self._queue))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self._drop_waiter(future)
+            raise
+
+    def _drop_waiter(self, future: asyncio.Future) -> None:
+        """Снимает ожидание отмененного вызова; запрос без ожидающих удаляется из очереди.
+
+        Запрос ищется по очереди, а не запоминается: после RetryAfter ожидания могут
+        перейти к более новому схлопнутому запросу. Уже отправленный запрос не отменяется.
+        """
+        for request in self._queue:
+            if future in request.waiters:
+                request.waiters.remove(future)
+                if not request.waiters:
+                    self._queue.remove(request)
+                    if request.coalesce_key and self._pending.get(request.coalesce_key) is request:
+                        del self._pending[request.coalesce_key]
+                    metrics.inc("outbound.cancelled")
+                    metrics.set_gauge("outbound.queue_size", len(self._queue))
+                return
+
+    def _enqueue(self, request: OutboundRequest) -> None:
+        self._queue.append(request)
+        if request.coalesce_key:
+            self._pending[request.coalesce_key] = request
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket: Optional[TokenBucket] = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                now: float = self.clock()
+                self._chat_buckets = {key: b for key, b in self._chat_buckets.items() if not b.is_idle(now)}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, self.clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _pick_ready(self, now: float) -> Tuple[Optional[OutboundRequest], float]:
+        """Выбирает самый приоритетный запрос, чат которого не упирается в лимит."""
+        best: Optional[OutboundRequest] = None
+        min_wait: float = float("inf")
+        for request in self._queue:
+            wait: float = 0.0 if request.chat_id is None else self._chat_bucket(request.chat_id).wait_time(now)
+            if wait > 0:
+                min_wait = min(min_wait, wait)
+                continue
+            if best is None or (request.priority, request.seq) < (best.priority, best.seq):
+                best = request
+        return best, min_wait
+
+    async def _sleep(self, seconds: float) -> None:
+        """Ждет seconds или появления нового запроса."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            try:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                now: float = self.clock()
+                global_wait: float = self.global_bucket.wait_time(now)
+                if global_wait > 0:
+                    await self._sleep(global_wait)
+                    continue
+
+                request, wait = self._pick_ready(now)
+                if request is None:
+                    await self._sleep(wait)
+                    continue
+
+                self._queue.remove(request)
+                if request.coalesce_key and self._pending.get(request.coalesce_key) is request:
+                    del self._pending[request.coalesce_key]
+
+                self.global_bucket.consume(now)
+                if request.chat_id is not None:
+                    self._chat_bucket(request.chat_id).consume(now)
+
+                task: asyncio.Task = asyncio.create_task(self._execute(request))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+                metrics.set_gauge("outbound.queue_size", len(self._queue))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в планировщике исходящих запросов: {e}", exc_info=True)
+
+    async def _execute(self, request: OutboundRequest) -> None:
+        priority_name: str = PRIORITY_NAMES.get(request.priority, str(request.priority))
+        delay: float = self.clock() - request.enqueued_at
+        metrics.observe(f"outbound.queue_delay.{priority_name}", delay)
+        metrics.inc(f"outbound.requests.{priority_name}")
+
+        try:
+            result: Any = await request.callback(*request.args, **request.kwargs)
+        except RetryAfter as e:
+            retry_after: Any = e.retry_after
+            seconds: float = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+            metrics.inc("outbound.retry_after")
+            logger.warning(f"Flood control для чата {request.chat_id}: пауза {seconds:.0f} сек ({request.endpoint})")
+
+            if request.chat_id is not None:
+                self._chat_bucket(request.chat_id).pause(seconds)
+            else:
+                self.global_bucket.pause(seconds)
+
+            if request.attempts < self.max_retries:
+                request.attempts += 1
+                newer: Optional[OutboundRequest] = (
+                    self._pending.get(request.coalesce_key) if request.coalesce_key else None
+                )
+                if newer is not None:
+                    newer.waiters.extend(request.waiters)
+                else:
+                    self._enqueue(request)
+                return
+            self._finish(request, error=e)
+        except Exception as e:
+            self._finish(request, error=e)
+        else:
+            self._finish(request, result=result)
+
+    @staticmethod
+    def _finish(request: OutboundRequest, result: Any = None, error: Optional[BaseException] = None) -> None:
+        for waiter in request.waiters:
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(result)
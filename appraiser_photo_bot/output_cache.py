@@ -0,0 +1,99 @@
+"""Дисковый кеш готовых документов с адресацией по содержимому."""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении формата документа, чтобы старые записи не переиспользовались
+CACHE_FORMAT_VERSION = "5"
+
+
+def make_cache_key(
+    photos: List[bytes], title: Optional[str], rows: int, cols: int, size_option: str, compress_level: int
+) -> str:
+    """Ключ документа: хеш подготовленных фото, параметров таблицы и уровня сжатия .docx."""
+    digest = hashlib.sha256()
+    digest.update(
+        f"v{CACHE_FORMAT_VERSION}|{title or ''}|{rows}|{cols}|{size_option}|{compress_level}|{len(photos)}".encode()
+    )
+    for photo in photos:
+        digest.update(hashlib.sha256(photo).digest())
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """Ограниченный по размеру кеш .docx на диске (вытеснение самых давно использованных).
+
+    Документ создается детерминированно, поэтому одинаковый ключ всегда
+    соответствует одинаковому файлу - повторная отправка не требует рендеринга.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self._lock: threading.Lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.docx")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Возвращает документ из кеша или None."""
+        path: str = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data: bytes = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.inc("output_cache.miss")
+            return None
+        metrics.inc("output_cache.hit")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Сохраняет документ атомарно (через временный файл) и вытесняет старые записи."""
+        if len(data) > self.max_bytes:
+            logger.info(f"Документ {len(data) / 1024 / 1024:.1f} MB больше лимита кеша, не сохраняю")
+            return
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.path_for(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries: List[Tuple[float, int, str]] = []
+            total: int = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".docx"):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    metrics.inc("output_cache.evicted")
+                except FileNotFoundError:
+                    pass
+            metrics.set_gauge("output_cache.bytes", total)
@@ -0,0 +1,99 @@
+"""Фоновый рендеринг заполненных страниц во время загрузки фото."""
+
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Tuple
+
+from .document_creators.utils import split_into_pages
+
+logger = logging.getLogger(__name__)
+
+PageKey = Tuple[int, int, str, Tuple[bytes, ...]]
+
+
+class PagePrerenderer:
+    """Рендерит страницы документа в фоне, как только они заполнены фото.
+
+    Страница отрисовывается без заголовка: общее число страниц становится известно
+    только после /done, поэтому заголовки добавляются при сборке документа.
+    Результат используется, только если фото страницы и параметры таблицы не изменились.
+    """
+
+    def __init__(self, executor: Executor) -> None:
+        self.executor: Executor = executor
+        self._pages: Dict[int, Dict[int, Tuple[PageKey, asyncio.Future]]] = {}
+
+    @staticmethod
+    def _page_key(page_photos: List[bytes], rows: int, cols: int, size_option: str) -> PageKey:
+        """Ключ страницы: параметры таблицы и хеши содержимого фото."""
+        digests: Tuple[bytes, ...] = tuple(hashlib.sha1(photo).digest() for photo in page_photos)
+        return (rows, cols, size_option, digests)
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Ошибка фонового рендеринга страницы: {future.exception()}")
+
+    def on_photo_added(self, user_id: int, photos: List[bytes], rows: int, cols: int, size_option: str) -> None:
+        """Запускает рендеринг страницы, если последнее фото ее заполнило."""
+        self.on_photos_added(user_id, photos, 1, rows, cols, size_option)
+
+    def on_photos_added(
+        self, user_id: int, photos: List[bytes], added: int, rows: int, cols: int, size_option: str
+    ) -> None:
+        """Запускает рендеринг всех страниц, заполненных последними added фото (например, из архива)."""
+        photos_per_page: int = rows * cols
+        if photos_per_page <= 0 or not photos:
+            return
+        first_page: int = (len(photos) - added) // photos_per_page
+        for page_index in range(first_page, len(photos) // photos_per_page):
+            self._schedule_page(user_id, photos, page_index, rows, cols, size_option)
+
+    def _schedule_page(
+        self, user_id: int, photos: List[bytes], page_index: int, rows: int, cols: int, size_option: str
+    ) -> None:
+        photos_per_page: int = rows * cols
+        page_photos: List[bytes] = photos[page_index * photos_per_page : (page_index + 1) * photos_per_page]
+
+        from .document_creators import DocumentCreator
+
+        creator: DocumentCreator = DocumentCreator(rows=rows, cols=cols, size_option=size_option)
+        future: asyncio.Future = asyncio.get_running_loop().run_in_executor(
+            self.executor, creator.render_page, page_photos
+        )
+        future.add_done_callback(self._log_failure)
+
+        user_pages = self._pages.setdefault(user_id, {})
+        previous = user_pages.get(page_index)
+        if previous:
+            previous[1].cancel()
+        user_pages[page_index] = (self._page_key(page_photos, rows, cols, size_option), future)
+
+        logger.info(f"Запущен фоновый рендеринг страницы {page_index + 1} для пользователя {user_id}")
+
+    async def collect(
+        self, user_id: int, photos: List[bytes], rows: int, cols: int, size_option: str
+    ) -> Dict[int, Any]:
+        """Дожидается фоновых страниц и возвращает актуальные (индекс страницы → документ)."""
+        jobs = self._pages.pop(user_id, {})
+        pages: List[List[bytes]] = split_into_pages(photos, rows, cols)
+        result: Dict[int, Any] = {}
+
+        for page_index, (key, future) in sorted(jobs.items()):
+            if page_index >= len(pages) or key != self._page_key(pages[page_index], rows, cols, size_option):
+                future.cancel()
+                continue
+            try:
+                result[page_index] = await future
+            except Exception as e:
+                logger.warning(f"Страница {page_index + 1} будет отрисована заново: {e}")
+
+        logger.info(f"Готовых страниц из фонового рендеринга: {len(result)} из {len(pages)}")
+        return result
+
+    def discard(self, user_id: int) -> None:
+        """Отменяет и забывает фоновые страницы пользователя."""
+        for _, future in self._pages.pop(user_id, {}).values():
+            future.cancel()
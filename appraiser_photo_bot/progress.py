@@ -0,0 +1,133 @@
+"""Живое сообщение о прогрессе создания документа."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import telegram.error
+from telegram.constants import ChatAction
+
+logger = logging.getLogger(__name__)
+
+# Этап рендеринга → (начальный %, конечный %, подпись)
+RENDER_STAGES: Dict[str, Tuple[int, int, str]] = {
+    "compress": (5, 40, "Сжатие фото"),
+    "render": (40, 85, "Вёрстка страниц"),
+    "save": (85, 90, "Сохранение файла"),
+}
+
+
+class ProgressMessage:
+    """Одно сообщение с прогрессом, которое редактируется не чаще min_interval секунд.
+
+    Пока сообщение активно, раз в heartbeat_interval секунд отправляется chat action,
+    чтобы индикатор "отправляет файл" не пропадал во время долгой сборки.
+    """
+
+    def __init__(
+        self,
+        bot: Any,
+        chat_id: int,
+        format_text: Callable[[int, str], str],
+        min_interval: float = 2.0,
+        heartbeat_interval: float = 4.0,
+        action: str = ChatAction.UPLOAD_DOCUMENT,
+    ) -> None:
+        self.bot: Any = bot
+        self.chat_id: int = chat_id
+        self.format_text: Callable[[int, str], str] = format_text
+        self.min_interval: float = min_interval
+        self.heartbeat_interval: float = heartbeat_interval
+        self.action: str = action
+
+        self.message_id: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._percent: int = 0
+        self._stage_text: str = ""
+        self._last_text: Optional[str] = None
+        self._last_edit: float = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def start(self, reply_markup: Any = None) -> None:
+        """Отправляет сообщение и запускает heartbeat."""
+        self._loop = asyncio.get_running_loop()
+        text: str = self.format_text(0, "")
+        message = await self.bot.send_message(
+            chat_id=self.chat_id,
+            text=text,
+            parse_mode="Markdown",
+            reply_markup=reply_markup,
+        )
+        self.message_id = message.message_id
+        self._last_text = text
+        self._last_edit = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    def threadsafe_callback(self) -> Callable[[str, int, int], None]:
+        """Колбэк прогресса для вызова из потока рендеринга."""
+        loop = self._loop or asyncio.get_running_loop()
+
+        def callback(stage: str, done: int, total: int) -> None:
+            loop.call_soon_threadsafe(self.update_stage, stage, done, total)
+
+        return callback
+
+    def update_stage(self, stage: str, done: int, total: int) -> None:
+        """Переводит прогресс этапа в общий процент."""
+        start, end, label = RENDER_STAGES.get(stage, (self._percent, self._percent, stage))
+        fraction: float = min(done / total, 1.0) if total > 0 else 1.0
+        self.update(start + int((end - start) * fraction), f"{label}: {done}/{total}")
+
+    def update(self, percent: int, stage_text: str = "") -> None:
+        """Запоминает новое состояние и планирует отложенное редактирование."""
+        self._percent = max(self._percent, percent)
+        self._stage_text = stage_text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def set_text(self, text: str) -> None:
+        """Сразу заменяет текст сообщения (например, на этапе отправки)."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._edit(text)
+
+    async def stop(self) -> None:
+        """Останавливает heartbeat и отложенные обновления."""
+        for task in (self._flush_task, self._heartbeat_task):
+            if task and not task.done():
+                task.cancel()
+
+    async def _flush(self) -> None:
+        delay: float = self._last_edit + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._edit(self.format_text(self._percent, self._stage_text))
+
+    async def _edit(self, text: str) -> None:
+        if self.message_id is None or text == self._last_text:
+            return
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                text=text,
+                parse_mode="Markdown",
+            )
+            self._last_text = text
+        except telegram.error.BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Не удалось обновить сообщение о прогрессе: {e}")
+        except telegram.error.TelegramError as e:
+            logger.warning(f"Не удалось обновить сообщение о прогрессе: {e}")
+        finally:
+            self._last_edit = time.monotonic()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            try:
+                await self.bot.send_chat_action(chat_id=self.chat_id, action=self.action)
+            except telegram.error.TelegramError as e:
+                logger.debug(f"Не удалось отправить chat action: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
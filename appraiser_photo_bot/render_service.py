@@ -0,0 +1,212 @@
+"""Общий конвейер рендеринга документов для бота и HTTP API."""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import BotConfig
+from .document_creators.constants import SIZE_OPTIONS
+from .document_creators.utils import ImageSource, ProgressCallback, compress_image, compress_image_with_hash
+from .flight_recorder import JobTrace, flight_recorder
+from .metrics import metrics
+from .output_cache import OutputCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+PrerenderedProvider = Callable[[], Awaitable[Dict[int, Any]]]
+
+
+def create_page_executor(config: BotConfig) -> Optional[ProcessPoolExecutor]:
+    """Пул процессов для отрисовки страниц (PAGE_WORKERS) или None, если параллельная отрисовка выключена.
+
+    Процессы запускаются через spawn: fork процесса, в котором уже работают потоки пулов
+    и цикл событий, может унаследовать захваченные блокировки.
+    """
+    if config.page_workers <= 0:
+        return None
+    logger.info(f"Параллельная отрисовка страниц: {config.page_workers} процессов")
+    return ProcessPoolExecutor(max_workers=config.page_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class RenderService:
+    """Сжатие фото и сборка документов на одном пуле потоков, с общим кешем и лимитами.
+
+    Бот и HTTP API вызывают один и тот же экземпляр, поэтому задания из обоих
+    источников ждут в одной очереди пула и используют один кеш готовых документов.
+    С page_executor (PAGE_WORKERS) страницы многостраничного документа отрисовываются
+    в рабочих процессах, и время сборки одного большого документа делится между ядрами.
+    """
+
+    def __init__(
+        self,
+        config: BotConfig,
+        executor: Executor,
+        output_cache: OutputCache,
+        page_executor: Optional[Executor] = None,
+    ) -> None:
+        self.config: BotConfig = config
+        self.executor: Executor = executor
+        self.output_cache: OutputCache = output_cache
+        # Пул процессов, на котором страницы одного документа отрисовываются параллельно
+        self.page_executor: Optional[Executor] = page_executor
+        self._page_executor_lock: threading.Lock = threading.Lock()
+
+    def _replace_broken_page_executor(self, broken: Executor) -> None:
+        """Заменяет сломанный пул процессов новым (если его еще не заменило другое задание)."""
+        with self._page_executor_lock:
+            if self.page_executor is not broken:
+                return
+            logger.warning("Пул процессов отрисовки страниц сломан, создаю новый")
+            metrics.inc("render.page_executor_restarts")
+            self.page_executor = create_page_executor(self.config)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown_page_executor(self, wait: bool = True) -> None:
+        """Останавливает текущий пул процессов отрисовки страниц."""
+        with self._page_executor_lock:
+            page_executor: Optional[Executor] = self.page_executor
+            self.page_executor = None
+        if page_executor is not None:
+            page_executor.shutdown(wait=wait, cancel_futures=True)
+
+    def validate_layout(self, rows: int, cols: int, size_option: str, photos_count: int) -> Optional[str]:
+        """Проверяет параметры таблицы по лимитам бота. Возвращает текст ошибки или None."""
+        if not 1 <= rows <= self.config.max_rows:
+            return f"rows должно быть от 1 до {self.config.max_rows}"
+        if not 1 <= cols <= self.config.max_cols:
+            return f"cols должно быть от 1 до {self.config.max_cols}"
+        if rows * cols > self.config.max_photos:
+            return f"ячеек на странице больше {self.config.max_photos}"
+        if size_option not in SIZE_OPTIONS:
+            return f"size_option должно быть одним из: {', '.join(SIZE_OPTIONS)}"
+        if photos_count < 1:
+            return "нужно хотя бы одно фото"
+        if photos_count > self.config.max_photos:
+            return f"фото больше {self.config.max_photos}"
+        return None
+
+    async def compress(self, source: ImageSource) -> bytes:
+        """Сжимает фото так же, как при загрузке в бот."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            compress_image,
+            source,
+            self.config.image_quality,
+            self.config.image_max_size,
+            "JPEG",
+            self.config.adaptive_ssim_target,
+        )
+
+    async def compress_with_hash(self, source: ImageSource) -> Tuple[bytes, Optional[int]]:
+        """Сжимает фото и возвращает его перцептивный хеш для поиска повторов."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            compress_image_with_hash,
+            source,
+            self.config.image_quality,
+            self.config.image_max_size,
+            "JPEG",
+            self.config.adaptive_ssim_target,
+        )
+
+    async def render(
+        self,
+        photos: List[bytes],
+        title: Optional[str],
+        rows: int,
+        cols: int,
+        size_option: str,
+        prerendered: Optional[PrerenderedProvider] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        source: str = "bot",
+        trace: Optional[JobTrace] = None,
+    ) -> Tuple[str, bytes]:
+        """Возвращает (ключ кеша, документ): из кеша или после рендеринга на общем пуле.
+
+        Этапы записываются в trace. Без trace задание открывает и закрывает свою трассу;
+        бот передает свою, чтобы дописать в нее загрузку и отправку.
+        """
+        own_trace: bool = trace is None
+        if trace is None:
+            trace = flight_recorder.start(source)
+        trace.describe(photos, rows, cols, size_option)
+        try:
+            cache_key, document_bytes = await self._render(
+                photos, title, rows, cols, size_option, prerendered, progress_callback, source, trace
+            )
+        except Exception as e:
+            if own_trace:
+                flight_recorder.finish(trace, "error", repr(e))
+            raise
+        trace.bytes["document"] = len(document_bytes)
+        if own_trace:
+            flight_recorder.finish(trace, "done")
+        return cache_key, document_bytes
+
+    async def _render(
+        self,
+        photos: List[bytes],
+        title: Optional[str],
+        rows: int,
+        cols: int,
+        size_option: str,
+        prerendered: Optional[PrerenderedProvider],
+        progress_callback: Optional[ProgressCallback],
+        source: str,
+        trace: JobTrace,
+    ) -> Tuple[str, bytes]:
+        # python-docx загружается только при первом создании документа
+        from .document_creators import DocumentCreator
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        cache_key: str = await loop.run_in_executor(
+            self.executor,
+            make_cache_key,
+            photos,
+            title,
+            rows,
+            cols,
+            size_option,
+            self.config.docx_compress_level,
+        )
+        document_bytes: Optional[bytes] = await loop.run_in_executor(self.executor, self.output_cache.get, cache_key)
+        metrics.inc(f"render.requests.{source}")
+
+        if document_bytes is not None:
+            logger.info(f"Документ найден в кеше ({cache_key[:12]}), рендеринг пропущен")
+            trace.add_engine("cache")
+            return cache_key, document_bytes
+
+        prerendered_pages: Dict[int, Any] = {}
+        if prerendered:
+            with trace.stage("prerender_wait"):
+                prerendered_pages = await prerendered()
+
+        logger.info(f"Начинаю создание документа из {len(photos)} фото ({source})...")
+        creator: DocumentCreator = DocumentCreator(
+            title=title,
+            rows=rows,
+            cols=cols,
+            size_option=size_option,
+            progress_callback=progress_callback,
+            page_executor=self.page_executor,
+            docx_compress_level=self.config.docx_compress_level,
+            trace=trace,
+        )
+        try:
+            document_bytes = await loop.run_in_executor(
+                self.executor, creator.create_document, photos, prerendered_pages
+            )
+        finally:
+            if creator.page_executor_broken and creator.page_executor is not None:
+                self._replace_broken_page_executor(creator.page_executor)
+
+        try:
+            await loop.run_in_executor(self.executor, self.output_cache.put, cache_key, document_bytes)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить документ в кеш: {e}")
+
+        return cache_key, document_bytes
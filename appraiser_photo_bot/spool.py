@@ -0,0 +1,33 @@
+"""Буферы загружаемых фото, сгруппированные по сессиям пользователей."""
+
+import logging
+import tempfile
+from typing import Union
+
+from .document_creators.temp_manager import TempFileManager
+
+logger = logging.getLogger(__name__)
+
+# Фото меньше этого размера остаются в памяти, большие сбрасываются на диск
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+
+
+class SessionSpool:
+    """Спул загрузок: у каждой сессии свой каталог, файл живет только до сжатия фото.
+
+    Оригинал пишется в SpooledTemporaryFile частями и декодируется Pillow прямо из него,
+    поэтому в памяти на одну загрузку остается примерно размер декодированного изображения.
+    """
+
+    def __init__(self, memory_limit: int = SPOOL_MEMORY_LIMIT) -> None:
+        self.memory_limit: int = memory_limit
+
+    def open(self, session_key: Union[int, str]) -> tempfile.SpooledTemporaryFile:
+        """Открывает буфер для одной загрузки; файл удаляется при закрытии."""
+        session_dir: str = TempFileManager().session_dir(str(session_key))
+        return tempfile.SpooledTemporaryFile(max_size=self.memory_limit, dir=session_dir)
+
+    def discard(self, session_key: Union[int, str]) -> None:
+        """Удаляет каталог сессии вместе с незакрытыми буферами."""
+        if TempFileManager.is_initialized():
+            TempFileManager().release_session(str(session_key))
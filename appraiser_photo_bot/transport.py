@@ -0,0 +1,263 @@
+"""HTTP-транспорт бота: отдельные пулы соединений для разных классов трафика."""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+import httpx
+from telegram.error import NetworkError, TimedOut
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from .config import BotConfig
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_API = "api"
+TRAFFIC_DOWNLOAD = "download"
+TRAFFIC_UPLOAD = "upload"
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class PoolSettings:
+    """Параметры пула соединений одного класса трафика."""
+
+    size: int
+    read_timeout: float
+    write_timeout: float
+    connect_timeout: float
+    pool_timeout: float
+
+
+def _limits(settings: PoolSettings, config: BotConfig) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.size,
+        max_keepalive_connections=settings.size,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+
+
+def build_httpx_request(settings: PoolSettings, config: BotConfig) -> HTTPXRequest:
+    """Создает HTTPXRequest с keep-alive и (опционально) HTTP/2."""
+    return HTTPXRequest(
+        connection_pool_size=settings.size,
+        read_timeout=settings.read_timeout,
+        write_timeout=settings.write_timeout,
+        connect_timeout=settings.connect_timeout,
+        pool_timeout=settings.pool_timeout,
+        media_write_timeout=settings.write_timeout,
+        http_version="2" if config.http2 else "1.1",
+        httpx_kwargs={"limits": _limits(settings, config)},
+    )
+
+
+def build_stream_client(settings: PoolSettings, config: BotConfig) -> httpx.AsyncClient:
+    """Клиент httpx для потоковых ответов с теми же лимитами и таймаутами, что у HTTPXRequest пула."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            connect=settings.connect_timeout,
+            read=settings.read_timeout,
+            write=settings.write_timeout,
+            pool=settings.pool_timeout,
+        ),
+        limits=_limits(settings, config),
+        http1=True,
+        http2=config.http2,
+    )
+
+
+class TrafficRouterRequest(BaseRequest):
+    """Распределяет запросы ExtBot по отдельным пулам: API, скачивание файлов, загрузка документов.
+
+    Большой send_document или несколько тяжелых скачиваний не занимают соединения,
+    нужные обычным reply_text. Ожидание свободного соединения в пуле пишется
+    в метрики http.pool_wait.<класс>, длительность запроса - в http.request_time.<класс>.
+    Потоковые ответы (stream) идут через собственные клиенты httpx класса трафика,
+    но занимают те же слоты пула.
+    """
+
+    def __init__(
+        self,
+        pools: Dict[str, Tuple[HTTPXRequest, PoolSettings]],
+        stream_clients: Optional[Dict[str, httpx.AsyncClient]] = None,
+    ) -> None:
+        self.pools: Dict[str, Tuple[HTTPXRequest, PoolSettings]] = pools
+        self.stream_clients: Dict[str, httpx.AsyncClient] = stream_clients or {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.pools[TRAFFIC_API][0].read_timeout
+
+    async def initialize(self) -> None:
+        await asyncio.gather(*(request.initialize() for request, _ in self.pools.values()))
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(
+            *(request.shutdown() for request, _ in self.pools.values()),
+            *(client.aclose() for client in self.stream_clients.values()),
+        )
+
+    @staticmethod
+    def classify(url: str, request_data: Optional[RequestData]) -> str:
+        """Определяет класс трафика запроса."""
+        if "/file/bot" in url:
+            return TRAFFIC_DOWNLOAD
+        if request_data is not None and request_data.contains_files:
+            return TRAFFIC_UPLOAD
+        return TRAFFIC_API
+
+    def _slot(self, traffic: str) -> asyncio.Semaphore:
+        slot: Optional[asyncio.Semaphore] = self._slots.get(traffic)
+        if slot is None:
+            slot = asyncio.Semaphore(self.pools[traffic][1].size)
+            self._slots[traffic] = slot
+        return slot
+
+    @asynccontextmanager
+    async def _pool_slot(self, traffic: str, pool_timeout: Optional[float]) -> AsyncIterator[None]:
+        """Занимает соединение пула класса traffic; ожидание и длительность пишутся в метрики."""
+        slot: asyncio.Semaphore = self._slot(traffic)
+        wait_started: float = time.monotonic()
+        try:
+            await asyncio.wait_for(slot.acquire(), timeout=pool_timeout)
+        except asyncio.TimeoutError as e:
+            metrics.inc(f"http.pool_timeout.{traffic}")
+            raise TimedOut(f"Pool timeout: все соединения пула '{traffic}' заняты") from e
+        metrics.observe(f"http.pool_wait.{traffic}", time.monotonic() - wait_started)
+
+        started: float = time.monotonic()
+        try:
+            yield
+        finally:
+            slot.release()
+            metrics.observe(f"http.request_time.{traffic}", time.monotonic() - started)
+
+    @asynccontextmanager
+    async def stream(self, traffic: str, url: str) -> AsyncIterator[httpx.Response]:
+        """Потоковый GET через клиент класса traffic: тот же лимит соединений и метрики, что у do_request.
+
+        HTTPXRequest не дает читать ответ частями, поэтому у класса трафика свой клиент httpx.
+        """
+        client: Optional[httpx.AsyncClient] = self.stream_clients.get(traffic)
+        if client is None:
+            raise ValueError(f"Для класса трафика '{traffic}' нет клиента потоковых запросов")
+        async with self._pool_slot(traffic, self.pools[traffic][1].pool_timeout):
+            async with client.stream("GET", url) as response:
+                yield response
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> Tuple[int, bytes]:
+        traffic: str = self.classify(url, request_data)
+        request, settings = self.pools[traffic]
+
+        # Явный pool_timeout из вызова важнее настроек пула; DEFAULT_NONE - берем настройки
+        wait_limit: Optional[float] = pool_timeout if isinstance(pool_timeout, (int, float)) else settings.pool_timeout
+
+        async with self._pool_slot(traffic, wait_limit):
+            return await request.do_request(
+                url,
+                method,
+                request_data=request_data,
+                read_timeout=read_timeout,
+                write_timeout=write_timeout,
+                connect_timeout=connect_timeout,
+                pool_timeout=pool_timeout,
+            )
+
+
+class FileDownloader:
+    """Потоковое скачивание файлов Telegram частями прямо в файл/буфер назначения.
+
+    HTTPXRequest из PTB читает ответ целиком в bytes, поэтому фото до 20 MB
+    держались бы в памяти полностью. Здесь ответ пишется в out по DOWNLOAD_CHUNK_SIZE.
+    Скачивание идет через пул download транспорта бота (attach), поэтому учитывается
+    в его лимите соединений и метриках http.pool_wait.download / http.request_time.download.
+    """
+
+    def __init__(self) -> None:
+        self.router: Optional[TrafficRouterRequest] = None
+
+    def attach(self, router: TrafficRouterRequest) -> None:
+        """Подключает транспорт бота, через пул скачивания которого идут запросы."""
+        self.router = router
+
+    async def download_to(self, url: str, out: BinaryIO) -> int:
+        """Скачивает url в out и возвращает число записанных байт."""
+        if self.router is None:
+            raise RuntimeError("FileDownloader: транспорт бота не подключен")
+        written: int = 0
+        try:
+            async with self.router.stream(TRAFFIC_DOWNLOAD, url) as response:
+                if response.status_code != 200:
+                    raise NetworkError(f"Не удалось скачать файл: HTTP {response.status_code}")
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    out.write(chunk)
+                    written += len(chunk)
+        except httpx.TimeoutException as e:
+            raise TimedOut("Таймаут при скачивании файла") from e
+        except httpx.HTTPError as e:
+            raise NetworkError(f"Ошибка при скачивании файла: {e}") from e
+
+        out.seek(0)
+        metrics.inc("download.bytes", written)
+        return written
+
+
+def build_requests(config: BotConfig) -> Tuple[TrafficRouterRequest, BaseRequest]:
+    """Создает транспорт для обычных запросов и отдельный для getUpdates."""
+    api = PoolSettings(
+        size=config.api_pool_size,
+        read_timeout=config.read_timeout,
+        write_timeout=config.write_timeout,
+        connect_timeout=config.connect_timeout,
+        pool_timeout=config.pool_timeout,
+    )
+    download = PoolSettings(
+        size=config.download_pool_size,
+        read_timeout=config.download_timeout,
+        write_timeout=config.write_timeout,
+        connect_timeout=config.connect_timeout,
+        pool_timeout=config.pool_timeout,
+    )
+    upload = PoolSettings(
+        size=config.upload_pool_size,
+        read_timeout=config.upload_timeout,
+        write_timeout=config.upload_timeout,
+        connect_timeout=config.connect_timeout,
+        pool_timeout=config.pool_timeout,
+    )
+    updates = PoolSettings(
+        size=1,
+        read_timeout=config.read_timeout,
+        write_timeout=config.write_timeout,
+        connect_timeout=config.connect_timeout,
+        pool_timeout=config.pool_timeout,
+    )
+
+    router = TrafficRouterRequest(
+        {
+            TRAFFIC_API: (build_httpx_request(api, config), api),
+            TRAFFIC_DOWNLOAD: (build_httpx_request(download, config), download),
+            TRAFFIC_UPLOAD: (build_httpx_request(upload, config), upload),
+        },
+        stream_clients={TRAFFIC_DOWNLOAD: build_stream_client(download, config)},
+    )
+    logger.info(
+        f"HTTP пулы: api={api.size}, download={download.size}, upload={upload.size}, "
+        f"HTTP/{'2' if config.http2 else '1.1'}, keep-alive {config.http_keepalive_expiry} сек"
+    )
+    return router, build_httpx_request(updates, config)
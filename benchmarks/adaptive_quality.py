@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Сравнение фиксированного качества JPEG и подбора качества по SSIM (ADAPTIVE_QUALITY).
+
+Каждое фото сжимается так же, как при загрузке в бот: с фиксированным IMAGE_QUALITY
+и с подбором по SSIM. Печатаются размеры, выбранное качество, SSIM результата
+относительно оригинала по яркости - в полном разрешении и в размере фото на странице
+(adaptive_quality.probe_size, в нем же идет оценка) - и время сжатия.
+Без аргументов используется набор синтетических фото (стена, фасад, шум).
+
+    python benchmarks/adaptive_quality.py [photos/...] [--quality 85] [--target 0.95]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from typing import List, Tuple
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from appraiser_photo_bot.batch import list_images  # noqa: E402
+from appraiser_photo_bot.document_creators import adaptive_quality  # noqa: E402
+from appraiser_photo_bot.document_creators.constants import DEFAULT_SSIM_TARGET  # noqa: E402
+from appraiser_photo_bot.document_creators.utils import compress_image, estimate_jpeg_quality  # noqa: E402
+
+
+def synthetic_photos() -> List[Tuple[str, bytes]]:
+    """Фото с разной детализацией: ровная стена, фасад с мелкими деталями, шумный снимок."""
+    from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+    size: Tuple[int, int] = (1600, 1200)
+    wall = Image.linear_gradient("L").resize(size).point(lambda v: 180 + v // 8).convert("RGB")
+    wall = ImageChops.add(wall, Image.effect_noise(size, 4).convert("RGB"), 1, -128)
+
+    facade = Image.new("RGB", size, (150, 120, 100))
+    draw = ImageDraw.Draw(facade)
+    for x in range(0, size[0], 16):
+        for y in range(0, size[1], 8):
+            draw.rectangle((x + (y // 8 % 2) * 8, y, x + 14 + (y // 8 % 2) * 8, y + 6), fill=(170, 90 + x % 40, 70))
+    for x in range(100, size[0], 300):
+        draw.rectangle((x, 200, x + 160, 500), fill=(60, 80, 110), outline=(240, 240, 240), width=6)
+    facade = ImageChops.add(facade, Image.effect_noise(size, 12).convert("RGB"), 1, -128)
+
+    noisy = Image.effect_noise(size, 60).filter(ImageFilter.GaussianBlur(1)).convert("RGB")
+
+    result: List[Tuple[str, bytes]] = []
+    for name, image in (("wall", wall), ("facade", facade), ("noisy", noisy)):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        result.append((name, buffer.getvalue()))
+    return result
+
+
+def luminance_ssim(original: bytes, compressed: bytes, probe_size: int = 0) -> float:
+    """SSIM по яркости в разрешении сжатого фото или, с probe_size, в размере фото на странице."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(original)) as a, Image.open(io.BytesIO(compressed)) as b:
+        b_gray = b.convert("L")
+        a_gray = a.convert("L").resize(b_gray.size)
+        if probe_size:
+            a_gray.thumbnail((probe_size, probe_size), Image.Resampling.LANCZOS)
+            b_gray.thumbnail((probe_size, probe_size), Image.Resampling.LANCZOS)
+        return adaptive_quality.ssim(np.asarray(a_gray, dtype=np.float64), np.asarray(b_gray, dtype=np.float64))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="Фото или папки с фото")
+    parser.add_argument("--quality", type=int, default=85, help="IMAGE_QUALITY (верхняя граница)")
+    parser.add_argument("--max-size", type=int, default=2000, help="IMAGE_MAX_SIZE")
+    parser.add_argument("--target", type=float, default=DEFAULT_SSIM_TARGET, help="Целевой SSIM")
+    args = parser.parse_args()
+
+    if not adaptive_quality.is_available():
+        sys.exit('Нужен NumPy: pip install "appraiser-photo-bot[adaptive]"')
+
+    photos: List[Tuple[str, bytes]] = []
+    for path in args.paths:
+        for file_path in list_images(path) if os.path.isdir(path) else [path]:
+            with open(file_path, "rb") as f:
+                photos.append((os.path.basename(file_path), f.read()))
+    if not photos:
+        photos = synthetic_photos()
+
+    print(
+        f"{'фото':<24} {'фикс., KB':>10} {'SSIM':>6} {'стр.':>6} {'мс':>5} "
+        f"{'подбор, KB':>11} {'кач.':>5} {'SSIM':>6} {'стр.':>6} {'мс':>5}"
+    )
+    total_fixed = total_adaptive = 0
+    for name, data in photos:
+        started = time.perf_counter()
+        fixed = compress_image(data, args.quality, args.max_size)
+        fixed_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        adaptive = compress_image(data, args.quality, args.max_size, ssim_target=args.target)
+        adaptive_ms = (time.perf_counter() - started) * 1000
+
+        from PIL import Image
+
+        with Image.open(io.BytesIO(adaptive)) as image:
+            chosen = estimate_jpeg_quality(getattr(image, "quantization", None))
+            page_size = adaptive_quality.probe_size(*image.size)
+
+        total_fixed += len(fixed)
+        total_adaptive += len(adaptive)
+        print(
+            f"{name[:24]:<24} {len(fixed) / 1024:>10.1f} {luminance_ssim(data, fixed):>6.3f} "
+            f"{luminance_ssim(data, fixed, page_size):>6.3f} {fixed_ms:>5.0f} "
+            f"{len(adaptive) / 1024:>11.1f} {chosen or '-':>5} {luminance_ssim(data, adaptive):>6.3f} "
+            f"{luminance_ssim(data, adaptive, page_size):>6.3f} {adaptive_ms:>5.0f}"
+        )
+
+    saved = total_fixed - total_adaptive
+    print(
+        f"\nИтого: {total_fixed / 1024:.1f} KB → {total_adaptive / 1024:.1f} KB, "
+        f"экономия {saved / 1024:.1f} KB ({saved / max(total_fixed, 1) * 100:.1f}%)"
+    )
+
+
+if __name__ == "__main__":
+    main()
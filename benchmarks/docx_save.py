@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Сохранение .docx: doc.save с перепаковкой против прямой записи пакета (save_document).
+
+Документ собирается один раз из синтетических JPEG, затем сохраняется:
+- как раньше: doc.save (deflate всех частей) и перепаковка всего архива с deflate;
+- через save_document: фото без сжатия (ZIP_STORED), XML с deflate заданного уровня.
+Печатаются время сохранения и размер файла.
+
+    python benchmarks/docx_save.py [--photos 60] [--rows 3] [--cols 2] [--levels 1 6 9]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import zipfile
+from typing import Callable, List
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from appraiser_photo_bot.document_creators.constants import DOCX_ZIP_TIMESTAMP  # noqa: E402
+from appraiser_photo_bot.document_creators.document_base import (  # noqa: E402
+    create_multi_page_document,
+    save_document,
+)
+
+
+def synthetic_photos(count: int) -> List[bytes]:
+    """Фото размером примерно как в документе (около 700 px по большей стороне)."""
+    from PIL import Image, ImageFilter
+
+    photos: List[bytes] = []
+    for index in range(count):
+        size = (720, 540) if index % 3 else (540, 720)
+        image = Image.effect_noise(size, 30 + index % 20).filter(ImageFilter.GaussianBlur(1)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=65)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def save_with_repack(doc) -> bytes:
+    """Прежний путь: doc.save и перепаковка с deflate всех записей."""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    source = zipfile.ZipFile(io.BytesIO(buffer.getvalue()))
+    names = sorted(source.namelist(), key=lambda name: (name != "[Content_Types].xml", name))
+    output = io.BytesIO()
+    with source, zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as target:
+        for name in names:
+            info = zipfile.ZipInfo(name, date_time=DOCX_ZIP_TIMESTAMP)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o600 << 16
+            target.writestr(info, source.read(name))
+    return output.getvalue()
+
+
+def save_direct(doc, level: int) -> bytes:
+    buffer = io.BytesIO()
+    save_document(doc, buffer, level)
+    return buffer.getvalue()
+
+
+def measure(name: str, save: Callable[[], bytes], repeats: int) -> None:
+    save()
+    started: float = time.perf_counter()
+    for _ in range(repeats):
+        data: bytes = save()
+    elapsed_ms: float = (time.perf_counter() - started) / repeats * 1000
+    print(f"{name:<28} {elapsed_ms:>8.1f} мс {len(data) / 1024 / 1024:>9.2f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--photos", type=int, default=60, help="Фото в документе")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=2)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9], help="Уровни deflate для XML")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов замера")
+    args = parser.parse_args()
+
+    doc = create_multi_page_document(synthetic_photos(args.photos), args.rows, args.cols, "Бенчмарк", "auto")
+    print(f"{args.photos} фото, таблица {args.rows}×{args.cols}")
+    print(f"{'способ':<28} {'время':>11} {'размер':>12}")
+    measure("doc.save + перепаковка", lambda: save_with_repack(doc), args.repeats)
+    for level in args.levels:
+        measure(f"save_document, уровень {level}", lambda level=level: save_direct(doc, level), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Передача фото рабочим процессам: pickle против общей памяти (PAGE_WORKERS).
+
+Замеряется только пересылка: рабочий процесс получает фото страницы и возвращает
+данные того же объема (как изображения отрисованной страницы), без сжатия и верстки.
+Для pickle фото и результат копируются через канал пула, для общей памяти
+передаются срезы сегмента, а результат записывается на место исходных фото.
+
+    python benchmarks/process_transfer.py [--photos 100] [--size-kb 800] [--per-page 6] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, List
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from appraiser_photo_bot.document_creators.shared_photos import (  # noqa: E402
+    SharedPhotoBuffer,
+    SharedSlice,
+    page_region,
+    read_slices,
+    write_slices,
+)
+
+
+def echo_pickled(photos: List[bytes]) -> List[bytes]:
+    return [bytes(photo) for photo in photos]
+
+
+def echo_shared(slices: List[SharedSlice]) -> List[SharedSlice]:
+    photos: List[bytes] = read_slices(slices)
+    return write_slices(page_region(slices), iter(photos)) or []
+
+
+def run_pickled(executor: Executor, pages: List[List[bytes]]) -> int:
+    futures = [executor.submit(echo_pickled, page) for page in pages]
+    return sum(len(photo) for future in futures for photo in future.result())
+
+
+def run_shared(executor: Executor, pages: List[List[bytes]]) -> int:
+    with SharedPhotoBuffer([photo for page in pages for photo in page]) as buffer:
+        futures = []
+        position: int = 0
+        for page in pages:
+            futures.append(executor.submit(echo_shared, buffer.slices[position : position + len(page)]))
+            position += len(page)
+        return sum(len(buffer.read(item)) for future in futures for item in future.result())
+
+
+def measure(name: str, run: Callable[[], int], repeats: int) -> None:
+    run()
+    started: float = time.perf_counter()
+    for _ in range(repeats):
+        total: int = run()
+    elapsed_ms: float = (time.perf_counter() - started) / repeats * 1000
+    print(f"{name:<14} {elapsed_ms:>8.1f} мс  ({total / 1024 / 1024:.1f} MB туда и обратно)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--photos", type=int, default=100, help="Фото в документе")
+    parser.add_argument("--size-kb", type=int, default=800, help="Размер одного фото, KB")
+    parser.add_argument("--per-page", type=int, default=6, help="Фото на странице")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Рабочих процессов")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов замера")
+    args = parser.parse_args()
+
+    photos: List[bytes] = [os.urandom(args.size_kb * 1024) for _ in range(args.photos)]
+    pages: List[List[bytes]] = [photos[i : i + args.per_page] for i in range(0, len(photos), args.per_page)]
+    print(f"{len(photos)} фото по {args.size_kb} KB, {len(pages)} страниц, процессов: {args.workers}")
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        measure("pickle", lambda: run_pickled(executor, pages), args.repeats)
+        measure("общая память", lambda: run_shared(executor, pages), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
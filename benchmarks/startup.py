@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Замер времени запуска бота: время импорта и время до ответа на первое обновление.
+
+Бот запускается в отдельном процессе против локальной заглушки Bot API
+(BOT_API_URL), которая отдает одно обновление с /start и ждет sendMessage.
+Результат дописывается в benchmarks/startup_history.jsonl, чтобы сравнивать релизы.
+
+    python benchmarks/startup.py [--runs 5] [--no-save]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE: str = os.path.join(ROOT, "benchmarks", "startup_history.jsonl")
+HEAVY_MODULES = ("docx", "lxml", "PIL")
+TOKEN = "123456:benchmark"
+
+IMPORT_PROBE = """
+import sys, time
+started = time.perf_counter()
+import appraiser_photo_bot.bot
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    """Заглушка Bot API: одно обновление /start, остальные методы отвечают ok."""
+
+    first_reply_at: Optional[float] = None
+    reply_event: threading.Event = threading.Event()
+    update_sent: bool = False
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, result: Any) -> None:
+        body: bytes = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        method: str = self.path.rsplit("/", 1)[-1]
+        chat: Dict[str, Any] = {"id": 42, "type": "private", "first_name": "Bench"}
+        user: Dict[str, Any] = {"id": 42, "is_bot": False, "first_name": "Bench"}
+
+        if method == "getMe":
+            self._reply({"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+        elif method == "getUpdates":
+            if FakeBotApi.update_sent:
+                time.sleep(0.5)
+                self._reply([])
+                return
+            FakeBotApi.update_sent = True
+            message: Dict[str, Any] = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": user,
+                "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            }
+            self._reply([{"update_id": 1, "message": message}])
+        elif method == "sendMessage":
+            if FakeBotApi.first_reply_at is None:
+                FakeBotApi.first_reply_at = time.monotonic()
+                FakeBotApi.reply_event.set()
+            self._reply({"message_id": 2, "date": int(time.time()), "chat": chat, "text": "ok"})
+        else:
+            self._reply(True)
+
+
+class QuietServer(ThreadingHTTPServer):
+    """Не печатает ошибки соединений, оборванных при остановке бота."""
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        pass
+
+
+def measure_import() -> Dict[str, Any]:
+    """Время импорта appraiser_photo_bot.bot в чистом интерпретаторе."""
+    output: str = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_PROBE.format(heavy=HEAVY_MODULES)], cwd=ROOT, text=True
+    )
+    elapsed, loaded = output.strip().split(" ", 1) if " " in output.strip() else (output.strip(), "")
+    return {"seconds": float(elapsed), "heavy_modules": [m for m in loaded.split(",") if m]}
+
+
+def measure_first_update(timeout: float = 60.0) -> float:
+    """Время от запуска процесса бота до ответа на первое обновление."""
+    FakeBotApi.first_reply_at = None
+    FakeBotApi.update_sent = False
+    FakeBotApi.reply_event.clear()
+
+    server: QuietServer = QuietServer(("127.0.0.1", 0), FakeBotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url: str = f"http://127.0.0.1:{server.server_address[1]}"
+
+    env: Dict[str, str] = dict(os.environ, BOT_TOKEN=TOKEN, PYTHONPATH=ROOT, ADMIN_ID="")
+    with tempfile.TemporaryDirectory() as workdir:
+        started: float = time.monotonic()
+        process: subprocess.Popen = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "cli.py"), "--api-url", api_url],
+            cwd=workdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not FakeBotApi.reply_event.wait(timeout):
+                raise RuntimeError("Бот не ответил на обновление за отведенное время")
+            return FakeBotApi.first_reply_at - started
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            server.shutdown()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер времени запуска бота")
+    parser.add_argument("--runs", type=int, default=5, help="число повторов каждого замера")
+    parser.add_argument("--no-save", action="store_true", help="не дописывать результат в историю")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from appraiser_photo_bot import __version__
+
+    imports: List[Dict[str, Any]] = [measure_import() for _ in range(args.runs)]
+    first_updates: List[float] = [measure_first_update() for _ in range(args.runs)]
+
+    result: Dict[str, Any] = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": __version__,
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_seconds": round(statistics.median(r["seconds"] for r in imports), 4),
+        "first_update_seconds": round(statistics.median(first_updates), 4),
+        "heavy_modules_at_import": imports[0]["heavy_modules"],
+    }
+
+    print(f"Импорт appraiser_photo_bot.bot: {result['import_seconds'] * 1000:.0f} мс (медиана)")
+    print(f"До ответа на первое обновление: {result['first_update_seconds'] * 1000:.0f} мс (медиана)")
+    if result["heavy_modules_at_import"]:
+        print(f"⚠️ При старте загружены: {', '.join(result['heavy_modules_at_import'])}")
+
+    if not args.no_save:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"Результат добавлен в {os.path.relpath(HISTORY_FILE, ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
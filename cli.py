@@ -1,32 +1,74 @@
 #!/usr/bin/env python3
+import argparse
 import logging
 import os
 import sys
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
 
 from appraiser_photo_bot.bot import PhotoTableBot
 from appraiser_photo_bot.config import BotConfig
+from appraiser_photo_bot.flight_recorder import flight_recorder
+from appraiser_photo_bot.logging_setup import setup_logging
 
 
-def setup_logging() -> None:
-    """Настраивает логирование."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler("bot.log"),
-        ],
+def parse_args() -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Telegram бот для создания таблиц из фотографий")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="работать с собственным telegram-bot-api сервером, запущенным с --local",
     )
+    parser.add_argument(
+        "--api-url",
+        help="адрес Bot API сервера, например http://localhost:8081 (по умолчанию из BOT_API_URL)",
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser("batch", help="создать документы из папок с фото или манифеста, без Telegram")
+    batch.add_argument("folders", nargs="*", help="папки с фото: по одному документу на папку")
+    batch.add_argument("--manifest", help="JSON или CSV с заданиями (title, rows, cols, size_option, photos)")
+    batch.add_argument("-o", "--output-dir", default=".", help="куда сохранить .docx (по умолчанию текущая папка)")
+    batch.add_argument("--rows", type=int, default=3, help="строк в таблице для папок (по умолчанию 3)")
+    batch.add_argument("--cols", type=int, default=2, help="столбцов в таблице для папок (по умолчанию 2)")
+    batch.add_argument("--size", default="auto", help="размер фото для папок: small, medium, large, auto")
+    batch.add_argument("--title", help="заголовок таблицы для папок")
+    batch.add_argument("--workers", type=int, help="число процессов (по умолчанию по числу ядер)")
+    return parser.parse_args()
+
+
+def run_batch_command(args: argparse.Namespace) -> None:
+    """Пакетное создание документов из фото на диске."""
+    from appraiser_photo_bot.batch import BatchJob, jobs_from_folders, jobs_from_manifest, run_batch
+
+    # Прогресс печатается построчно, подробные логи сжатия остаются только для предупреждений
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if not args.folders and not args.manifest:
+        print("Ошибка: укажите папки с фото или --manifest")
+        sys.exit(2)
+
+    jobs: List[BatchJob] = jobs_from_folders(args.folders, args.output_dir, args.rows, args.cols, args.size, args.title)
+    if args.manifest:
+        jobs.extend(jobs_from_manifest(args.manifest, args.output_dir))
+
+    config: BotConfig = BotConfig.from_env()
+    flight_recorder.configure(config.flight_recorder_size, config.flight_recorder_file)
+    failed: int = run_batch(jobs, config, workers=args.workers)
+    sys.exit(1 if failed else 0)
 
 
 def main() -> None:
     """Основная функция запуска бота."""
+    args: argparse.Namespace = parse_args()
     load_dotenv()
 
-    setup_logging()
+    setup_logging(BotConfig.from_env())
+
+    if args.command == "batch":
+        run_batch_command(args)
 
     token: Optional[str] = os.getenv("BOT_TOKEN")
     if not token:
@@ -37,6 +79,12 @@ def main() -> None:
 
     try:
         config: BotConfig = BotConfig.from_env()
+        if args.local:
+            config.local_mode = True
+        if args.api_url:
+            api_url: str = args.api_url.rstrip("/")
+            config.bot_api_url = f"{api_url}/bot"
+            config.bot_api_file_url = f"{api_url}/file/bot"
         bot: PhotoTableBot = PhotoTableBot(config)
         bot.run()
 
@@ -0,0 +1,54 @@
+"""Подбор качества JPEG по SSIM в размере фото на странице."""
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from appraiser_photo_bot.document_creators import adaptive_quality
+from appraiser_photo_bot.document_creators.constants import ADAPTIVE_MIN_QUALITY
+from appraiser_photo_bot.document_creators.layout import photo_pixel_limits
+
+np = pytest.importorskip("numpy")
+
+
+def _facade(size=(1600, 1200)) -> Image.Image:
+    image = Image.new("RGB", size, (150, 120, 100))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 16):
+        for y in range(0, size[1], 8):
+            draw.rectangle((x + (y // 8 % 2) * 8, y, x + 14 + (y // 8 % 2) * 8, y + 6), fill=(170, 90 + x % 40, 70))
+    return ImageChops.add(image, Image.effect_noise(size, 12).convert("RGB"), 1, -128)
+
+
+@pytest.mark.parametrize("size", [(1600, 1200), (1200, 1600), (900, 1600)])
+def test_probe_size_is_largest_placement_on_page(size) -> None:
+    width, height = size
+    expected = photo_pixel_limits([height / width], 1, 1, "auto")[0]
+    assert adaptive_quality.probe_size(width, height) == expected
+    assert expected > 384
+
+
+def test_ssim_matches_window_definition() -> None:
+    rng = np.random.default_rng(0)
+    reference = rng.integers(0, 256, (64, 48)).astype(np.float64)
+    candidate = np.clip(reference + rng.normal(0, 10, reference.shape), 0, 255)
+    windows = np.lib.stride_tricks.sliding_window_view
+    x = windows(reference, (8, 8))[::4, ::4]
+    y = windows(candidate, (8, 8))[::4, ::4]
+    mean_x, mean_y = x.mean(axis=(2, 3)), y.mean(axis=(2, 3))
+    cov = (x * y).mean(axis=(2, 3)) - mean_x * mean_y
+    c1, c2 = adaptive_quality.SSIM_C1, adaptive_quality.SSIM_C2
+    expected = (
+        ((2 * mean_x * mean_y + c1) * (2 * cov + c2))
+        / ((mean_x**2 + mean_y**2 + c1) * (x.var(axis=(2, 3)) + y.var(axis=(2, 3)) + c2))
+    ).mean()
+    assert adaptive_quality.ssim(reference, candidate) == pytest.approx(expected, abs=1e-9)
+    assert adaptive_quality.ssim(reference, reference) == pytest.approx(1.0)
+
+
+def test_detailed_facade_keeps_max_quality() -> None:
+    assert adaptive_quality.choose_quality(_facade(), 85, 0.99) == 85
+
+
+def test_flat_photo_gets_lower_quality() -> None:
+    flat = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+    assert ADAPTIVE_MIN_QUALITY <= adaptive_quality.choose_quality(flat, 85, 0.99) < 85
@@ -0,0 +1,74 @@
+"""Индекс сроков истечения: перенос, отмена, извлечение и перестройка кучи."""
+
+from appraiser_photo_bot.expiry import ExpiryIndex
+
+
+def test_reschedule_replaces_previous_deadline() -> None:
+    index = ExpiryIndex()
+    index.schedule("session", 1, 10, now=0)
+    index.schedule("session", 1, 30, now=0)
+    assert len(index) == 1
+    assert index.pop_expired(now=20) == []
+    assert index.is_scheduled("session", 1)
+    assert index.pop_expired(now=30) == [("session", 1)]
+    assert not index.is_scheduled("session", 1)
+
+
+def test_reschedule_earlier_fires_once() -> None:
+    index = ExpiryIndex()
+    index.schedule("session", 1, 30, now=0)
+    index.schedule("session", 1, 5, now=0)
+    assert index.pop_expired(now=10) == [("session", 1)]
+    assert index.pop_expired(now=40) == []
+
+
+def test_cancel_removes_deadline() -> None:
+    index = ExpiryIndex()
+    index.schedule("session", 1, 5, now=0)
+    index.schedule("delete", 1, 5, now=0)
+    index.cancel("session", 1)
+    index.cancel("session", 2)  # не назначен - ничего не происходит
+    assert not index.is_scheduled("session", 1)
+    assert index.is_scheduled("delete", 1)
+    assert index.pop_expired(now=10) == [("delete", 1)]
+    assert len(index) == 0
+
+
+def test_pop_expired_returns_only_due_entries_in_order() -> None:
+    index = ExpiryIndex()
+    index.schedule("session", "c", 30, now=0)
+    index.schedule("session", "a", 10, now=0)
+    index.schedule("delete", "b", 20, now=0)
+    index.schedule("session", "d", 15, now=0)
+    index.cancel("session", "d")
+    assert index.pop_expired(now=5) == []
+    assert index.pop_expired(now=20) == [("session", "a"), ("delete", "b")]
+    assert len(index) == 1
+    assert index.pop_expired(now=30) == [("session", "c")]
+
+
+def test_same_key_in_different_kinds_is_independent() -> None:
+    index = ExpiryIndex()
+    index.schedule("session", 7, 10, now=0)
+    index.schedule("delete", 7, 20, now=0)
+    index.schedule("session", 7, 40, now=0)
+    assert index.pop_expired(now=25) == [("delete", 7)]
+    assert index.is_scheduled("session", 7)
+
+
+def test_compaction_keeps_live_entries() -> None:
+    index = ExpiryIndex()
+    for key in range(10):
+        index.schedule("session", key, 100 + key, now=0)
+    # Многократные переносы оставляют в куче устаревшие записи и запускают перестройку
+    for step in range(200):
+        index.schedule("session", step % 5, 200 + step, now=0)
+    index.schedule("delete", "x", 50, now=0)
+    index.cancel("session", 9)
+
+    assert len(index._heap) <= 65  # без перестройки было бы 211 записей
+    assert len(index) == 10
+    assert index.pop_expired(now=50) == [("delete", "x")]
+    assert index.pop_expired(now=108) == [("session", key) for key in range(5, 9)]
+    assert sorted(key for _, key in index.pop_expired(now=1000)) == [0, 1, 2, 3, 4]
+    assert len(index) == 0
@@ -0,0 +1,66 @@
+"""Раскладка фото на странице по их пропорциям."""
+
+import math
+
+import pytest
+
+from appraiser_photo_bot.document_creators.constants import (
+    CELL_PADDING_CM,
+    DOCUMENT_IMAGE_DPI,
+    DOCUMENT_MAX_IMAGE_SIZE,
+    SIZE_OPTIONS,
+)
+from appraiser_photo_bot.document_creators.layout import page_layout, photo_pixel_limits, usable_page_size
+
+PORTRAIT = 4 / 3
+LANDSCAPE = 3 / 4
+STORY = 16 / 9  # 9:16, вертикальное видео/скриншот
+
+
+@pytest.mark.parametrize("aspect", [PORTRAIT, LANDSCAPE, STORY])
+@pytest.mark.parametrize("rows,cols", [(1, 1), (2, 2), (3, 2), (4, 3), (5, 1), (1, 5), (10, 1), (10, 5), (10, 10)])
+def test_auto_page_fits_usable_area(aspect, rows, cols) -> None:
+    layout = page_layout([aspect] * (rows * cols), rows, cols, "auto")
+    usable_width, usable_height = usable_page_size()
+    assert layout.cell_width * cols <= usable_width + 1e-9
+    assert sum(layout.row_heights) <= usable_height + 1e-9
+    for width, height in layout.image_sizes:
+        assert height == pytest.approx(width * aspect)
+
+
+def test_auto_page_with_mixed_rows_fits_usable_area() -> None:
+    aspects = [LANDSCAPE, STORY, PORTRAIT, LANDSCAPE, STORY, STORY]
+    layout = page_layout(aspects, 3, 2, "auto")
+    assert sum(layout.row_heights) <= usable_page_size()[1] + 1e-9
+    assert layout.row_heights[0] == pytest.approx(layout.image_sizes[1][1] + CELL_PADDING_CM)
+
+
+@pytest.mark.parametrize("size_option", ["small", "medium", "large"])
+@pytest.mark.parametrize("aspect", [PORTRAIT, LANDSCAPE, STORY])
+def test_fixed_size_keeps_width(size_option, aspect) -> None:
+    expected_width = SIZE_OPTIONS[size_option][0]
+    layout = page_layout([aspect, 1.0], 1, 2, size_option)
+    assert layout.cell_width == pytest.approx(expected_width + CELL_PADDING_CM)
+    assert [width for width, _ in layout.image_sizes] == [expected_width, expected_width]
+    assert layout.image_sizes[0][1] == pytest.approx(expected_width * aspect)
+
+
+@pytest.mark.parametrize("count", [1, 4, 5, 9, 11])
+def test_pixel_limits_one_per_photo_across_pages(count) -> None:
+    aspects = [(LANDSCAPE, PORTRAIT, STORY)[index % 3] for index in range(count)]
+    limits = photo_pixel_limits(aspects, 2, 2, "auto")
+    assert len(limits) == count
+    for start in range(0, count, 4):
+        layout = page_layout(aspects[start : start + 4], 2, 2, "auto")
+        for offset, (width, height) in enumerate(layout.image_sizes):
+            expected = min(math.ceil(max(width, height) / 2.54 * DOCUMENT_IMAGE_DPI), DOCUMENT_MAX_IMAGE_SIZE)
+            assert limits[start + offset] == expected
+
+
+def test_pixel_limits_follow_fixed_size() -> None:
+    limits = photo_pixel_limits([LANDSCAPE, PORTRAIT], 1, 2, "medium")
+    width = SIZE_OPTIONS["medium"][0]
+    assert limits == [
+        math.ceil(width / 2.54 * DOCUMENT_IMAGE_DPI),
+        math.ceil(width * PORTRAIT / 2.54 * DOCUMENT_IMAGE_DPI),
+    ]
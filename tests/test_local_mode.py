@@ -0,0 +1,150 @@
+"""Режим локального Bot API: фото читается с диска по абсолютному пути из getFile.
+
+Вместо telegram-bot-api используется заглушка из benchmarks/startup.py, дополненная
+методом getFile и раздачей файлов по HTTP; скачивания по HTTP считаются.
+"""
+
+import asyncio
+import io
+import sys
+import threading
+from typing import Any, List, Optional
+
+import pytest
+from PIL import Image
+from telegram import Bot
+
+import cli
+from appraiser_photo_bot import handlers as handlers_module
+from appraiser_photo_bot.config import BotConfig
+from appraiser_photo_bot.handlers import BotHandlers
+from appraiser_photo_bot.local_files import map_local_file
+from appraiser_photo_bot.transport import build_requests
+from benchmarks.startup import TOKEN, FakeBotApi, QuietServer
+
+
+class LocalBotApi(FakeBotApi):
+    """Заглушка Bot API с getFile: file_path задает тест, файлы раздаются по GET."""
+
+    file_path: str = ""
+    content: bytes = b""
+    downloads: List[str] = []
+
+    def do_POST(self) -> None:
+        if self.path.rsplit("/", 1)[-1] != "getFile":
+            super().do_POST()
+            return
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply(
+            {
+                "file_id": "photo",
+                "file_unique_id": "photo-unique",
+                "file_size": len(LocalBotApi.content),
+                "file_path": LocalBotApi.file_path,
+            }
+        )
+
+    def do_GET(self) -> None:
+        LocalBotApi.downloads.append(self.path)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(LocalBotApi.content)))
+        self.end_headers()
+        self.wfile.write(LocalBotApi.content)
+
+
+@pytest.fixture
+def bot_api():
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (90, 140, 200)).save(buffer, format="JPEG", quality=95)
+    LocalBotApi.content = buffer.getvalue()
+    LocalBotApi.downloads = []
+    server = QuietServer(("127.0.0.1", 0), LocalBotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _config(api_url: str, tmp_path, local_mode: bool) -> BotConfig:
+    config = BotConfig(token=TOKEN, local_mode=local_mode, output_cache_dir=str(tmp_path / "cache"))
+    config.bot_api_url = f"{api_url}/bot"
+    config.bot_api_file_url = f"{api_url}/file/bot"
+    return config
+
+
+async def _load_photo(config: BotConfig) -> Optional[Any]:
+    handlers = BotHandlers(config)
+    router, _ = build_requests(config)
+    await router.initialize()
+    handlers.downloader.attach(router)
+    bot = Bot(TOKEN, base_url=config.bot_api_url, base_file_url=config.bot_api_file_url, local_mode=config.local_mode)
+    try:
+        async with bot:
+            photo_file = await bot.get_file("photo")
+            handlers.user_data[42] = {}
+            return photo_file.file_path, await handlers._load_photo(42, photo_file)
+    finally:
+        await router.shutdown()
+        handlers.render_executor.shutdown()
+
+
+def test_local_mode_reads_photo_from_disk(bot_api, tmp_path, monkeypatch) -> None:
+    local_file = tmp_path / "bot-api" / "photos" / "file_1.jpg"
+    local_file.parent.mkdir(parents=True)
+    local_file.write_bytes(LocalBotApi.content)
+    LocalBotApi.file_path = str(local_file)
+    mapped: List[str] = []
+
+    def record_map(path: str):
+        mapped.append(path)
+        return map_local_file(path)
+
+    monkeypatch.setattr(handlers_module, "map_local_file", record_map)
+    file_path, loaded = asyncio.run(_load_photo(_config(bot_api, tmp_path, local_mode=True)))
+
+    assert file_path == str(local_file)
+    assert mapped == [str(local_file)]
+    assert loaded is not None and loaded[0]
+    assert LocalBotApi.downloads == []
+
+
+def test_cloud_mode_downloads_over_http(bot_api, tmp_path) -> None:
+    LocalBotApi.file_path = "photos/file_2.jpg"
+    file_path, loaded = asyncio.run(_load_photo(_config(bot_api, tmp_path, local_mode=False)))
+
+    assert file_path.startswith(f"{bot_api}/file/bot")
+    assert loaded is not None and loaded[0]
+    assert LocalBotApi.downloads == [f"/file/bot{TOKEN}/photos/file_2.jpg"]
+
+
+def test_local_mode_raises_file_limits() -> None:
+    cloud = BotConfig(token=TOKEN)
+    local = BotConfig(token=TOKEN, local_mode=True)
+    assert (cloud.max_document_mb, cloud.max_archive_mb) == (45.0, 20.0)
+    assert (local.max_document_mb, local.max_archive_mb) == (1950.0, 1950.0)
+
+
+def test_cli_local_flag_configures_bot(monkeypatch) -> None:
+    started: List[BotConfig] = []
+
+    class FakeBot:
+        def __init__(self, config: BotConfig) -> None:
+            started.append(config)
+
+        def run(self) -> None:
+            pass
+
+    monkeypatch.setattr(cli, "PhotoTableBot", FakeBot)
+    monkeypatch.setattr(cli, "setup_logging", lambda config: None)
+    monkeypatch.setattr(cli, "load_dotenv", lambda: None)
+    monkeypatch.setenv("BOT_TOKEN", TOKEN)
+    monkeypatch.setattr(sys, "argv", ["cli.py", "--local", "--api-url", "http://localhost:8081/"])
+    cli.main()
+
+    config = started[0]
+    assert config.local_mode
+    assert config.bot_api_url == "http://localhost:8081/bot"
+    assert config.bot_api_file_url == "http://localhost:8081/file/bot"
+    assert config.max_document_mb == 1950.0
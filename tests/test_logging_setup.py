@@ -0,0 +1,52 @@
+"""Логи рабочих процессов пакетного режима доходят до обработчиков главного процесса."""
+
+import io
+import logging
+from typing import List
+
+from PIL import Image
+
+from appraiser_photo_bot.batch import BatchJob, run_batch
+from appraiser_photo_bot.config import BotConfig
+
+
+class _Collect(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_batch_worker_errors_reach_parent_handler(tmp_path) -> None:
+    good = io.BytesIO()
+    Image.new("RGB", (64, 48), (120, 80, 40)).save(good, format="JPEG")
+    (tmp_path / "1.jpg").write_bytes(good.getvalue())
+    (tmp_path / "3.jpg").write_bytes(b"not a jpeg")
+
+    handler = _Collect()
+    root = logging.getLogger()
+    previous_level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        job = BatchJob(
+            output=str(tmp_path / "out.docx"),
+            photos=[str(tmp_path / "1.jpg"), str(tmp_path / "3.jpg")],
+            rows=1,
+            cols=2,
+        )
+        run_batch([job], BotConfig(token="test"), workers=1)
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(previous_level)
+
+    errors = [
+        record
+        for record in handler.records
+        if record.name == "appraiser_photo_bot.document_creators.utils" and record.levelno == logging.ERROR
+    ]
+    assert errors, [record.getMessage() for record in handler.records]
+    assert "Ошибка при сжатии изображения" in errors[0].getMessage()
+    assert "UnidentifiedImageError" in (errors[0].exc_text or "")
@@ -0,0 +1,223 @@
+"""Планировщик исходящих запросов: лимиты, приоритеты, RetryAfter и отмена ожидания."""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+from telegram.error import RetryAfter
+
+from appraiser_photo_bot.outbound import OutboundScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeApi:
+    """Колбэк вместо Bot API: записывает вызовы, по запросу отвечает RetryAfter."""
+
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+        self.retry_after: Dict[str, List[int]] = {}
+
+    async def __call__(self, name: str) -> str:
+        self.calls.append(name)
+        delays: List[int] = self.retry_after.get(name, [])
+        if delays:
+            raise RetryAfter(delays.pop(0))
+        return f"ok:{name}"
+
+
+def _submit(
+    scheduler: OutboundScheduler,
+    api: FakeApi,
+    name: str,
+    endpoint: str = "sendMessage",
+    chat_id: Any = 1,
+    message_id: Optional[int] = None,
+) -> "asyncio.Task[Any]":
+    data: Dict[str, Any] = {"chat_id": chat_id, "message_id": message_id}
+    return asyncio.ensure_future(scheduler.process_request(api, (name,), {}, endpoint, data, None))
+
+
+async def _settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def _advance(scheduler: OutboundScheduler, clock: FakeClock, seconds: float) -> None:
+    clock.now += seconds
+    scheduler._wakeup.set()
+    await _settle()
+
+
+def test_token_bucket_burst_refill_and_pause() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+    for _ in range(3):
+        assert bucket.wait_time(clock()) == 0.0
+        bucket.consume(clock())
+    assert bucket.wait_time(clock()) == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.wait_time(clock()) == 0.0
+    clock.now += 10
+    assert bucket.is_idle(clock())
+
+    bucket.pause(4)
+    assert bucket.wait_time(clock()) == pytest.approx(4)
+    assert not bucket.is_idle(clock())
+    clock.now += 4
+    assert bucket.wait_time(clock()) == 0.0
+
+
+def test_priority_order_documents_before_progress() -> None:
+    async def scenario() -> List[str]:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(clock=clock)
+        api = FakeApi()
+        tasks = [
+            _submit(scheduler, api, "progress", "editMessageText", chat_id=1, message_id=5),
+            _submit(scheduler, api, "text", "sendMessage", chat_id=2),
+            _submit(scheduler, api, "document", "sendDocument", chat_id=3),
+        ]
+        results = await asyncio.gather(*tasks)
+        assert results == ["ok:progress", "ok:text", "ok:document"]
+        await scheduler.shutdown()
+        return api.calls
+
+    assert asyncio.run(scenario()) == ["document", "text", "progress"]
+
+
+def test_chat_limit_delays_only_that_chat() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(chat_rate=1.0, chat_burst=1, clock=clock)
+        api = FakeApi()
+        first = _submit(scheduler, api, "a1", chat_id="a")
+        second = _submit(scheduler, api, "a2", chat_id="a")
+        other = _submit(scheduler, api, "b1", chat_id="b")
+        await _settle()
+        assert api.calls == ["a1", "b1"]
+        assert not second.done()
+
+        await _advance(scheduler, clock, 1.0)
+        assert api.calls == ["a1", "b1", "a2"]
+        await asyncio.gather(first, second, other)
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_global_limit_spreads_requests() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(global_rate=2.0, global_burst=2, clock=clock)
+        api = FakeApi()
+        tasks = [_submit(scheduler, api, f"m{index}", chat_id=index) for index in range(4)]
+        await _settle()
+        assert api.calls == ["m0", "m1"]
+        await _advance(scheduler, clock, 0.5)
+        assert api.calls == ["m0", "m1", "m2"]
+        await _advance(scheduler, clock, 0.5)
+        await asyncio.gather(*tasks)
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_pauses_chat_and_requeues() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(clock=clock)
+        api = FakeApi()
+        api.retry_after["flood"] = [5]
+        task = _submit(scheduler, api, "flood", chat_id=7)
+        await _settle()
+        assert api.calls == ["flood"]
+        assert not task.done()
+        assert scheduler._chat_bucket(7).wait_time(clock()) == pytest.approx(5)
+
+        other = _submit(scheduler, api, "other", chat_id=8)
+        await _settle()
+        assert api.calls == ["flood", "other"]
+
+        await _advance(scheduler, clock, 5)
+        assert await task == "ok:flood"
+        assert api.calls == ["flood", "other", "flood"]
+        await other
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_gives_up_after_max_retries() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(max_retries=1, clock=clock)
+        api = FakeApi()
+        api.retry_after["flood"] = [1, 1]
+        task = _submit(scheduler, api, "flood", chat_id=7)
+        await _settle()
+        await _advance(scheduler, clock, 1)
+        with pytest.raises(RetryAfter):
+            await task
+        assert api.calls == ["flood", "flood"]
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_removes_queued_request() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(chat_rate=1.0, chat_burst=1, clock=clock)
+        api = FakeApi()
+        first = _submit(scheduler, api, "first", chat_id=1)
+        queued = _submit(scheduler, api, "queued", chat_id=1)
+        await _settle()
+        queued.cancel()
+        await _settle()
+        assert queued.cancelled()
+        assert scheduler._queue == []
+
+        await _advance(scheduler, clock, 5)
+        assert api.calls == ["first"]
+        await first
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_coalesced_waiter_keeps_request_for_others() -> None:
+    async def scenario() -> None:
+        clock = FakeClock()
+        scheduler = OutboundScheduler(chat_rate=1.0, chat_burst=1, clock=clock)
+        api = FakeApi()
+        first = _submit(scheduler, api, "first", chat_id=1)
+        old = _submit(scheduler, api, "edit-1", "editMessageText", chat_id=1, message_id=9)
+        new = _submit(scheduler, api, "edit-2", "editMessageText", chat_id=1, message_id=9)
+        await _settle()
+        assert len(scheduler._queue) == 1
+
+        old.cancel()
+        await _settle()
+        assert len(scheduler._queue) == 1 and len(scheduler._queue[0].waiters) == 1
+
+        await _advance(scheduler, clock, 1)
+        assert await new == "ok:edit-2"
+        assert api.calls == ["first", "edit-2"]
+
+        latest = _submit(scheduler, api, "edit-3", "editMessageText", chat_id=1, message_id=9)
+        await _settle()
+        latest.cancel()
+        await _settle()
+        assert scheduler._queue == [] and scheduler._pending == {}
+        await first
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+"""Отрисовка страниц переживает гибель рабочего процесса пула."""
+
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+import pytest
+from PIL import Image
+
+from appraiser_photo_bot.config import BotConfig
+from appraiser_photo_bot.document_creators import DocumentCreator
+from appraiser_photo_bot.output_cache import OutputCache
+from appraiser_photo_bot.render_service import RenderService
+
+
+def _photos(count: int, channel: int = 0) -> List[bytes]:
+    photos: List[bytes] = []
+    for index in range(count):
+        color = [0, 0, 0]
+        color[channel] = 40 + index * 50
+        buffer = io.BytesIO()
+        Image.new("RGB", (320, 240), tuple(color)).save(buffer, format="JPEG")
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def _broken_pool() -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    return pool
+
+
+def test_broken_pool_renders_pages_in_process() -> None:
+    pool = _broken_pool()
+    try:
+        creator = DocumentCreator(rows=1, cols=1, page_executor=pool, use_temp_files=False)
+        document = creator.create_document(_photos(3))
+    finally:
+        pool.shutdown()
+    assert document.startswith(b"PK")
+    assert creator.page_executor_broken
+
+
+def test_shut_down_pool_renders_pages_in_process() -> None:
+    pool = ThreadPoolExecutor(max_workers=1)
+    pool.shutdown()
+    creator = DocumentCreator(rows=1, cols=1, page_executor=pool, use_temp_files=False)
+    assert creator.create_document(_photos(3)).startswith(b"PK")
+    assert not creator.page_executor_broken
+
+
+def test_render_service_replaces_broken_pool(tmp_path) -> None:
+    config = BotConfig(token="test", page_workers=1)
+    broken = _broken_pool()
+    service = RenderService(config, ThreadPoolExecutor(max_workers=1), OutputCache(str(tmp_path), 10**8), broken)
+    try:
+        _, first = asyncio.run(service.render(_photos(3), "t", 1, 1, "medium", source="test"))
+        replacement = service.page_executor
+        assert replacement is not None and replacement is not broken
+        _, second = asyncio.run(service.render(_photos(3, channel=1), "t", 1, 1, "medium", source="test"))
+        assert service.page_executor is replacement
+    finally:
+        service.shutdown_page_executor()
+    assert first.startswith(b"PK") and second.startswith(b"PK")
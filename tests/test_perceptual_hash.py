@@ -0,0 +1,143 @@
+"""Поиск повторных фото: dHash, индекс хешей сессии и DUPLICATE_PHOTOS в архивах."""
+
+import asyncio
+import io
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import pytest
+from PIL import Image, ImageDraw
+
+from appraiser_photo_bot.config import BotConfig
+from appraiser_photo_bot.document_creators.perceptual_hash import PhotoHashIndex, dhash, hamming
+from appraiser_photo_bot.document_creators.utils import compress_image_with_hash
+from appraiser_photo_bot.handlers import BotHandlers
+
+DUPLICATE_DISTANCE = BotConfig(token="test").duplicate_distance
+
+
+def _scene(seed: int, size: Tuple[int, int] = (800, 600)) -> Image.Image:
+    """Снимок с крупными деталями: фон-градиент и прямоугольники в разных местах."""
+    image = Image.linear_gradient("L").rotate(seed * 37).resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for index in range(6):
+        x = (seed * 97 + index * 131) % (size[0] - 150)
+        y = (seed * 53 + index * 89) % (size[1] - 120)
+        shade = (seed * 40 + index * 60) % 256
+        draw.rectangle((x, y, x + 150, y + 120), fill=(shade, 255 - shade, (shade * 3) % 256))
+    return image
+
+
+def _jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _hash(data: bytes) -> int:
+    """Хеш так, как его считает загрузка фото в бот."""
+    value: Optional[int] = compress_image_with_hash(data, 70, 1200)[1]
+    assert value is not None
+    return value
+
+
+@pytest.mark.parametrize(
+    "copy",
+    [
+        lambda image: _jpeg(image, quality=30),
+        lambda image: _jpeg(image.resize((400, 300), Image.Resampling.LANCZOS)),
+        lambda image: _jpeg(image.resize((1600, 1200), Image.Resampling.BICUBIC), quality=60),
+        lambda image: _jpeg(image.crop((4, 3, 796, 597))),
+    ],
+    ids=["recompressed", "downscaled", "upscaled", "trimmed"],
+)
+def test_copies_of_same_photo_are_within_distance(copy) -> None:
+    original = _scene(1)
+    assert hamming(_hash(_jpeg(original)), _hash(copy(original))) <= DUPLICATE_DISTANCE
+
+
+def test_distinct_photos_are_farther_than_distance() -> None:
+    hashes = [_hash(_jpeg(_scene(seed))) for seed in range(1, 6)]
+    for index, value in enumerate(hashes):
+        for other in hashes[index + 1 :]:
+            assert hamming(value, other) > DUPLICATE_DISTANCE
+
+
+def test_dhash_of_grayscale_and_color_match() -> None:
+    image = _scene(2)
+    assert hamming(dhash(image), dhash(image.convert("L"))) <= 2
+
+
+def test_find_returns_closest_and_skips_missing_hashes() -> None:
+    index = PhotoHashIndex()
+    for value in (0b1111, None, 0b0111, 0xFF00):
+        index.add(value)
+    assert len(index) == 4
+    assert index.find(0b0111, 2) == 2
+    assert index.find(0b1110, 2) == 0
+    assert index.find(0x00FF, 2) is None
+    assert index.find(None, 64) is None
+    index.clear()
+    assert index.find(0b1111, 64) is None
+
+
+def test_duplicates_reports_earliest_match() -> None:
+    index = PhotoHashIndex()
+    for value in (0b0000, 0xF0F0, 0b0001, 0b0011, None, 0xF0F1):
+        index.add(value)
+    # 0b0011 ближе к 0b0001 (1 бит), но в паре указывается более раннее 0b0000 (2 бита)
+    assert index.duplicates(2) == [(2, 0), (3, 0), (5, 1)]
+    assert index.duplicates(0) == []
+
+
+def _archive_update(user_id: int) -> SimpleNamespace:
+    replies: List[str] = []
+
+    async def reply_text(text: str, **kwargs) -> None:
+        replies.append(text)
+
+    async def get_file() -> None:
+        return None
+
+    document = SimpleNamespace(file_name="photos.zip", file_size=1024, get_file=get_file)
+    message = SimpleNamespace(document=document, reply_text=reply_text, replies=replies)
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=message)
+
+
+@pytest.mark.parametrize("mode,added", [("skip", 1), ("warn", 3)])
+def test_archive_duplicates_follow_duplicate_photos_mode(tmp_path, monkeypatch, mode, added) -> None:
+    config = BotConfig(token="test", duplicate_photos=mode, output_cache_dir=str(tmp_path))
+    handlers = BotHandlers(config)
+    session_photo = _jpeg(_scene(1))
+    fresh_photo = _jpeg(_scene(3))
+    handlers.user_data[7] = {"photos": [session_photo], "rows": 2, "cols": 2, "size_option": "auto"}
+    handlers._photo_index(7).add(_hash(session_photo))
+
+    loaded = [
+        (_jpeg(_scene(1), quality=40), _hash(_jpeg(_scene(1), quality=40))),  # повтор фото из сессии
+        (fresh_photo, _hash(fresh_photo)),
+        (fresh_photo, _hash(fresh_photo)),  # повтор внутри архива
+    ]
+
+    async def load_archive(user_id, archive_file, capacity):
+        return loaded, 0, 0
+
+    monkeypatch.setattr(handlers, "_load_archive", load_archive)
+    monkeypatch.setattr(handlers.prerenderer, "on_photos_added", lambda *args: None)
+    update = _archive_update(7)
+    try:
+        asyncio.run(handlers.get_archive(update, SimpleNamespace()))
+    finally:
+        handlers.render_executor.shutdown()
+
+    assert update.message.replies[0].startswith(handlers.messages.get_archive_summary(added, 0, 0, 2, mode == "skip"))
+
+    photos = handlers.user_data[7]["photos"]
+    index = handlers._photo_index(7)
+    assert len(photos) == 1 + added
+    assert len(index) == len(photos)
+    if mode == "skip":
+        assert photos == [session_photo, fresh_photo]
+        assert index.duplicates(DUPLICATE_DISTANCE) == []
+    else:
+        assert index.duplicates(DUPLICATE_DISTANCE) == [(1, 0), (3, 2)]
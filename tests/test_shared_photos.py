@@ -0,0 +1,36 @@
+"""Общая память для фото: место резервируется при создании сегмента."""
+
+import errno
+import os
+
+import pytest
+
+from appraiser_photo_bot.document_creators import shared_photos
+from appraiser_photo_bot.document_creators.shared_photos import SharedPhotoBuffer, page_region, read_slices
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(shared_photos.SHM_DIR), reason="нет /dev/shm")
+
+
+def _segments() -> set:
+    return set(os.listdir(shared_photos.SHM_DIR))
+
+
+def test_buffer_round_trip_and_unlink() -> None:
+    photos = [b"a" * 10, b"bb" * 7, b"c"]
+    before = _segments()
+    buffer = SharedPhotoBuffer.create(photos)
+    assert buffer is not None
+    assert read_slices(buffer.slices) == photos
+    assert page_region(buffer.slices[1:]).size == 15
+    buffer.close()
+    assert _segments() == before
+
+
+def test_no_room_falls_back_and_removes_segment(monkeypatch) -> None:
+    def no_space(fd: int, offset: int, size: int) -> None:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(shared_photos.os, "posix_fallocate", no_space)
+    before = _segments()
+    assert SharedPhotoBuffer.create([b"x" * 1024]) is None
+    assert _segments() == before